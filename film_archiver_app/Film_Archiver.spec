@@ -4,8 +4,27 @@ from PyInstaller.utils.hooks import collect_data_files, collect_submodules
 
 block_cipher = None
 
-# Collect all PIL and tkinter submodules
-hidden_imports = collect_submodules('PIL') + [
+# Only the Pillow plugins for SUPPORTED_FORMATS (see core/decoding.py) are
+# bundled. Pillow's PyInstaller hook collects every plugin, so the others
+# are excluded; otherwise Image.init() would import them all.
+# JpegImagePlugin opens multi-picture camera JPEGs with MpoImagePlugin.
+pil_plugins = [
+    'PIL.BmpImagePlugin',
+    'PIL.GifImagePlugin',
+    'PIL.Jpeg2KImagePlugin',
+    'PIL.JpegImagePlugin',
+    'PIL.MpoImagePlugin',
+    'PIL.PngImagePlugin',
+    'PIL.PpmImagePlugin',
+    'PIL.PsdImagePlugin',
+    'PIL.TiffImagePlugin',
+    'PIL.WebPImagePlugin',
+]
+pil_excludes = [name for name in collect_submodules('PIL', filter=lambda name: 'ImagePlugin' in name)
+                if name not in pil_plugins]
+pil_imports = ['PIL.Image', 'PIL.ImageCms', 'PIL.ImageDraw', 'PIL.ImageTk'] + pil_plugins
+
+hidden_imports = pil_imports + [
     'tkinter',
     'tkinter.filedialog',
     'tkinter.messagebox',
@@ -35,7 +54,7 @@ a = Analysis(['main.py'],
              hookspath=[],
              hooksconfig={},
              runtime_hooks=[],
-             excludes=[],
+             excludes=pil_excludes,
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
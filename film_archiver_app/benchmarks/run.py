@@ -0,0 +1,220 @@
+"""
+Film Archiver - Benchmark Runner
+
+    python -m benchmarks.run --quick --output results.json
+    python -m benchmarks.run --baseline results.json
+
+Each case is timed best-of --repeat runs and written as JSON. With
+--baseline, cases slower than the baseline by more than --tolerance are
+reported and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from config.settings import CACHE_DIR, MAX_THUMBNAIL_SIZE
+from benchmarks.synthetic import generate_roll, ROLL_SIZES
+
+logger = logging.getLogger(__name__)
+
+# suite -> list of (roll kind, frames, duplicate basenames)
+SUITES = {
+    'metadata': [('jpeg', n, False) for n in ROLL_SIZES] + [('jpeg', 250, True)],
+    'thumbnail': [('jpeg', 36, False), ('tiff8', 36, False), ('tiff16', 36, False), ('large', 4, False)],
+    'list_refresh': [('jpeg', n, False) for n in ROLL_SIZES] + [('jpeg', 250, True)],
+    'process': [('jpeg', n, False) for n in ROLL_SIZES[:3]] + [('tiff16', 36, False)],
+}
+
+QUICK_MAX_FRAMES = 72
+
+
+def bench_metadata(files, repeat):
+    from core.file_manager import FileManager
+    from core.records import RecordStore
+
+    def run():
+        store = RecordStore(FileManager())
+        for path in files:
+            store.scan(path)
+    return {'scan': best_of(run, repeat)}
+
+
+def bench_thumbnail(files, repeat):
+    from core.file_manager import FileManager
+    from core.thumbnail_cache import ThumbnailCache
+
+    file_manager = FileManager()
+
+    def serial():
+        for path in files:
+            file_manager.create_thumbnail(path, MAX_THUMBNAIL_SIZE)
+
+    def parallel():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ThumbnailCache(file_manager, cache_dir=Path(cache_dir))
+            for future in [cache.submit(path) for path in files]:
+                future.result()
+            cache.shutdown()
+
+    return {'serial': best_of(serial, repeat), 'parallel': best_of(parallel, repeat)}
+
+
+def bench_list_refresh(files, repeat):
+    import tkinter as tk
+    from ui.main_window import FilmArchiverWindow
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        logger.warning(f"Skipping list refresh benchmark (no display): {e}")
+        return None
+    root.withdraw()
+    try:
+        app = FilmArchiverWindow(root)
+        app.camera_model.set("BENCH")
+        app.film_type.set("BENCH")
+        app.files = list(files)
+        results = {'cold': best_of(app.update_file_list, 1)}
+        results['warm'] = best_of(app.update_file_list, repeat)
+
+        def reversed_refresh():
+            app.reverse_var.set(not app.reverse_var.get())
+            app.update_file_list()
+        results['reverse'] = best_of(reversed_refresh, repeat)
+        app.dispatcher.stop()
+        app.thumbnails.shutdown()
+        return results
+    finally:
+        root.destroy()
+
+
+def bench_process(files, repeat):
+    from core.processor import RollProcessor
+
+    # Proxies are left out so results stay comparable with older baselines
+    processor = RollProcessor(1, "BENCH", "BENCH", datetime(2024, 1, 1), make_proxies=False)
+
+    def run():
+        with tempfile.TemporaryDirectory() as output_dir:
+            processor.process(files, output_dir)
+    return {'end_to_end': best_of(run, repeat)}
+
+
+BENCHMARKS = {
+    'metadata': bench_metadata,
+    'thumbnail': bench_thumbnail,
+    'list_refresh': bench_list_refresh,
+    'process': bench_process,
+}
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(suites, cache_dir, repeat=3, quick=False, max_frames=None):
+    results = {}
+    for suite in suites:
+        for kind, frames, dup_names in SUITES[suite]:
+            limit = QUICK_MAX_FRAMES if quick else max_frames
+            if limit and frames > limit:
+                continue
+            files = generate_roll(cache_dir, frames, kind, duplicate_basenames=dup_names)
+            case = f"{kind}-{frames}{'-dupnames' if dup_names else ''}"
+            logger.info(f"Running {suite} on {case}")
+            timings = BENCHMARKS[suite](files, repeat)
+            if timings is None:
+                continue
+            for label, seconds in timings.items():
+                results[f"{suite}/{label}/{case}"] = {
+                    'seconds': round(seconds, 6),
+                    'frames': frames,
+                    'per_frame_ms': round(seconds * 1000 / frames, 4),
+                }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print a comparison table; return the names of regressed cases"""
+    regressions = []
+    print(f"{'case':<50}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<50}{'-':>12}{result['seconds']:>12.4f}{'new':>10}")
+            continue
+        change = result['seconds'] / before['seconds'] - 1 if before['seconds'] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:<50}{before['seconds']:>12.4f}{result['seconds']:>12.4f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Film Archiver performance benchmarks")
+    parser.add_argument("--suites", nargs="+", choices=sorted(SUITES), default=sorted(SUITES))
+    parser.add_argument("--repeat", type=int, default=3, help="best-of repetitions per case")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"skip rolls over {QUICK_MAX_FRAMES} frames")
+    parser.add_argument("--max-frames", type=int, help="skip rolls larger than this")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR / "benchmarks"),
+                        help="where synthetic rolls are generated and reused")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown vs baseline before failing (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('PIL').setLevel(logging.WARNING)
+
+    results = run_benchmarks(args.suites, args.cache_dir, args.repeat, args.quick, args.max_frames)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pillow': _pillow_version(),
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+    else:
+        for name, result in sorted(results.items()):
+            print(f"{name:<50}{result['seconds']:>12.4f} s{result['per_frame_ms']:>12.3f} ms/frame")
+
+
+def _pillow_version():
+    import PIL
+    return PIL.__version__
+
+
+if __name__ == "__main__":
+    main()
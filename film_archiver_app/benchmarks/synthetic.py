@@ -0,0 +1,133 @@
+"""
+Film Archiver - Synthetic Roll Generator
+
+Builds reproducible rolls of scan-like images for the benchmarks. Rolls are
+written once per spec under the benchmark cache directory and reused.
+"""
+import os
+import struct
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+import piexif
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# name -> (file kind, width, height)
+ROLL_KINDS = {
+    'jpeg': ('jpeg', 1800, 1200),
+    'tiff8': ('tiff8', 1800, 1200),
+    'tiff16': ('tiff16', 1800, 1200),
+    'large': ('tiff8', 8000, 5300),
+}
+
+ROLL_SIZES = (36, 72, 250, 5000)
+
+
+def generate_roll(output_dir: str, frames: int, kind: str = 'jpeg', duplicate_basenames: bool = False,
+                  seed: int = 0) -> List[str]:
+    """Create (or reuse) a synthetic roll and return its files in frame order.
+
+    With duplicate_basenames the frames are split across two lab folders
+    that both number from scan_0001, like two overlapping deliveries.
+    """
+    file_kind, width, height = ROLL_KINDS[kind]
+    roll_dir = os.path.join(output_dir, f"{kind}-{frames}{'-dupnames' if duplicate_basenames else ''}")
+    ext = '.jpg' if file_kind == 'jpeg' else '.tif'
+
+    paths = []
+    for idx in range(frames):
+        if duplicate_basenames:
+            folder = os.path.join(roll_dir, 'lab_a' if idx % 2 == 0 else 'lab_b')
+            name = f"scan_{idx // 2 + 1:04d}{ext}"
+        else:
+            folder = roll_dir
+            name = f"scan_{idx + 1:04d}{ext}"
+        paths.append(os.path.join(folder, name))
+
+    if all(os.path.exists(path) for path in paths):
+        return paths
+
+    logger.info(f"Generating {frames}-frame {kind} roll in {roll_dir}")
+    rng = np.random.default_rng(seed)
+    base = _scene(width, height, rng)
+    start = datetime(2023, 6, 1, 10, 0, 0)
+
+    for idx, path in enumerate(paths):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shift the scene per frame so files differ like real frames do
+        frame = np.roll(base, shift=(idx * 37) % width, axis=1)
+        if file_kind == 'jpeg':
+            _write_jpeg(path, (frame >> 8).astype(np.uint8), start + timedelta(minutes=idx))
+        elif file_kind == 'tiff8':
+            Image.fromarray((frame >> 8).astype(np.uint8)).save(path)
+        else:
+            _write_tiff16(path, frame)
+    return paths
+
+
+def _scene(width: int, height: int, rng) -> np.ndarray:
+    """A 16-bit RGB gradient with grain, roughly like a colour scan"""
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    scene = np.empty((height, width, 3), dtype=np.float32)
+    scene[..., 0] = 0.2 + 0.6 * x * (1 - 0.3 * y)
+    scene[..., 1] = 0.3 + 0.4 * y
+    scene[..., 2] = 0.5 + 0.3 * np.sin(6 * x) * np.cos(4 * y)
+    scene += rng.normal(0, 0.02, size=scene.shape).astype(np.float32)
+    return (np.clip(scene, 0, 1) * 65535).astype(np.uint16)
+
+
+def _write_jpeg(path: str, rgb: np.ndarray, taken: datetime):
+    stamp = taken.strftime("%Y:%m:%d %H:%M:%S").encode()
+    exif = piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'Synthetic', piexif.ImageIFD.DateTime: stamp},
+        'Exif': {piexif.ExifIFD.DateTimeOriginal: stamp, piexif.ExifIFD.DateTimeDigitized: stamp},
+    })
+    Image.fromarray(rgb).save(path, 'JPEG', quality=90, exif=exif)
+
+
+def _write_tiff16(path: str, rgb: np.ndarray, rows_per_strip: int = 64):
+    """Write an uncompressed 48-bit RGB TIFF (Pillow cannot save RGB;16)"""
+    height, width, samples = rgb.shape
+    data = rgb.astype('>u2').tobytes()
+    row_bytes = width * samples * 2
+    strips = (height + rows_per_strip - 1) // rows_per_strip
+    offsets = [8 + i * rows_per_strip * row_bytes for i in range(strips)]
+    counts = [min(rows_per_strip, height - i * rows_per_strip) * row_bytes for i in range(strips)]
+
+    entries = []
+    overflow = b''
+    ifd_offset = 8 + len(data)
+    overflow_offset = ifd_offset + 2 + 11 * 12 + 4
+
+    def add(tag, field_type, values):
+        nonlocal overflow
+        fmt = {3: 'H', 4: 'I'}[field_type] * len(values)
+        packed = struct.pack('>' + fmt, *values)
+        if len(packed) <= 4:
+            value = packed.ljust(4, b'\0')
+        else:
+            value = struct.pack('>I', overflow_offset + len(overflow))
+            overflow += packed
+        entries.append(struct.pack('>HHI', tag, field_type, len(values)) + value)
+
+    add(256, 4, [width])
+    add(257, 4, [height])
+    add(258, 3, [16] * samples)
+    add(259, 3, [1])
+    add(262, 3, [2])
+    add(273, 4, offsets)
+    add(277, 3, [samples])
+    add(278, 4, [rows_per_strip])
+    add(279, 4, counts)
+    add(284, 3, [1])
+    add(339, 3, [1] * samples)
+
+    with open(path, 'wb') as f:
+        f.write(b'MM\x00\x2a' + struct.pack('>I', ifd_offset))
+        f.write(data)
+        f.write(struct.pack('>H', len(entries)) + b''.join(entries) + b'\0\0\0\0' + overflow)
@@ -30,9 +30,7 @@ else:
     CACHE_DIR = APP_DIR / "cache"
     LOG_DIR = APP_DIR / "logs"
 
-# Create necessary directories
-for directory in [APP_DIR, CACHE_DIR, LOG_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
+# Directories are created by whatever first writes to them, not at import
 
 # File Settings
 SUPPORTED_FORMATS = {
@@ -73,6 +71,125 @@ MAX_THUMBNAIL_SIZE = (300, 300)
 MAX_CACHE_ENTRIES = 50
 THUMBNAIL_QUALITY = 85
 
+# Processing Settings
+PROGRESS_RATE_WINDOW = 10  # Files in the throughput moving average
+
+# Web Proxy Settings
+# Preset name -> (max size, JPEG quality); proxies go in <roll>/_proxies/<preset>/
+DERIVATIVE_PRESETS = {
+    'web': ((2048, 2048), 85),
+    'share': ((1200, 1200), 80),
+}
+DERIVATIVE_DIR_NAME = "_proxies"
+DERIVATIVE_WORKERS = min(4, os.cpu_count() or 1)
+DERIVATIVES_ON_PROCESS = True  # Render proxies as part of processing a roll
+
+# Gallery Export Settings
+# Image name -> (max size, JPEG quality). Sizes matching the thumbnail cache
+# or a proxy preset are copied from there instead of rendered.
+GALLERY_IMAGE_SIZES = {
+    'thumb': (MAX_THUMBNAIL_SIZE, THUMBNAIL_QUALITY),
+    'view': ((1200, 1200), 80),
+    'large': ((2048, 2048), 85),
+}
+GALLERY_WORKERS = DERIVATIVE_WORKERS
+
+# TIFF Recompression Settings
+TIFF_RECOMPRESS_ON_PROCESS = False  # Losslessly compress uncompressed TIFF masters while processing
+TIFF_RECOMPRESS_LEVEL = 6           # zlib level; higher levels save little more on scans
+TIFF_RECOMPRESS_WORKERS = min(4, os.cpu_count() or 1)
+TIFF_RECOMPRESS_STRIP_BYTES = 1024 * 1024  # Uncompressed bytes per output strip, bounds worker memory
+TIFF_RECOMPRESS_MIN_SAVING = 0.02   # Keep the original unless the rewrite is at least 2% smaller
+
+# Roll Package Settings
+PACKAGE_FORMAT = None  # 'tar' or 'zip' writes each processed roll as one container instead of a folder
+
+# Catalog Settings
+CATALOG_FILE = APP_DIR / "catalog.sqlite3"
+CATALOG_IMPORT_WORKERS = min(8, os.cpu_count() or 1)
+CATALOG_SEARCH_LIMIT = 500
+CATALOG_BATCH_SIZE = 500  # Rows per transaction during a rescan
+
+# Fixity Check Settings
+FIXITY_INTERVAL_DAYS = 90        # Frames verified more recently than this are not re-read
+FIXITY_WORKERS = 2               # Files read at once; more only helps on RAID or SSD
+FIXITY_RATE_MB_S = None          # Read cap outside working hours; None is unlimited
+FIXITY_WORKING_HOURS = (9, 18)   # Local hours, Monday to Friday, when the lower cap below applies
+FIXITY_WORKING_HOURS_RATE_MB_S = 10
+FIXITY_BATCH_SIZE = 50           # Results per catalog commit; bounds the work an interruption loses
+
+# Near-Duplicate Settings
+NEAR_DUPLICATE_MAX_DISTANCE = 10  # pHash bits (of 64) two rescans of one frame may differ by
+
+# Duplicate Detection Settings
+DUPLICATE_HASH_WORKERS = min(4, os.cpu_count() or 1)
+DUPLICATE_PARTIAL_BLOCK = 64 * 1024  # Bytes hashed from each end before a full hash
+
+# Validation Settings
+VALIDATION_WORKERS = min(4, os.cpu_count() or 1)  # Files structurally checked at once when added
+
+# Preferences Settings
+PREFERENCES_SAVE_DELAY = 1.0  # Seconds to coalesce favourite edits into one write
+USAGE_HALF_LIFE_DAYS = 90     # Suggestions favour stock used recently
+
+# Session Settings
+SESSION_FILE = APP_DIR / "session.json.gz"
+
+# Thumbnail Cache Settings
+THUMBNAIL_CACHE_DIR = CACHE_DIR / "thumbnails"
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Lightbox Settings
+LIGHTBOX_CELL_SIZE = 160
+LIGHTBOX_PADDING = 8
+CONTACT_SHEET_COLUMNS = 6
+CONTACT_SHEET_CELL_SIZE = 300
+
+# Decoding Budget Settings
+# Operators can lower the per-process cap with FILM_ARCHIVER_DECODE_MEMORY_MB
+def _env_megabytes(name, default):
+    """Positive whole number of MB from an environment variable, else default"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        megabytes = int(value)
+        if megabytes > 0:
+            return megabytes
+    except ValueError:
+        pass
+    logging.getLogger(__name__).warning(f"Ignoring {name}={value!r}: expected a number of MB; using {default}")
+    return default
+
+DECODE_MEMORY_LIMIT_MB = _env_megabytes('FILM_ARCHIVER_DECODE_MEMORY_MB', 1024)
+DECODE_DIRECT_LIMIT_MB = 256  # Larger decodes are downsampled strip by strip
+DECODE_BAND_MB = 32
+MAX_IMAGE_PIXELS = 4_000_000_000
+
+# Preview Tone Mapping Settings (16-bit and float scans)
+PREVIEW_BLACK_PERCENTILE = 0.1
+PREVIEW_WHITE_PERCENTILE = 99.9
+PREVIEW_GAMMA = 1.0        # Integer scans are normally gamma-encoded already
+PREVIEW_FLOAT_GAMMA = 2.2  # Float scans are normally linear
+
+# Preview Colour Management Settings
+PREVIEW_ICC_PROFILE = None  # Path to a display profile; None uses sRGB
+ICC_TRANSFORM_CACHE_SIZE = 16
+
+# Logging Settings
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# FILM_ARCHIVER_LOG_JSON=1 also writes structured JSON lines next to the text log
+LOG_JSON = os.environ.get('FILM_ARCHIVER_LOG_JSON', '') not in ('', '0')
+
+# Diagnostics Settings
+TRACE_ENABLED = os.environ.get('FILM_ARCHIVER_TRACE', '') not in ('', '0')
+TRACE_BUFFER_SIZE = 100_000  # Most recent spans kept for export
+PROFILE_DIR = LOG_DIR / "profiles"
+PROFILE_TOP_N = 40           # Rows in profile reports
+STALL_HEARTBEAT_MS = 20
+STALL_THRESHOLD_MS = 200     # Event loop delays longer than this are logged with a stack
+
 # Theme Colors
 LIGHT_THEME = {
     'bg': '#FFFFFF',
@@ -100,18 +217,59 @@ DARK_THEME = {
     'error': '#FF6B6B'
 }
 
-def configure_logging():
-    """Configure application logging"""
+_log_listener = None
+
+def configure_logging(json_lines=LOG_JSON):
+    """Configure application logging.
+    
+    Records are put on a queue by the calling thread and written by a
+    background listener, so a burst of warnings never blocks the UI.
+    """
+    global _log_listener
+    import atexit
+    import queue
+    from logging.handlers import QueueListener, RotatingFileHandler
+    from utils.structured_log import TracebackQueueHandler
+    
+    if _log_listener is not None:
+        return _log_listener
+    
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
     log_file = LOG_DIR / f"{APP_NAME.lower()}.log"
     
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                       backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    stream_handler = logging.StreamHandler()
+    handlers = [file_handler, stream_handler]
+    
+    if json_lines:
+        from utils.structured_log import JsonLinesFormatter
+        json_handler = RotatingFileHandler(LOG_DIR / f"{APP_NAME.lower()}.jsonl", maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    # Only the message and traceback are rendered on the caller's thread; the listener's handlers add the rest
+    queue_handler = TracebackQueueHandler(log_queue)
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    # Drain the queue on exit so the last records are not lost
+    atexit.register(stop_logging)
     
     # Set third-party loggers to WARNING level
     logging.getLogger('PIL').setLevel(logging.WARNING)
+    return _log_listener
+
+def stop_logging():
+    """Flush queued records and stop the background log writer"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
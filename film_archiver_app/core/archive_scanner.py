@@ -0,0 +1,345 @@
+"""
+Film Archiver - Archive Scanner
+
+Indexes existing archive trees (folders named like 001-M6-HP5-JAN24) into
+the catalog. Frames are hashed and measured on a thread pool; each roll is
+written in one transaction.
+
+A nightly job can keep the catalog current with an incremental rescan:
+
+    python -m core.archive_scanner /Volumes/Archive
+"""
+import os
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+from config.settings import SUPPORTED_FORMATS, CATALOG_IMPORT_WORKERS, CATALOG_BATCH_SIZE
+from core.catalog import FrameInfo, SOURCE_FIELDS, parse_roll_folder, parse_frame_number
+from core.decoding import open_image
+from core.duplicates import partial_hash
+from utils.hashing import file_hash
+
+logger = logging.getLogger(__name__)
+
+EXIF_IFD = 0x8769
+EXIF_DATE_TAGS = (36867, 36868)  # DateTimeOriginal, DateTimeDigitized
+DATETIME_TAG = 306
+
+
+def read_frame(path: str, frame_number: Optional[int] = None, source_path: Optional[str] = None,
+               capture_date=None, st: Optional[os.stat_result] = None) -> FrameInfo:
+    """Stat, hash and measure one archived file (dimensions from the header only)"""
+    path = os.path.abspath(path)
+    st = st or os.stat(path)
+    frame = FrameInfo(
+        path,
+        frame_number=frame_number if frame_number is not None else parse_frame_number(os.path.basename(path)),
+        source_path=source_path,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        inode=st.st_ino,
+        sha256=file_hash(path),
+        partial_sha256=partial_hash(path, st.st_size),
+        capture_date=capture_date.strftime("%Y-%m-%d") if capture_date else None,
+    )
+    try:
+        with open_image(path) as img:
+            frame.width, frame.height = img.size
+            if frame.capture_date is None:
+                frame.capture_date = _capture_date(img)
+    except Exception as e:
+        logger.debug(f"Could not read image header for {path}: {e}")
+    return frame
+
+
+def _capture_date(img) -> Optional[str]:
+    try:
+        exif = img.getexif()
+    except Exception:
+        return None
+    values = [exif.get_ifd(EXIF_IFD).get(tag) for tag in EXIF_DATE_TAGS] + [exif.get(DATETIME_TAG)]
+    for value in values:
+        if not value:
+            continue
+        try:
+            return datetime.strptime(str(value).strip('\x00'), "%Y:%m:%d %H:%M:%S").strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def find_roll_folders(root_dir: str):
+    """Yield (folder path, parsed roll details) for every roll folder under root_dir"""
+    for dirpath, dirnames, _ in os.walk(root_dir):
+        dirnames.sort()
+        roll = parse_roll_folder(os.path.basename(dirpath))
+        if roll:
+            yield dirpath, roll
+
+
+def list_frames(folder: str):
+    """Supported image files directly inside a roll folder, as DirEntries"""
+    with os.scandir(folder) as entries:
+        frames = [
+            entry for entry in entries
+            if entry.is_file() and not entry.name.startswith('.')
+            and os.path.splitext(entry.name)[1].lower() in SUPPORTED_FORMATS
+        ]
+    return sorted(frames, key=lambda entry: entry.name)
+
+
+def import_archive(catalog, root_dir: str, workers: int = CATALOG_IMPORT_WORKERS,
+                   progress: Optional[Callable[[int, int, str], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> dict:
+    """Index every roll folder under root_dir into the catalog.
+
+    progress(rolls_done, frames_done, folder) is called after each roll.
+    Returns {'rolls', 'frames', 'errors'}.
+    """
+    result = {'rolls': 0, 'frames': 0, 'errors': 0}
+
+    def read(entry):
+        try:
+            return read_frame(entry.path, st=entry.stat())
+        except OSError as e:
+            logger.warning(f"Skipping unreadable file {entry.path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-import") as executor:
+        for folder, roll in find_roll_folders(root_dir):
+            if cancelled and cancelled():
+                break
+            try:
+                frames = list(executor.map(read, list_frames(folder)))
+            except OSError as e:
+                logger.error(f"Error reading roll folder {folder}: {e}")
+                result['errors'] += 1
+                continue
+            result['errors'] += sum(1 for frame in frames if frame is None)
+            frames = [frame for frame in frames if frame is not None]
+
+            catalog.add_roll(folder, roll['roll_number'], roll['camera'], roll['film'],
+                             roll['roll_date'], frames)
+            result['rolls'] += 1
+            result['frames'] += len(frames)
+            if progress:
+                progress(result['rolls'], result['frames'], folder)
+
+    logger.info(f"Imported {result['rolls']} rolls ({result['frames']} frames) from {root_dir}")
+    return result
+
+
+def rescan_archive(catalog, root_dir: str, workers: int = CATALOG_IMPORT_WORKERS,
+                   progress: Optional[Callable[[int, int, str], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None,
+                   batch_size: int = CATALOG_BATCH_SIZE) -> dict:
+    """Bring the catalog up to date with root_dir, re-reading as little as possible.
+
+    Files whose (size, mtime_ns, inode) match their row are only stat'ed.
+    New paths are matched to rows that disappeared, first by inode (a
+    rename or move within the volume keeps the hash), then by content hash,
+    and recorded as moves. Rows left unmatched are deleted in batches, as
+    are rolls whose folders are gone. progress(rolls_seen, files_seen,
+    folder) is called per roll while walking. A cancelled scan leaves
+    frame rows untouched.
+    """
+    root_dir = os.path.abspath(root_dir)
+    known = {row['path']: row for row in catalog.frames_under(root_dir)}
+    result = dict.fromkeys(('unchanged', 'added', 'changed', 'moved', 'removed', 'rolls_removed'), 0)
+    result['cancelled'] = False
+
+    seen = set()
+    changed = []  # (row, path, stat, roll_id)
+    new = []      # (path, stat, roll_id)
+    rolls_seen = files_seen = 0
+
+    for folder, roll in find_roll_folders(root_dir):
+        if cancelled and cancelled():
+            result['cancelled'] = True
+            return result
+        roll_id = catalog.upsert_roll(folder, roll['roll_number'], roll['camera'], roll['film'],
+                                      roll['roll_date'])
+        try:
+            entries = list_frames(folder)
+        except OSError as e:
+            logger.error(f"Error reading roll folder {folder}: {e}")
+            # Keep its rows rather than deleting a roll that is only unreadable
+            seen.update(path for path in known if os.path.dirname(path) == folder)
+            continue
+
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError as e:
+                logger.warning(f"Skipping unreadable file {entry.path}: {e}")
+                seen.add(entry.path)
+                continue
+            row = known.get(entry.path)
+            if row is None:
+                new.append((entry.path, st, roll_id))
+                continue
+            seen.add(entry.path)
+            if (row['size'], row['mtime_ns'], row['inode'], row['roll_id']) == \
+                    (st.st_size, st.st_mtime_ns, st.st_ino, roll_id):
+                result['unchanged'] += 1
+            else:
+                changed.append((row, entry.path, st, roll_id))
+
+        rolls_seen += 1
+        files_seen += len(entries)
+        if progress:
+            progress(rolls_seen, files_seen, folder)
+
+    missing = {path: row for path, row in known.items() if path not in seen}
+    updates = []  # (frame id, roll_id, FrameInfo)
+    inserts = []  # (roll_id, FrameInfo)
+
+    # Same inode, size and mtime: renamed or moved without being rewritten
+    by_inode = {row['inode']: row for row in missing.values() if row['inode'] is not None}
+    unmatched = []
+    for path, st, roll_id in new:
+        row = by_inode.get(st.st_ino)
+        if row and (row['size'], row['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            del by_inode[st.st_ino]
+            del missing[row['path']]
+            updates.append((row['id'], roll_id, _moved_frame(row, path)))
+            result['moved'] += 1
+        else:
+            unmatched.append((path, st, roll_id))
+
+    def read(item):
+        path, st, roll_id, row = item
+        try:
+            frame = read_frame(path, st=st)
+            if row is not None:
+                _keep_source(frame, row)
+            return frame
+        except OSError as e:
+            logger.warning(f"Skipping unreadable file {path}: {e}")
+            return None
+
+    to_read = [(path, st, roll_id, row) for row, path, st, roll_id in changed]
+    to_read += [(path, st, roll_id, None) for path, st, roll_id in unmatched]
+    by_hash = {}
+    for row in missing.values():
+        if row['sha256']:
+            by_hash.setdefault(row['sha256'], []).append(row)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-rescan") as executor:
+        for (path, st, roll_id, row), frame in zip(to_read, executor.map(read, to_read)):
+            if cancelled and cancelled():
+                result['cancelled'] = True
+                return result
+            if frame is None:
+                continue
+            if row is not None:
+                updates.append((row['id'], roll_id, frame))
+                result['changed'] += 1
+                continue
+            # Same content under a new path: a copy-and-delete move
+            candidates = by_hash.get(frame.sha256)
+            if candidates:
+                moved = candidates.pop()
+                del missing[moved['path']]
+                _keep_source(frame, moved)
+                updates.append((moved['id'], roll_id, frame))
+                result['moved'] += 1
+            else:
+                inserts.append((roll_id, frame))
+                result['added'] += 1
+
+    for batch in _batches(updates, batch_size):
+        catalog.update_frames(batch)
+    for batch in _batches(inserts, batch_size):
+        catalog.insert_frames(batch)
+    stale = [row['id'] for row in missing.values()]
+    for batch in _batches(stale, batch_size):
+        catalog.delete_frames(batch)
+    result['removed'] = len(stale)
+
+    for roll in catalog.rolls_under(root_dir):
+        if not roll['frame_count'] and not os.path.isdir(roll['folder']):
+            catalog.remove_roll(roll['id'])
+            result['rolls_removed'] += 1
+
+    logger.info(f"Rescanned {root_dir}: {result['unchanged']} unchanged, {result['added']} added, "
+                f"{result['changed']} changed, {result['moved']} moved, {result['removed']} removed")
+    return result
+
+
+def refresh_frames(catalog, paths, workers: int = CATALOG_IMPORT_WORKERS,
+                   batch_size: int = CATALOG_BATCH_SIZE) -> int:
+    """Re-read catalogued files that were rewritten in place; returns the rows updated.
+
+    Frame numbers, capture dates and what is known about the source files
+    are kept; size, timestamps and hashes describe the new contents.
+    """
+    rows = [row for path in paths for row in catalog.find_frames(path=path)]
+
+    def read(row):
+        try:
+            frame = read_frame(row['path'], row['frame_number'])
+        except OSError as e:
+            logger.warning(f"Skipping unreadable file {row['path']}: {e}")
+            return None
+        frame.capture_date = row['capture_date'] or frame.capture_date
+        _keep_source(frame, row)
+        return frame
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-refresh") as executor:
+        updates = [(row['id'], row['roll_id'], frame)
+                   for row, frame in zip(rows, executor.map(read, rows)) if frame is not None]
+    for batch in _batches(updates, batch_size):
+        catalog.update_frames(batch)
+    return len(updates)
+
+
+def _moved_frame(row: dict, new_path: str) -> FrameInfo:
+    """The catalogued frame under its new path, without re-reading it"""
+    frame = FrameInfo(new_path, **{key: row[key] for key in FrameInfo.__slots__ if key != 'path'})
+    frame.frame_number = parse_frame_number(os.path.basename(new_path))
+    return frame
+
+
+def _keep_source(frame: FrameInfo, row: dict):
+    """Carry what is known about a frame's source file over to a re-read frame"""
+    frame.source_path = row['source_path']
+    for field in SOURCE_FIELDS:
+        setattr(frame, field, row[field])
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def main(argv=None):
+    import argparse
+    from core.catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Update the Film Archiver catalog from archive folders")
+    parser.add_argument("roots", nargs="+", help="archive folders to scan")
+    parser.add_argument("--full", action="store_true", help="re-read every file instead of rescanning")
+    parser.add_argument("--catalog", help="catalog database (default: the app's catalog)")
+    parser.add_argument("--workers", type=int, default=CATALOG_IMPORT_WORKERS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('PIL').setLevel(logging.WARNING)
+
+    catalog = Catalog(args.catalog) if args.catalog else Catalog()
+    try:
+        for root_dir in args.roots:
+            if args.full:
+                print(import_archive(catalog, root_dir, workers=args.workers))
+            else:
+                print(rescan_archive(catalog, root_dir, workers=args.workers))
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
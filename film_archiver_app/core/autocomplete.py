@@ -0,0 +1,119 @@
+"""
+Film Archiver - Prefix Index for Autocomplete
+"""
+import logging
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ('children', 'names')
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()
+
+
+class PrefixIndex:
+    """Trie over saved names for ranked, incremental completion.
+
+    Every word of a name is indexed, so "400" finds "PORTRA 400". Results are
+    ordered by the ranking passed to set_ranking (the preference manager's
+    usage order), then alphabetically. When a prefix matches nothing, an
+    optional fuzzy pass returns names that contain the typed characters in
+    order.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._root = _Node()
+        self._names = set()
+        self._rank = {}
+        names = list(names)
+        for name in names:
+            self.add(name)
+        self.set_ranking(names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return self._normalize(name) in self._names
+
+    def add(self, name: str):
+        """Index a name (no-op if already present)"""
+        name = self._normalize(name)
+        if not name or name in self._names:
+            return
+        self._names.add(name)
+        for key in self._keys(name):
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                node.names.add(name)
+
+    def remove(self, name: str):
+        """Drop a name and prune the branches it alone used"""
+        name = self._normalize(name)
+        if name not in self._names:
+            return
+        self._names.discard(name)
+        self._rank.pop(name, None)
+        for key in self._keys(name):
+            node = self._root
+            path = []
+            for char in key:
+                child = node.children.get(char)
+                if child is None:
+                    break
+                path.append((node, char, child))
+                child.names.discard(name)
+                node = child
+            for parent, char, child in reversed(path):
+                if child.names:
+                    break
+                del parent.children[char]
+
+    def set_ranking(self, ordered_names: Iterable[str]):
+        """Use the given order (best first) to rank completions"""
+        self._rank = {self._normalize(name): idx for idx, name in enumerate(ordered_names)}
+
+    def complete(self, prefix: str, limit: int = 50, fuzzy: bool = True) -> List[str]:
+        """Return up to `limit` names matching prefix, best first"""
+        prefix = self._normalize(prefix)
+        if not prefix:
+            return self._sorted(self._names)[:limit]
+
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                break
+        matches = self._sorted(node.names) if node is not None else []
+
+        if fuzzy and not matches:
+            matches = self._sorted(name for name in self._names
+                                   if self._is_subsequence(prefix, name))
+        return matches[:limit]
+
+    def _sorted(self, names) -> List[str]:
+        missing = len(self._rank)
+        return sorted(names, key=lambda name: (self._rank.get(name, missing), name))
+
+    @staticmethod
+    def _keys(name: str):
+        """The name itself plus every suffix starting at a word boundary"""
+        keys = [name]
+        for idx, char in enumerate(name):
+            if idx and name[idx - 1] in ' -_/' and char not in ' -_/':
+                keys.append(name[idx:])
+        return keys
+
+    @staticmethod
+    def _is_subsequence(needle: str, haystack: str) -> bool:
+        chars = iter(haystack)
+        return all(char in chars for char in needle.replace(' ', ''))
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip().upper()
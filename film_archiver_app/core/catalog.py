@@ -0,0 +1,475 @@
+"""
+Film Archiver - Archive Catalog
+
+A local SQLite index of processed rolls and their frames, so rolls can be
+found by camera, film, date or roll number without walking the archive.
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+
+from config.settings import CATALOG_FILE, CATALOG_SEARCH_LIMIT
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rolls (
+    id INTEGER PRIMARY KEY,
+    roll_number INTEGER,
+    camera TEXT NOT NULL,
+    film TEXT NOT NULL,
+    roll_date TEXT,
+    folder TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    roll_id INTEGER NOT NULL REFERENCES rolls(id) ON DELETE CASCADE,
+    frame_number INTEGER,
+    path TEXT NOT NULL UNIQUE,
+    source_path TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    sha256 TEXT,
+    width INTEGER,
+    height INTEGER,
+    capture_date TEXT,
+    dhash INTEGER,
+    phash INTEGER,
+    verified_at REAL,
+    fixity TEXT,
+    partial_sha256 TEXT,
+    source_size INTEGER,
+    source_sha256 TEXT,
+    source_partial_sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS rolls_camera_film_date ON rolls(camera, film, roll_date);
+CREATE INDEX IF NOT EXISTS rolls_film_date ON rolls(film, roll_date);
+CREATE INDEX IF NOT EXISTS rolls_date ON rolls(roll_date);
+CREATE INDEX IF NOT EXISTS rolls_number ON rolls(roll_number);
+CREATE INDEX IF NOT EXISTS frames_roll ON frames(roll_id, frame_number);
+CREATE INDEX IF NOT EXISTS frames_sha256 ON frames(sha256);
+CREATE INDEX IF NOT EXISTS frames_inode ON frames(inode);
+CREATE INDEX IF NOT EXISTS frames_capture_date ON frames(capture_date);
+CREATE INDEX IF NOT EXISTS frames_size ON frames(size);
+CREATE INDEX IF NOT EXISTS frames_source_size ON frames(source_size);
+CREATE INDEX IF NOT EXISTS frames_fixity ON frames(fixity);
+"""
+
+# Changes for catalogs created by an older version, applied before SCHEMA
+MIGRATIONS = {
+    3: ["ALTER TABLE frames ADD COLUMN dhash INTEGER",
+        "ALTER TABLE frames ADD COLUMN phash INTEGER"],
+    4: ["ALTER TABLE frames ADD COLUMN verified_at REAL",
+        "ALTER TABLE frames ADD COLUMN fixity TEXT"],
+    5: ["ALTER TABLE frames ADD COLUMN partial_sha256 TEXT",
+        "ALTER TABLE frames ADD COLUMN source_size INTEGER",
+        "ALTER TABLE frames ADD COLUMN source_sha256 TEXT",
+        "ALTER TABLE frames ADD COLUMN source_partial_sha256 TEXT"],
+}
+
+# Folder and file names written by RollProcessor, e.g. 001-M6-HP5-JAN24/001-01-M6-HP5.jpg
+ROLL_FOLDER_PATTERN = re.compile(r"^(\d{3,})-(.+)-([^-]+)-([A-Za-z]{3})(\d{2})$")
+FRAME_FILE_PATTERN = re.compile(r"^(\d{3,})-(\d{2,})-")
+
+FRAME_FIELDS = ('frame_number', 'path', 'source_path', 'size', 'mtime_ns', 'inode',
+                'sha256', 'width', 'height', 'capture_date', 'partial_sha256',
+                'source_size', 'source_sha256', 'source_partial_sha256')
+
+# Size and hashes of the file a frame was processed from, before renaming and re-dating
+SOURCE_FIELDS = ('source_size', 'source_sha256', 'source_partial_sha256')
+
+
+class FrameInfo:
+    """One archived frame as stored in the catalog"""
+
+    __slots__ = FRAME_FIELDS
+
+    def __init__(self, path, frame_number=None, source_path=None, size=None, mtime_ns=None,
+                 inode=None, sha256=None, width=None, height=None, capture_date=None,
+                 partial_sha256=None, source_size=None, source_sha256=None, source_partial_sha256=None):
+        self.path = path
+        self.frame_number = frame_number
+        self.source_path = source_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.sha256 = sha256
+        self.width = width
+        self.height = height
+        self.capture_date = capture_date
+        self.partial_sha256 = partial_sha256
+        self.source_size = source_size
+        self.source_sha256 = source_sha256
+        self.source_partial_sha256 = source_partial_sha256
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, field) for field in FRAME_FIELDS)
+
+
+def parse_roll_folder(name: str) -> Optional[dict]:
+    """Roll details from a folder name like 001-M6-HP5-JAN24, or None.
+
+    Names are split on hyphens, so a hyphen inside a camera or film name is
+    ambiguous; the last segment is taken as the film.
+    """
+    match = ROLL_FOLDER_PATTERN.match(name)
+    if not match:
+        return None
+    roll_number, camera, film, month, year = match.groups()
+    try:
+        roll_date = datetime.strptime(f"{month.title()}{year}", "%b%y").date()
+    except ValueError:
+        return None
+    return {
+        'roll_number': int(roll_number),
+        'camera': camera,
+        'film': film,
+        'roll_date': roll_date,
+    }
+
+
+def parse_frame_number(filename: str) -> Optional[int]:
+    match = FRAME_FILE_PATTERN.match(filename)
+    return int(match.group(2)) if match else None
+
+
+def _date_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+class Catalog:
+    """SQLite catalog of rolls and frames.
+
+    One connection is shared between the UI and worker threads and guarded
+    by a lock; WAL mode keeps readers from blocking behind a bulk import.
+    """
+
+    def __init__(self, db_path=CATALOG_FILE):
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                if version:
+                    for target in range(version + 1, SCHEMA_VERSION + 1):
+                        for statement in MIGRATIONS.get(target, ()):
+                            self._conn.execute(statement)
+                self._conn.executescript(SCHEMA)
+                self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                self._conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """Group writes into one commit (rolled back on error)"""
+        with self._lock:
+            try:
+                yield self._conn
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Writing
+
+    def add_roll(self, folder: str, roll_number: Optional[int], camera: str, film: str,
+                 roll_date=None, frames: Iterable[FrameInfo] = ()) -> int:
+        """Insert or update a roll by folder and replace its frames; returns the roll id"""
+        with self.transaction() as conn:
+            roll_id = self._upsert_roll(conn, folder, roll_number, camera, film, roll_date)
+            conn.execute("DELETE FROM frames WHERE roll_id = ?", (roll_id,))
+            self._insert_frames(conn, roll_id, frames)
+        return roll_id
+
+    def upsert_roll(self, folder: str, roll_number: Optional[int], camera: str, film: str,
+                    roll_date=None) -> int:
+        """Insert or update a roll by folder, keeping its frames; returns the roll id"""
+        with self.transaction() as conn:
+            return self._upsert_roll(conn, folder, roll_number, camera, film, roll_date)
+
+    @staticmethod
+    def _upsert_roll(conn, folder, roll_number, camera, film, roll_date) -> int:
+        folder = os.path.abspath(folder)
+        conn.execute(
+            "INSERT INTO rolls (roll_number, camera, film, roll_date, folder, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(folder) DO UPDATE SET roll_number=excluded.roll_number, "
+            "camera=excluded.camera, film=excluded.film, roll_date=excluded.roll_date",
+            (roll_number, camera.upper(), film.upper(), _date_text(roll_date), folder, time.time())
+        )
+        return conn.execute("SELECT id FROM rolls WHERE folder = ?", (folder,)).fetchone()[0]
+
+    def add_frames(self, roll_id: int, frames: Iterable[FrameInfo]):
+        with self.transaction() as conn:
+            self._insert_frames(conn, roll_id, frames)
+
+    @staticmethod
+    def _insert_frames(conn, roll_id, frames):
+        conn.executemany(
+            f"INSERT OR REPLACE INTO frames (roll_id, {', '.join(FRAME_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in FRAME_FIELDS)})",
+            ((roll_id, *frame.to_row()) for frame in frames)
+        )
+
+    def insert_frames(self, rows):
+        """Insert (roll_id, FrameInfo) pairs in one transaction"""
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO frames (roll_id, {', '.join(FRAME_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in FRAME_FIELDS)})",
+                ((roll_id, *frame.to_row()) for roll_id, frame in rows)
+            )
+
+    def update_frames(self, rows):
+        """Rewrite frames from (frame id, roll_id, FrameInfo) triples in one transaction.
+
+        Perceptual hashes and fixity results are kept only when the content
+        hash is unchanged.
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE frames SET dhash = CASE WHEN sha256 IS ? THEN dhash END, "
+                "phash = CASE WHEN sha256 IS ? THEN phash END, "
+                "verified_at = CASE WHEN sha256 IS ? THEN verified_at END, "
+                "fixity = CASE WHEN sha256 IS ? THEN fixity END, "
+                f"roll_id = ?, {', '.join(f'{field} = ?' for field in FRAME_FIELDS)} WHERE id = ?",
+                ((*(frame.sha256,) * 4, roll_id, *frame.to_row(), frame_id)
+                 for frame_id, roll_id, frame in rows)
+            )
+
+    def set_perceptual_hashes(self, rows):
+        """Store (frame id, dhash, phash) triples (signed 64-bit integers)"""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE frames SET dhash = ?, phash = ? WHERE id = ?",
+                             ((dhash, phash, frame_id) for frame_id, dhash, phash in rows))
+
+    def set_fixity(self, rows):
+        """Store (frame id, verified_at, fixity status) results of a fixity check"""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE frames SET verified_at = ?, fixity = ? WHERE id = ?",
+                             ((verified_at, status, frame_id) for frame_id, verified_at, status in rows))
+
+    def delete_frames(self, frame_ids):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM frames WHERE id = ?", ((frame_id,) for frame_id in frame_ids))
+
+    def remove_roll(self, roll_id: int):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rolls WHERE id = ?", (roll_id,))
+
+    # Querying
+
+    def find_rolls(self, camera: str = None, film: str = None, year: int = None,
+                   date_from=None, date_to=None, roll_number: int = None, text: str = None,
+                   limit: int = CATALOG_SEARCH_LIMIT) -> List[dict]:
+        """Rolls matching every given filter, newest first.
+
+        camera and film match by prefix, text matches anywhere in the folder path.
+        """
+        clauses, params = [], []
+        if camera:
+            clauses.append("r.camera >= ? AND r.camera < ?")
+            params.extend(_prefix_range(camera.upper()))
+        if film:
+            clauses.append("r.film >= ? AND r.film < ?")
+            params.extend(_prefix_range(film.upper()))
+        if year:
+            date_from = date_from or f"{int(year):04d}-01-01"
+            date_to = date_to or f"{int(year):04d}-12-31"
+        if date_from:
+            clauses.append("r.roll_date >= ?")
+            params.append(_date_text(date_from))
+        if date_to:
+            clauses.append("r.roll_date <= ?")
+            params.append(_date_text(date_to))
+        if roll_number is not None:
+            clauses.append("r.roll_number = ?")
+            params.append(int(roll_number))
+        if text:
+            clauses.append("r.folder LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(text)}%")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            "SELECT r.*, (SELECT COUNT(*) FROM frames f WHERE f.roll_id = r.id) AS frame_count "
+            f"FROM rolls r {where} ORDER BY r.roll_date DESC, r.roll_number DESC LIMIT ?"
+        )
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def roll_frames(self, roll_id: int) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM frames WHERE roll_id = ? ORDER BY frame_number, path", (roll_id,)
+            )
+            return [dict(row) for row in rows]
+
+    def find_frames(self, sha256: str = None, inode: int = None, path: str = None) -> List[dict]:
+        clauses, params = [], []
+        if sha256:
+            clauses.append("sha256 = ?")
+            params.append(sha256)
+        if inode is not None:
+            clauses.append("inode = ?")
+            params.append(inode)
+        if path:
+            clauses.append("path = ?")
+            params.append(os.path.abspath(path))
+        if not clauses:
+            return []
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM frames WHERE {' AND '.join(clauses)}", params)
+            return [dict(row) for row in rows]
+
+    def frames_under(self, root_dir: str) -> List[dict]:
+        """Every catalogued frame whose path is inside root_dir"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM frames WHERE path >= ? AND path < ?", _path_range(root_dir)
+            )
+            return [dict(row) for row in rows]
+
+    def frames_missing_hashes(self, roll_id: Optional[int] = None) -> List[dict]:
+        """Frames without a perceptual hash, optionally limited to one roll"""
+        sql = "SELECT id, path FROM frames WHERE phash IS NULL"
+        params = ()
+        if roll_id is not None:
+            sql += " AND roll_id = ?"
+            params = (roll_id,)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def perceptual_hashes(self, roll_id: Optional[int] = None) -> List[dict]:
+        """id, roll_id, path, dhash and phash of every hashed frame"""
+        sql = "SELECT id, roll_id, path, dhash, phash FROM frames WHERE phash IS NOT NULL"
+        params = ()
+        if roll_id is not None:
+            sql += " AND roll_id = ?"
+            params = (roll_id,)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def fixity_queue(self, verified_before: float, limit: int = -1) -> List[dict]:
+        """Hashed frames not verified since verified_before, longest-unverified roll first.
+
+        A roll's age is that of its least recently verified frame, so rolls
+        with frames that were never checked come first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.id, f.roll_id, f.path, f.size, f.sha256, f.verified_at FROM frames f "
+                "JOIN (SELECT roll_id, MIN(COALESCE(verified_at, 0)) AS oldest FROM frames "
+                "GROUP BY roll_id) r ON r.roll_id = f.roll_id "
+                "WHERE f.sha256 IS NOT NULL AND (f.verified_at IS NULL OR f.verified_at < ?) "
+                "ORDER BY r.oldest, f.roll_id, f.frame_number, f.path LIMIT ?",
+                (verified_before, limit)
+            )
+            return [dict(row) for row in rows]
+
+    def fixity_problems(self) -> List[dict]:
+        """Frames whose last fixity check failed, with their roll folder"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.id, f.path, f.size, f.sha256, f.verified_at, f.fixity, r.folder FROM frames f "
+                "JOIN rolls r ON r.id = f.roll_id WHERE f.fixity IS NOT NULL AND f.fixity != 'ok' "
+                "ORDER BY r.folder, f.frame_number, f.path"
+            )
+            return [dict(row) for row in rows]
+
+    def fixity_stats(self) -> dict:
+        """Frame counts by fixity status ('unverified' for never-checked frames), and the oldest check"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(fixity, 'unverified'), COUNT(*) FROM frames GROUP BY fixity"
+            ).fetchall()
+            oldest = self._conn.execute("SELECT MIN(verified_at) FROM frames").fetchone()[0]
+        counts = {status: count for status, count in rows}
+        counts['oldest_verified_at'] = oldest
+        return counts
+
+    def frames_with_sizes(self, sizes, chunk_size=500) -> List[dict]:
+        """Path, sizes and full and partial hashes of every frame whose archived
+        or source size is in sizes"""
+        sizes = list(sizes)
+        results = {}
+        columns = "id, path, size, sha256, partial_sha256, source_size, source_sha256, source_partial_sha256"
+        with self._lock:
+            for start in range(0, len(sizes), chunk_size):
+                chunk = sizes[start:start + chunk_size]
+                marks = ', '.join('?' for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM frames WHERE size IN ({marks}) "
+                    f"UNION SELECT {columns} FROM frames WHERE source_size IN ({marks})",
+                    chunk + chunk
+                )
+                results.update((row['id'], dict(row)) for row in rows)
+        return list(results.values())
+
+    def rolls_under(self, root_dir: str) -> List[dict]:
+        """Rolls whose folder is inside root_dir, with their frame counts"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.*, (SELECT COUNT(*) FROM frames f WHERE f.roll_id = r.id) AS frame_count "
+                "FROM rolls r WHERE (folder >= ? AND folder < ?) OR folder = ?",
+                (*_path_range(root_dir), os.path.abspath(root_dir))
+            )
+            return [dict(row) for row in rows]
+
+    def distinct(self, column: str) -> List[str]:
+        """Distinct cameras or films, for search suggestions"""
+        if column not in ('camera', 'film'):
+            raise ValueError(f"Cannot list distinct {column}")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT {column} FROM rolls ORDER BY {column}")
+            return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            rolls = self._conn.execute("SELECT COUNT(*) FROM rolls").fetchone()[0]
+            frames, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM frames"
+            ).fetchone()
+        return {'rolls': rolls, 'frames': frames, 'bytes': total_bytes}
+
+
+def _prefix_range(prefix: str):
+    """Bounds for an index-friendly prefix match (LIKE cannot use the index)"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _path_range(root_dir: str):
+    """Bounds matching every path below root_dir (uses the unique path index)"""
+    prefix = os.path.join(os.path.abspath(root_dir), '')
+    return _prefix_range(prefix)
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
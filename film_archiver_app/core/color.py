@@ -0,0 +1,116 @@
+"""
+Film Archiver - Preview Colour Management
+"""
+import io
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+from config.settings import PREVIEW_ICC_PROFILE, ICC_TRANSFORM_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# ImageCms loads LittleCMS, so it is imported with the first profile seen
+ImageCms = None
+_imagecms_checked = False
+
+
+def _load_imagecms() -> bool:
+    """Import ImageCms on first use; False if Pillow lacks LittleCMS"""
+    global ImageCms, _imagecms_checked
+    if not _imagecms_checked:
+        _imagecms_checked = True
+        try:
+            from PIL import ImageCms as cms
+            ImageCms = cms
+        except ImportError:
+            logger.info("Pillow was built without LittleCMS; previews are not colour managed")
+    return ImageCms is not None
+
+
+class ColorManager:
+    """Convert thumbnails from their embedded ICC profile to the display profile.
+
+    Building an ImageCms transform is far more expensive than applying it to
+    a 300 px thumbnail, so transforms are cached in an LRU keyed by
+    (source profile hash, target profile, mode). Profiles that cannot be
+    used are cached as None so they are not retried for every frame.
+    """
+
+    def __init__(self, target_profile=PREVIEW_ICC_PROFILE, max_entries=ICC_TRANSFORM_CACHE_SIZE):
+        self.target_name = str(target_profile or 'sRGB')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._target = None
+        self._transforms = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return _load_imagecms()
+
+    def apply(self, img: Image.Image, icc_profile: Optional[bytes]) -> Image.Image:
+        """Return img converted to the display profile (RGB), or img unchanged"""
+        if not icc_profile or img.mode not in ('RGB', 'L', 'CMYK') or not _load_imagecms():
+            return img
+
+        transform = self._get_transform(icc_profile, img.mode)
+        if transform is None:
+            return img
+        try:
+            return ImageCms.applyTransform(img, transform)
+        except Exception as e:
+            logger.debug(f"Could not apply colour transform: {e}")
+            return img
+
+    def stats(self) -> dict:
+        """Transform cache counters for instrumentation"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._transforms),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get_transform(self, icc_profile: bytes, mode: str):
+        key = (hashlib.sha1(icc_profile).hexdigest(), self.target_name, mode)
+        with self._lock:
+            if key in self._transforms:
+                self.hits += 1
+                self._transforms.move_to_end(key)
+                return self._transforms[key]
+            self.misses += 1
+
+        transform = self._build_transform(icc_profile, mode)
+
+        with self._lock:
+            self._transforms[key] = transform
+            while len(self._transforms) > self.max_entries:
+                self._transforms.popitem(last=False)
+        return transform
+
+    def _build_transform(self, icc_profile: bytes, mode: str):
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            return ImageCms.buildTransform(
+                source, self._get_target(), mode, 'RGB',
+                renderingIntent=ImageCms.Intent.PERCEPTUAL
+            )
+        except Exception as e:
+            logger.debug(f"Ignoring unusable ICC profile for {mode} image: {e}")
+            return None
+
+    def _get_target(self):
+        if self._target is None:
+            if self.target_name == 'sRGB':
+                self._target = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB'))
+            else:
+                self._target = ImageCms.ImageCmsProfile(self.target_name)
+        return self._target
@@ -0,0 +1,86 @@
+"""
+Film Archiver - Contact Sheet Export
+"""
+import logging
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+from PIL import Image, ImageDraw
+
+from config.settings import (
+    CONTACT_SHEET_COLUMNS, CONTACT_SHEET_CELL_SIZE, LIGHTBOX_PADDING,
+    THUMBNAIL_QUALITY
+)
+
+logger = logging.getLogger(__name__)
+
+LABEL_HEIGHT = 18
+
+
+def export_contact_sheet(thumbnail_cache, files: Sequence[str], labels: Sequence[str],
+                         output_path: str, columns: int = CONTACT_SHEET_COLUMNS,
+                         cell_size: int = CONTACT_SHEET_CELL_SIZE,
+                         progress: Optional[Callable[[int, int], None]] = None) -> bool:
+    """Compose a contact sheet for a roll and save it to output_path.
+
+    Tiles are pulled from the shared thumbnail cache through a bounded window
+    of in-flight jobs and pasted as they arrive, so only the sheet itself and
+    a handful of thumbnails are in memory at any time.
+    """
+    if not files:
+        return False
+
+    try:
+        columns = max(1, min(columns, len(files)))
+        rows = (len(files) + columns - 1) // columns
+        pad = LIGHTBOX_PADDING
+        cell_w = cell_size + pad
+        cell_h = cell_size + LABEL_HEIGHT + pad
+
+        sheet = Image.new('RGB', (columns * cell_w + pad, rows * cell_h + pad), 'white')
+        draw = ImageDraw.Draw(sheet)
+        size = (cell_size, cell_size)
+
+        for idx, tile in _stream_tiles(thumbnail_cache, files, size, window=columns * 2):
+            col, row = idx % columns, idx // columns
+            x0 = pad + col * cell_w
+            y0 = pad + row * cell_h
+
+            if tile is not None:
+                if tile.mode != 'RGB':
+                    tile = tile.convert('RGB')
+                if tile.width > cell_size or tile.height > cell_size:
+                    tile = tile.copy()
+                    tile.thumbnail(size, Image.Resampling.LANCZOS)
+                sheet.paste(tile, (x0 + (cell_size - tile.width) // 2,
+                                   y0 + (cell_size - tile.height) // 2))
+            else:
+                draw.rectangle([x0, y0, x0 + cell_size - 1, y0 + cell_size - 1], outline='#999999')
+
+            draw.text((x0, y0 + cell_size + 3), labels[idx], fill='black')
+
+            if progress:
+                progress(idx + 1, len(files))
+
+        sheet.save(output_path, quality=THUMBNAIL_QUALITY)
+        return True
+
+    except Exception as e:
+        logger.error(f"Error exporting contact sheet to {output_path}: {e}")
+        return False
+
+
+def _stream_tiles(thumbnail_cache, files: Sequence[str], size, window: int):
+    """Yield (index, thumbnail) in order, keeping at most `window` jobs queued"""
+    pending = deque()
+    next_idx = 0
+    while next_idx < len(files) or pending:
+        while next_idx < len(files) and len(pending) < window:
+            pending.append((next_idx, thumbnail_cache.submit(files[next_idx], size)))
+            next_idx += 1
+        idx, future = pending.popleft()
+        try:
+            yield idx, future.result()
+        except Exception as e:
+            logger.error(f"Error creating contact sheet tile for {files[idx]}: {e}")
+            yield idx, None
@@ -0,0 +1,286 @@
+"""
+Film Archiver - Memory-Safe Decoding
+"""
+import os
+import logging
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+from config.settings import (
+    DECODE_MEMORY_LIMIT_MB, DECODE_DIRECT_LIMIT_MB, DECODE_BAND_MB
+)
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Bytes per pixel of Pillow's in-memory storage (RGB is padded to 4 bytes)
+_STORAGE_BYTES = {
+    '1': 1, 'L': 1, 'P': 1,
+    'I;16': 2, 'I;16B': 2, 'I;16L': 2, 'I;16N': 2,
+}
+
+# Modes that cannot be resampled directly and the mode they are reduced in
+_WORKING_MODES = {
+    '1': 'L',
+    'P': 'RGB',
+    'PA': 'RGBA',
+    'I;16': 'I', 'I;16B': 'I', 'I;16L': 'I', 'I;16N': 'I',
+}
+
+
+# Pillow plugin and format to try first for each extension. Opening through
+# these avoids Image.init(), which imports every plugin Pillow ships.
+_PLUGINS = {
+    '.jpg': ('JpegImagePlugin', 'JPEG'),
+    '.jpeg': ('JpegImagePlugin', 'JPEG'),
+    '.png': ('PngImagePlugin', 'PNG'),
+    '.tif': ('TiffImagePlugin', 'TIFF'),
+    '.tiff': ('TiffImagePlugin', 'TIFF'),
+    '.bmp': ('BmpImagePlugin', 'BMP'),
+    '.webp': ('WebPImagePlugin', 'WEBP'),
+    '.psd': ('PsdImagePlugin', 'PSD'),
+    '.j2k': ('Jpeg2KImagePlugin', 'JPEG2000'),
+    # TIFF-based RAW containers open as their first IFD
+    '.dng': ('TiffImagePlugin', 'TIFF'),
+    '.cr2': ('TiffImagePlugin', 'TIFF'),
+    '.nef': ('TiffImagePlugin', 'TIFF'),
+    '.arw': ('TiffImagePlugin', 'TIFF'),
+}
+
+
+def open_image(path: str) -> Image.Image:
+    """Image.open that loads only the plugin matching the file extension.
+
+    Falls back to Pillow's full plugin scan when the extension is unknown or
+    does not match the content.
+    """
+    spec = _PLUGINS.get(os.path.splitext(path)[1].lower())
+    if spec:
+        module, image_format = spec
+        try:
+            importlib.import_module(f"PIL.{module}")
+            return Image.open(path, formats=[image_format])
+        except (ImportError, UnidentifiedImageError):
+            pass
+    return Image.open(path)
+
+
+class DecodeBudgetError(Exception):
+    """Raised when an image cannot be decoded within the memory cap"""
+
+
+class ImageHeader:
+    """Dimensions and storage facts read from an image header without decoding"""
+
+    def __init__(self, img: Image.Image):
+        self.format = img.format
+        self.mode = img.mode
+        self.size = img.size
+        self.frames = getattr(img, 'n_frames', 1)
+        self.bits = self._bits_per_sample(img)
+        self.row_bytes = self._row_bytes(img)
+        self.band_decodable = bool(
+            img.tile
+            and getattr(img, 'filename', None)
+            and all(tile[0] == 'raw' for tile in img.tile)
+            and (len(img.tile) > 1 or self.row_bytes)
+        )
+
+    @property
+    def pixels(self) -> int:
+        return self.size[0] * self.size[1]
+
+    def storage_bytes(self) -> int:
+        """Memory needed to hold the decoded frame"""
+        return self.pixels * _STORAGE_BYTES.get(self.mode, 4)
+
+    def peak_bytes(self) -> int:
+        """Estimated peak memory for decoding plus one working copy"""
+        working_mode = _WORKING_MODES.get(self.mode)
+        copy_bytes = self.pixels * _STORAGE_BYTES.get(working_mode, 4) if working_mode else 0
+        return self.storage_bytes() + copy_bytes
+
+    @staticmethod
+    def _bits_per_sample(img: Image.Image) -> int:
+        tags = getattr(img, 'tag_v2', None)
+        if tags is not None and 258 in tags:
+            bits = tags[258]
+            return max(bits) if isinstance(bits, tuple) else int(bits)
+        if img.mode.startswith('I;16'):
+            return 16
+        if img.mode in ('I', 'F'):
+            return 32
+        return 1 if img.mode == '1' else 8
+
+    @staticmethod
+    def _row_bytes(img: Image.Image) -> int:
+        """Packed bytes per row of a chunky uncompressed TIFF, else 0"""
+        tags = getattr(img, 'tag_v2', None)
+        if tags is None or tags.get(284, 1) != 1 or 258 not in tags:
+            return 0
+        bits = tags[258]
+        bits_per_pixel = sum(bits) if isinstance(bits, tuple) else int(bits) * tags.get(277, 1)
+        return (img.size[0] * bits_per_pixel + 7) // 8
+
+
+class DecodeBudget:
+    """Process-wide cap on memory held by concurrent image decodes.
+
+    Workers reserve their estimated peak before decoding and block until
+    enough of the cap is free; a reservation larger than the whole cap waits
+    for exclusive use.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        nbytes = min(max(nbytes, 0), self.limit)
+        with self._cond:
+            while self.in_use + nbytes > self.limit:
+                self._cond.wait()
+            self.in_use += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_use -= nbytes
+                self._cond.notify_all()
+
+    def set_limit(self, limit_bytes: int):
+        with self._cond:
+            self.limit = limit_bytes
+            self._cond.notify_all()
+
+
+_budget = DecodeBudget(DECODE_MEMORY_LIMIT_MB * MB)
+
+
+def get_decode_budget() -> DecodeBudget:
+    """Return the per-process decode budget"""
+    return _budget
+
+
+def set_memory_limit(limit_mb: int):
+    """Change the per-process decode memory cap"""
+    _budget.set_limit(limit_mb * MB)
+    logger.info(f"Decode memory limit set to {limit_mb} MB")
+
+
+def load_for_preview(img: Image.Image, size: Tuple[int, int],
+                     budget: Optional[DecodeBudget] = None) -> Image.Image:
+    """Decode an opened image into a copy at least twice `size`.
+
+    JPEGs are DCT-scaled while decoding. Other images are decoded whole when
+    their estimated peak fits DECODE_DIRECT_LIMIT_MB, otherwise uncompressed
+    strips/tiles are decoded and downsampled band by band. Only the first
+    frame of multi-frame files is read. High bit depth data stays in 'I'
+    mode so callers can tone map it.
+    """
+    budget = budget or _budget
+    target = (size[0] * 2, size[1] * 2)
+
+    if img.format == 'JPEG':
+        img.draft(img.mode if img.mode in ('L', 'RGB') else 'RGB', target)
+
+    header = ImageHeader(img)
+    peak = header.peak_bytes()
+
+    if peak > DECODE_DIRECT_LIMIT_MB * MB and header.band_decodable:
+        logger.debug(f"Band decoding {img.filename}: {header.size[0]}x{header.size[1]} "
+                     f"{header.mode}, ~{peak // MB} MB peak")
+        return _load_in_bands(img, header, target, budget)
+
+    if peak > budget.limit:
+        raise DecodeBudgetError(
+            f"{header.size[0]}x{header.size[1]} {header.mode} image needs ~{peak // MB} MB, "
+            f"over the {budget.limit // MB} MB decode limit"
+        )
+
+    with budget.reserve(peak):
+        img.load()
+        working_mode = _WORKING_MODES.get(img.mode)
+        if working_mode:
+            img = img.convert(working_mode)
+        factor = _reduce_factor(img.size, target)
+        if factor > 1:
+            img = img.reduce(factor)
+        return img
+
+
+def _reduce_factor(size: Tuple[int, int], target: Tuple[int, int]) -> int:
+    return max(1, min(size[0] // target[0], size[1] // target[1]))
+
+
+def _load_in_bands(img: Image.Image, header: ImageHeader, target: Tuple[int, int],
+                   budget: DecodeBudget) -> Image.Image:
+    """Decode groups of strips/tiles separately and box-downsample each"""
+    width, height = header.size
+    scale = max(1.0, min(width / target[0], height / target[1]))
+    out_w, out_h = max(1, round(width / scale)), max(1, round(height / scale))
+    working_mode = _WORKING_MODES.get(header.mode, header.mode)
+    output = Image.new(working_mode, (out_w, out_h))
+
+    row_bytes = width * (_STORAGE_BYTES.get(header.mode, 4) + 4)
+    band_rows = max(1, (DECODE_BAND_MB * MB) // row_bytes)
+
+    source_tiles = _split_tall_tiles(img.tile, header, band_rows)
+    for y0, y1 in _band_ranges(source_tiles, band_rows):
+        tiles = [
+            (name, (box[0], box[1] - y0, box[2], box[3] - y0), offset, args)
+            for name, box, offset, args in source_tiles
+            if box[1] >= y0 and box[3] <= y1
+        ]
+        with budget.reserve((y1 - y0) * row_bytes):
+            with open_image(img.filename) as band:
+                band.tile = tiles
+                band._size = (width, y1 - y0)
+                band.load()
+                strip = band.convert(working_mode) if band.mode != working_mode else band
+                oy0 = round(y0 * out_h / height)
+                oy1 = max(oy0 + 1, round(y1 * out_h / height))
+                output.paste(strip.resize((out_w, oy1 - oy0), Image.Resampling.BOX), (0, oy0))
+
+    output.info = dict(img.info)
+    return output
+
+
+def _split_tall_tiles(tiles, header: ImageHeader, band_rows: int):
+    """Cut full-width strips taller than a band into band-sized pieces"""
+    if not header.row_bytes:
+        return tiles
+    width = header.size[0]
+    result = []
+    for name, box, offset, args in tiles:
+        x0, y0, x1, y1 = box
+        if x0 != 0 or x1 != width or y1 - y0 <= band_rows or args[1] not in (0, header.row_bytes):
+            result.append((name, box, offset, args))
+            continue
+        for row in range(y0, y1, band_rows):
+            result.append((name, (x0, row, x1, min(row + band_rows, y1)),
+                           offset + (row - y0) * header.row_bytes, args))
+    return result
+
+
+def _band_ranges(tiles, band_rows: int):
+    """Group the distinct tile row ranges into bands of about band_rows rows"""
+    edges = sorted({(box[1], box[3]) for _, box, _, _ in tiles})
+    start = end = None
+    for y0, y1 in edges:
+        if start is None:
+            start, end = y0, y1
+        elif y1 - start > band_rows:
+            yield start, end
+            start, end = y0, y1
+        else:
+            end = max(end, y1)
+    if start is not None:
+        yield start, end
@@ -0,0 +1,302 @@
+"""
+Film Archiver - Web Proxies
+
+JPEG proxies are written next to each roll's masters, one folder per preset:
+
+    001-M6-HP5-JAN24/_proxies/web/001-01-M6-HP5.jpg
+
+Each master is decoded once at a reduced resolution (JPEG DCT scaling,
+strip-wise downsampling of large TIFFs) and every preset is resized from
+that decode, largest first. Decoding runs on a process pool. A manifest in
+_proxies records each master's (size, mtime_ns) and the presets it was
+rendered with, so a re-run only renders masters that changed and removes
+proxies of masters that are gone.
+
+Proxies for a whole archive can be brought up to date with:
+
+    python -m core.derivatives /Volumes/Archive
+"""
+import os
+import sys
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from config.settings import (
+    DERIVATIVE_PRESETS, DERIVATIVE_DIR_NAME, DERIVATIVE_WORKERS, DECODE_MEMORY_LIMIT_MB
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# One FileManager per worker process
+_file_manager = None
+
+
+def _init_worker(memory_limit_mb: int):
+    """Share the decode memory cap between the worker processes"""
+    from core.decoding import set_memory_limit
+    set_memory_limit(memory_limit_mb)
+
+
+def render_pool(workers: int = DERIVATIVE_WORKERS) -> ProcessPoolExecutor:
+    """Process pool for render_derivatives, splitting the decode memory cap between workers.
+
+    Workers are spawned rather than forked: the parent may be running Tk and threads.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(max(64, DECODE_MEMORY_LIMIT_MB // workers),),
+    )
+
+
+def render_derivatives(source: str, outputs: List[Tuple[str, Tuple[int, int], int]]) -> List[str]:
+    """Write JPEG proxies of one master; runs in a worker process.
+
+    outputs are (path, max size, quality). The master is decoded once at
+    the largest size and each smaller proxy is resized from the previous one.
+    Returns the paths written.
+    """
+    global _file_manager
+    if _file_manager is None:
+        from core.file_manager import FileManager
+        _file_manager = FileManager()
+
+    outputs = sorted(outputs, key=lambda output: output[1][0] * output[1][1], reverse=True)
+    img = _file_manager.create_thumbnail(source, outputs[0][1])
+    if img is None:
+        raise OSError(f"could not decode {source}")
+
+    written = []
+    for path, size, quality in outputs:
+        img = img.copy()
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        img.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def proxy_dir(roll_folder: str) -> str:
+    return os.path.join(roll_folder, DERIVATIVE_DIR_NAME)
+
+
+def proxy_path(roll_folder: str, preset: str, source_name: str) -> str:
+    return os.path.join(proxy_dir(roll_folder), preset, os.path.splitext(source_name)[0] + '.jpg')
+
+
+def load_manifest(roll_folder: str) -> Dict[str, dict]:
+    """{source file name: {'size', 'mtime_ns', 'presets'}} for a roll (empty if unreadable)"""
+    try:
+        with open(os.path.join(proxy_dir(roll_folder), MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest['sources']
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable proxy manifest in {roll_folder}: {e}")
+    return {}
+
+
+def save_manifest(roll_folder: str, sources: Dict[str, dict]):
+    """Write the manifest through a temp file so an interrupted run keeps the old one"""
+    path = os.path.join(proxy_dir(roll_folder), MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(proxy_dir(roll_folder), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'sources': sources}, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving proxy manifest for {roll_folder}: {e}")
+
+
+class DerivativeGenerator:
+    """Render missing or outdated proxies on a process pool.
+
+    Use as a context manager; leaving it waits for the pool and writes the
+    manifests of every roll that was touched. Results are counted in
+    self.result ('rendered', 'skipped', 'removed', 'errors').
+    """
+
+    def __init__(self, presets: Dict[str, tuple] = None, workers: int = DERIVATIVE_WORKERS):
+        self.presets = presets if presets is not None else DERIVATIVE_PRESETS
+        self.workers = max(1, workers)
+        self.result = dict.fromkeys(('rendered', 'skipped', 'removed', 'errors'), 0)
+        self._executor = None
+        self._manifests: Dict[str, Dict[str, dict]] = {}
+        self._pending = []  # (future, roll folder, source name, new entry, old entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(cancel=exc_type is not None)
+        return False
+
+    def _preset_spec(self) -> Dict[str, list]:
+        return {name: [size[0], size[1], quality] for name, (size, quality) in self.presets.items()}
+
+    def _manifest(self, roll_folder: str) -> Dict[str, dict]:
+        if roll_folder not in self._manifests:
+            self._manifests[roll_folder] = load_manifest(roll_folder)
+        return self._manifests[roll_folder]
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Started on the first render so an up-to-date archive spawns nothing
+        if self._executor is None:
+            self._executor = render_pool(self.workers)
+        return self._executor
+
+    def add(self, source: str, st: Optional[os.stat_result] = None) -> bool:
+        """Queue proxies for one master unless they are current; True if queued"""
+        source = os.path.abspath(source)
+        roll_folder, name = os.path.split(source)
+        try:
+            st = st or os.stat(source)
+        except OSError as e:
+            logger.warning(f"Cannot create proxies for {source}: {e}")
+            self.result['errors'] += 1
+            return False
+
+        spec = self._preset_spec()
+        entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'presets': spec}
+        known = self._manifest(roll_folder).get(name)
+        if known == entry and all(os.path.exists(proxy_path(roll_folder, preset, name)) for preset in spec):
+            self.result['skipped'] += 1
+            return False
+
+        outputs = [(proxy_path(roll_folder, preset, name), size, quality)
+                   for preset, (size, quality) in self.presets.items()]
+        future = self._pool().submit(render_derivatives, source, outputs)
+        self._pending.append((future, roll_folder, name, entry, known))
+        return True
+
+    def update_roll(self, roll_folder: str) -> int:
+        """Queue every outdated master of a roll and drop proxies of removed masters"""
+        from core.archive_scanner import list_frames
+
+        roll_folder = os.path.abspath(roll_folder)
+        entries = list_frames(roll_folder)
+        queued = 0
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError as e:
+                logger.warning(f"Cannot create proxies for {entry.path}: {e}")
+                self.result['errors'] += 1
+                continue
+            queued += self.add(entry.path, st)
+
+        manifest = self._manifest(roll_folder)
+        names = {entry.name for entry in entries}
+        for name in [name for name in manifest if name not in names]:
+            for preset in manifest.pop(name).get('presets', {}):
+                self._remove(roll_folder, preset, name)
+            self.result['removed'] += 1
+        return queued
+
+    @staticmethod
+    def _remove(roll_folder: str, preset: str, name: str):
+        try:
+            os.remove(proxy_path(roll_folder, preset, name))
+        except OSError:
+            pass
+
+    def finish(self, cancel: bool = False,
+               progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """Wait for queued renders and save the manifests; returns self.result.
+
+        progress(done, total) is called as renders complete.
+        """
+        if cancel:
+            for future, *_ in self._pending:
+                future.cancel()
+        total = len(self._pending)
+        for done, (future, roll_folder, name, entry, old) in enumerate(self._pending, start=1):
+            if future.cancelled():
+                continue
+            try:
+                future.result()
+                self._manifests[roll_folder][name] = entry
+                self.result['rendered'] += 1
+                # Presets dropped from the settings since the last render
+                for preset in set((old or {}).get('presets', {})) - set(entry['presets']):
+                    self._remove(roll_folder, preset, name)
+            except Exception as e:
+                logger.error(f"Error creating proxies for {os.path.join(roll_folder, name)}: {e}",
+                             extra={'file': os.path.join(roll_folder, name)})
+                self._manifests[roll_folder].pop(name, None)
+                self.result['errors'] += 1
+            if progress:
+                progress(done, total)
+        self._pending = []
+
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=cancel)
+            self._executor = None
+        for roll_folder, manifest in self._manifests.items():
+            if manifest or os.path.isdir(proxy_dir(roll_folder)):
+                save_manifest(roll_folder, manifest)
+        self._manifests = {}
+        return self.result
+
+
+def update_archive(root_dir: str, presets: Dict[str, tuple] = None, workers: int = DERIVATIVE_WORKERS,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> dict:
+    """Bring the proxies of every roll under root_dir up to date.
+
+    All rolls share one process pool. progress(done, total) is called as
+    renders complete.
+    """
+    from core.archive_scanner import find_roll_folders
+
+    generator = DerivativeGenerator(presets, workers)
+    stopped = False
+    try:
+        for folder, _ in find_roll_folders(root_dir):
+            if cancelled and cancelled():
+                stopped = True
+                break
+            try:
+                generator.update_roll(folder)
+            except OSError as e:
+                logger.error(f"Error reading roll folder {folder}: {e}")
+                generator.result['errors'] += 1
+    finally:
+        result = generator.finish(cancel=stopped, progress=progress)
+
+    logger.info(f"Proxies under {root_dir}: {result['rendered']} rendered, {result['skipped']} current, "
+                f"{result['removed']} removed, {result['errors']} errors")
+    return result
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create or update JPEG proxies of archived rolls")
+    parser.add_argument("roots", nargs="+", help="archive folders to update")
+    parser.add_argument("--workers", type=int, default=DERIVATIVE_WORKERS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('PIL').setLevel(logging.WARNING)
+
+    for root_dir in args.roots:
+        print(update_archive(root_dir, workers=args.workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Film Archiver - Duplicate Detection
+
+Finds files being added that are byte-identical to files already in the
+session or in the archive catalog. Work escalates only for candidates:
+
+1. one stat per file, grouped into size buckets (plus one catalog query)
+2. a partial hash of the first and last blocks for files sharing a size
+3. a full hash only for files whose partial hashes also match
+
+The catalog stores the partial hash of each archived frame and of the
+source file it was processed from, so a delivery of same-sized scans is
+compared against the archive with two block reads per file, and a delivery
+without duplicates costs little more than one stat per file.
+"""
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config.settings import DUPLICATE_HASH_WORKERS, DUPLICATE_PARTIAL_BLOCK
+from utils.hashing import file_hash
+
+logger = logging.getLogger(__name__)
+
+SESSION = 'session'
+CATALOG = 'catalog'
+
+
+class Duplicate:
+    """A new file that repeats an existing one"""
+
+    __slots__ = ('path', 'original', 'where')
+
+    def __init__(self, path: str, original: str, where: str):
+        self.path = path
+        self.original = original
+        self.where = where
+
+    def __repr__(self):
+        return f"Duplicate({self.path!r}, original={self.original!r}, where={self.where!r})"
+
+
+def partial_hash(path: str, size: int, block: int = DUPLICATE_PARTIAL_BLOCK) -> str:
+    """Hash of the first and last blocks of a file (the whole file if it is small)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if size <= 2 * block:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(block))
+            f.seek(-block, os.SEEK_END)
+            digest.update(f.read(block))
+    return digest.hexdigest()
+
+
+class DuplicateFinder:
+    """Detect duplicates among new files, the current session and the catalog"""
+
+    def __init__(self, catalog=None, workers: int = DUPLICATE_HASH_WORKERS):
+        self.catalog = catalog
+        self.workers = workers
+
+    def find(self, new_files: Iterable[str], session_files: Iterable[str] = ()) -> List[Duplicate]:
+        """Return one Duplicate for each new file that repeats an earlier file.
+
+        Session files count as originals; among the new files the first in
+        order is kept and later copies are reported.
+        """
+        new_files = [os.path.abspath(path) for path in new_files]
+        session = {os.path.abspath(path) for path in session_files}
+        duplicates = []
+
+        # Pass 1: one stat per new file; same path twice needs no hashing
+        sizes: Dict[str, int] = {}
+        seen_paths = set(session)
+        candidates = []
+        for path in new_files:
+            if path in seen_paths:
+                duplicates.append(Duplicate(path, path, SESSION))
+                continue
+            seen_paths.add(path)
+            try:
+                sizes[path] = os.stat(path).st_size
+            except OSError as e:
+                logger.warning(f"Cannot check {path} for duplicates: {e}")
+                continue
+            candidates.append(path)
+        if not candidates:
+            return duplicates
+
+        new_sizes = {sizes[path] for path in candidates}
+        for path in session:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            if size in new_sizes:
+                sizes[path] = size
+
+        catalog_rows, catalog_partials = self._catalog_rows(new_sizes)
+
+        # Size buckets that could hold a duplicate of a new file
+        buckets: Dict[int, List[str]] = {}
+        for path in list(session) + candidates:
+            if path in sizes:
+                buckets.setdefault(sizes[path], []).append(path)
+        suspects = [
+            paths for size, paths in buckets.items()
+            if any(path not in session for path in paths) and (len(paths) > 1 or size in catalog_rows)
+        ]
+        if not suspects:
+            return duplicates
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicates") as executor:
+            # Pass 2: partial hashes where sizes collide within the session or with the catalog
+            to_partial = [
+                path for paths in suspects for path in paths
+                if len(paths) > 1 or path not in session
+            ]
+            partials = dict(zip(to_partial, executor.map(
+                lambda path: self._safe(partial_hash, path, sizes[path]), to_partial
+            )))
+
+            # Pass 3: full hashes only where partial hashes match
+            to_full = set()
+            for paths in suspects:
+                groups: Dict[Optional[str], List[str]] = {}
+                for path in paths:
+                    groups.setdefault(partials.get(path), []).append(path)
+                for key, group in groups.items():
+                    if key is not None and len(group) > 1:
+                        to_full.update(group)
+                known = catalog_partials.get(sizes[paths[0]], ())
+                # None stands for catalogued frames recorded before partial hashes were kept
+                to_full.update(
+                    path for path in paths
+                    if path not in session and partials.get(path) is not None
+                    and (partials[path] in known or None in known)
+                )
+            to_full = sorted(to_full)
+            full = dict(zip(to_full, executor.map(lambda path: self._safe(file_hash, path), to_full)))
+
+        order = {path: idx for idx, path in enumerate(list(session) + candidates)}
+        originals: Dict[str, str] = {}
+        for path in sorted(full, key=lambda path: (path not in session, order[path])):
+            digest = full[path]
+            if digest is None:
+                continue
+            if digest in originals:
+                if path not in session:
+                    duplicates.append(Duplicate(path, originals[digest], SESSION))
+                continue
+            match = catalog_rows.get(sizes[path], {}).get(digest)
+            if match and path not in session:
+                duplicates.append(Duplicate(path, match, CATALOG))
+                continue
+            originals[digest] = path
+
+        logger.info(f"Duplicate check: {len(candidates)} files, {len(to_partial)} partial and "
+                    f"{len(to_full)} full hashes, {len(duplicates)} duplicates")
+        return duplicates
+
+    def _catalog_rows(self, sizes) -> Tuple[Dict[int, Dict[str, str]], Dict[int, Set[Optional[str]]]]:
+        """({size: {sha256: archived path}}, {size: {partial hashes}}) for catalogued
+        frames, and the sources they were processed from, of the given sizes"""
+        if self.catalog is None or not sizes:
+            return {}, {}
+        try:
+            rows = self.catalog.frames_with_sizes(sizes)
+        except Exception as e:
+            logger.error(f"Could not check the catalog for duplicates: {e}")
+            return {}, {}
+        hashes: Dict[int, Dict[str, str]] = {}
+        partials: Dict[int, Set[Optional[str]]] = {}
+        for row in rows:
+            for size, sha256, partial in (
+                (row['size'], row['sha256'], row['partial_sha256']),
+                (row['source_size'], row['source_sha256'], row['source_partial_sha256']),
+            ):
+                if sha256 and size in sizes:
+                    hashes.setdefault(size, {}).setdefault(sha256, row['path'])
+                    partials.setdefault(size, set()).add(partial)
+        return hashes, partials
+
+    @staticmethod
+    def _safe(func, path, *args):
+        try:
+            return func(path, *args)
+        except OSError as e:
+            logger.warning(f"Cannot hash {path}: {e}")
+            return None
@@ -2,20 +2,28 @@
 Film Archiver - File Management Module
 """
 import os
+import time
 import logging
 from tkinter import ttk, messagebox, filedialog
 from typing import List, Optional
 from PIL import Image
 from datetime import datetime
-from config.settings import SUPPORTED_FORMATS, IS_MACOS
+from config.settings import SUPPORTED_FORMATS, IS_MACOS, MAX_IMAGE_PIXELS
+from core.color import ColorManager
+from core.decoding import load_for_preview, open_image
+from core.tone_mapping import read_high_bit_depth, needs_tone_mapping, tone_map
+from core.validation import check_file
+from utils.tracing import traced
 
-Image.MAX_IMAGE_PIXELS = None  # Allows for very large images
+# Large scans are allowed; memory is bounded by the decode budget instead
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
 
 logger = logging.getLogger(__name__)
 
 class FileManager:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.color_manager = ColorManager()
 
     def select_files(self) -> List[str]:
         """
@@ -63,7 +71,7 @@ class FileManager:
             return []
 
     def validate_file(self, file_path: str) -> bool:
-        """Validate if file is a supported image file"""
+        """Validate if file is a supported image file and structurally intact"""
         try:
             if not os.path.exists(file_path):
                 return False
@@ -73,41 +81,57 @@ class FileManager:
             if ext not in SUPPORTED_FORMATS:
                 return False
 
-            # For RAW files, just check if file exists and has correct extension
-            raw_formats = ['.cr2', '.cr3', '.crw', '.nef', '.arw', '.raw', '.raf', '.dng']
-            if ext in raw_formats:
-                return True
-
-            # For other formats, verify with PIL
-            try:
-                with Image.open(file_path) as img:
-                    img.verify()
-                return True
-            except:
+            # JPEG, TIFF and PNG structure is checked without decoding; other formats pass
+            problem = check_file(file_path)
+            if problem:
+                self.logger.warning(f"{file_path} failed validation: {problem}")
                 return False
+            return True
 
         except Exception as e:
             self.logger.debug(f"File validation failed for {file_path}: {e}")
             return False
 
+    @traced("thumbnail.create")
     def create_thumbnail(self, image_path: str, size=(300, 300)) -> Optional[Image.Image]:
         """Create a thumbnail from an image file"""
+        start = time.perf_counter()
         try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if needed
-                if img.mode not in ('RGB', 'L'):
+            with open_image(image_path) as img:
+                icc_profile = img.info.get('icc_profile')
+                
+                # 16-bit TIFF samples are read directly, others are decoded
+                # within the memory budget, reduced close to size
+                samples = read_high_bit_depth(img, size)
+                if samples is not None:
+                    img = tone_map(samples)
+                else:
+                    img = load_for_preview(img, size)
+                    if needs_tone_mapping(img):
+                        img = tone_map(img) or img
+                
+                # Convert to RGB if needed (CMYK is left for its profile)
+                if img.mode not in ('RGB', 'L', 'CMYK'):
                     img = img.convert('RGB')
                 
                 # Create thumbnail
                 img.thumbnail(size, Image.Resampling.LANCZOS)
+                
+                # Colour manage the thumbnail, never the full image
+                img = self.color_manager.apply(img, icc_profile)
+                if img.mode == 'CMYK':
+                    img = img.convert('RGB')
                 return img.copy()
 
         except Exception as e:
-            self.logger.error(f"Error creating thumbnail for {image_path}: {e}")
+            self.logger.error(f"Error creating thumbnail for {image_path}: {e}",
+                              extra={'file': image_path, 'elapsed_ms': (time.perf_counter() - start) * 1000})
             return None
 
+    @traced("metadata.get_date")
     def get_image_date(self, image_path: str) -> str:
         """Get the image date from EXIF or file system"""
+        start = time.perf_counter()
         try:
             # Get file extension
             ext = os.path.splitext(image_path)[1].lower()
@@ -115,7 +139,7 @@ class FileManager:
             # For RAW files and special formats
             if ext in ['.cr2', '.cr3', '.crw', '.nef', '.arw', '.raw', '.raf', '.dng']:
                 try:
-                    with Image.open(image_path) as img:
+                    with open_image(image_path) as img:
                         if hasattr(img, '_getexif') and img._getexif():
                             exif = img._getexif()
                             # Try different EXIF date fields
@@ -134,7 +158,7 @@ class FileManager:
 
             # For standard formats
             else:
-                with Image.open(image_path) as img:
+                with open_image(image_path) as img:
                     if hasattr(img, '_getexif') and img._getexif():
                         exif = img._getexif()
                         # Try different EXIF date fields
@@ -153,5 +177,6 @@ class FileManager:
             return datetime.fromtimestamp(mod_time).strftime("%m/%d/%Y")
 
         except Exception as e:
-            self.logger.error(f"Error getting image date for {image_path}: {e}")
+            self.logger.error(f"Error getting image date for {image_path}: {e}",
+                              extra={'file': image_path, 'elapsed_ms': (time.perf_counter() - start) * 1000})
             return "Unknown"
@@ -0,0 +1,278 @@
+"""
+Film Archiver - Fixity Checks
+
+Re-hashes catalogued frames and compares them with the SHA-256 recorded
+when they were archived, so files that rot, get truncated or disappear are
+noticed while a good copy still exists elsewhere.
+
+Each frame's last check time and result are stored in the catalog as soon
+as a batch finishes, so a run can stop at any point and the next run
+carries on with what is left. Rolls are checked longest-unverified first.
+Reads go through a shared rate limiter that applies a lower cap during
+working hours, and bypass the OS page cache where the platform allows.
+
+A scheduled job (cron, launchd) can check for a few hours each night:
+
+    python -m core.fixity --hours 6
+"""
+import os
+import sys
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
+
+from config.settings import (
+    FIXITY_INTERVAL_DAYS, FIXITY_WORKERS, FIXITY_RATE_MB_S, FIXITY_WORKING_HOURS,
+    FIXITY_WORKING_HOURS_RATE_MB_S, FIXITY_BATCH_SIZE
+)
+from utils.hashing import HASH_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+MISMATCH = 'mismatch'
+MISSING = 'missing'
+UNREADABLE = 'unreadable'
+STATUSES = (OK, MISMATCH, MISSING, UNREADABLE)
+
+MB = 1024 * 1024
+WAIT_SLICE = 0.25  # Longest sleep between checks for cancellation
+
+
+def scheduled_rate(now: Optional[float] = None) -> Optional[float]:
+    """Read cap in bytes per second for the current time (None for unlimited)"""
+    local = time.localtime(now)
+    start, end = FIXITY_WORKING_HOURS
+    if local.tm_wday < 5 and start <= local.tm_hour < end:
+        rate_mb_s = FIXITY_WORKING_HOURS_RATE_MB_S
+    else:
+        rate_mb_s = FIXITY_RATE_MB_S
+    return rate_mb_s * MB if rate_mb_s else None
+
+
+class RateLimiter:
+    """Token bucket shared by every reading thread.
+
+    rate() is asked for the current cap on each call, so a run that crosses
+    into or out of working hours adjusts without restarting.
+    """
+
+    def __init__(self, rate: Callable[[], Optional[float]] = scheduled_rate, burst_seconds: float = 1.0):
+        self.rate = rate
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def consume(self, nbytes: int, cancelled: Optional[Callable[[], bool]] = None) -> bool:
+        """Charge nbytes just read, sleeping while over the cap; False if cancelled while waiting"""
+        rate = self.rate()
+        with self._lock:
+            now = time.monotonic()
+            if not rate:
+                self._tokens = 0.0
+                self._updated = now
+                return True
+            self._tokens = min(rate * self.burst_seconds, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            # The balance may go negative; each caller sleeps off the debt it added
+            self._tokens -= nbytes
+            delay = -self._tokens / rate if self._tokens < 0 else 0.0
+
+        deadline = time.monotonic() + delay
+        while True:
+            if cancelled and cancelled():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, WAIT_SLICE))
+
+
+def _uncached(fd: int):
+    """Ask macOS not to keep this file's pages in the cache"""
+    try:
+        import fcntl
+        if hasattr(fcntl, 'F_NOCACHE'):
+            fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+    except OSError:
+        pass
+
+
+def _drop_cached(fd: int):
+    """Evict the pages just read (Linux), so a check does not push out the working set"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def verify_frame(frame: dict, limiter: Optional[RateLimiter] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> Optional[str]:
+    """Check one catalogued frame against its recorded size and SHA-256.
+
+    Returns a status, or None if cancelled before the file was fully read.
+    """
+    path = frame['path']
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return MISSING
+    except OSError as e:
+        logger.debug(f"Cannot stat {path}: {e}")
+        return UNREADABLE
+    if frame['size'] is not None and st.st_size != frame['size']:
+        return MISMATCH
+
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            _uncached(f.fileno())
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+                if limiter and not limiter.consume(n, cancelled):
+                    return None
+            _drop_cached(f.fileno())
+    except OSError as e:
+        logger.debug(f"Cannot read {path}: {e}")
+        return UNREADABLE
+    return OK if digest.hexdigest() == frame['sha256'] else MISMATCH
+
+
+def check_fixity(catalog, interval_days: float = FIXITY_INTERVAL_DAYS, workers: int = FIXITY_WORKERS,
+                 limiter: Optional[RateLimiter] = None, max_seconds: Optional[float] = None,
+                 progress: Optional[Callable[[int, int, int], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> dict:
+    """Verify every catalogued frame not checked in the last interval_days.
+
+    Stops early after max_seconds or when cancelled; whatever was checked is
+    already saved, and the next run resumes with the rest. progress(done,
+    total, bytes read) is called as frames finish. Returns counts per status,
+    'bytes', 'remaining' and 'problems' (the failed frames of this run).
+    """
+    queue = catalog.fixity_queue(time.time() - interval_days * 86400)
+    limiter = limiter or RateLimiter()
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+
+    def stopped() -> bool:
+        return bool((cancelled and cancelled()) or (deadline and time.monotonic() >= deadline))
+
+    result = dict.fromkeys(STATUSES, 0)
+    result.update(bytes=0, remaining=len(queue), problems=[])
+    results = []
+
+    def record(frame, status):
+        results.append((frame['id'], time.time(), status))
+        result[status] += 1
+        result['remaining'] -= 1
+        if status == OK:
+            result['bytes'] += frame['size'] or 0
+        else:
+            result['problems'].append(dict(frame, fixity=status))
+            logger.error(f"Fixity check failed ({status}): {frame['path']}", extra={'file': frame['path']})
+        if len(results) >= FIXITY_BATCH_SIZE:
+            catalog.set_fixity(results)
+            results.clear()
+
+    start = time.monotonic()
+    done = 0
+    pending = {}
+    frames = iter(queue)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fixity") as executor:
+            while True:
+                # Keep only a few files in flight so a stop takes effect quickly
+                while not stopped() and len(pending) < max(1, workers) * 2:
+                    frame = next(frames, None)
+                    if frame is None:
+                        break
+                    pending[executor.submit(verify_frame, frame, limiter, stopped)] = frame
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    frame = pending.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        logger.error(f"Fixity check of {frame['path']} failed: {e}")
+                        status = UNREADABLE
+                    if status is None:
+                        continue
+                    record(frame, status)
+                    done += 1
+                    if progress:
+                        progress(done, len(queue), result['bytes'])
+    finally:
+        if results:
+            catalog.set_fixity(results)
+
+    elapsed = time.monotonic() - start
+    rate = result['bytes'] / MB / elapsed if elapsed else 0
+    logger.info(f"Fixity: {done} of {len(queue)} frames checked in {elapsed:.0f}s ({rate:.1f} MB/s), "
+                f"{result[MISMATCH]} mismatched, {result[MISSING]} missing, "
+                f"{result[UNREADABLE]} unreadable, {result['remaining']} left for the next run")
+    return result
+
+
+def format_report(result: dict, problems: List[dict], stats: dict) -> str:
+    """This run's counts, then every frame whose last check failed"""
+    from utils.memory import format_bytes
+
+    checked = sum(result[status] for status in STATUSES)
+    oldest = stats.get('oldest_verified_at')
+    lines = [
+        f"Checked {checked} frames ({format_bytes(result['bytes'])}): {result[OK]} ok, "
+        f"{result[MISMATCH]} mismatched, {result[MISSING]} missing, {result[UNREADABLE]} unreadable",
+        f"{result['remaining']} frames left for the next run",
+        f"Catalog: {stats.get('unverified', 0)} frames never verified, oldest check "
+        f"{time.strftime('%Y-%m-%d', time.localtime(oldest)) if oldest else '-'}",
+        "",
+    ]
+    if problems:
+        lines.append(f"{'Status':<11} {'Checked':<17} File")
+        for frame in problems:
+            checked_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(frame['verified_at']))
+            lines.append(f"{frame['fixity']:<11} {checked_at:<17} {frame['path']}")
+    else:
+        lines.append("No fixity problems recorded.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+    from core.catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Re-hash catalogued frames and report files that changed")
+    parser.add_argument("--catalog", help="catalog database (default: the app's catalog)")
+    parser.add_argument("--workers", type=int, default=FIXITY_WORKERS)
+    parser.add_argument("--interval-days", type=float, default=FIXITY_INTERVAL_DAYS,
+                        help="skip frames verified more recently than this")
+    parser.add_argument("--mb-s", type=float, help="fixed read cap in MB/s instead of the working-hours schedule")
+    parser.add_argument("--hours", type=float, help="stop after this long; the next run resumes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    limiter = RateLimiter(lambda: args.mb_s * MB) if args.mb_s else None
+    catalog = Catalog(args.catalog) if args.catalog else Catalog()
+    try:
+        result = check_fixity(catalog, args.interval_days, args.workers, limiter,
+                              args.hours * 3600 if args.hours else None)
+        print(format_report(result, catalog.fixity_problems(), catalog.fixity_stats()))
+    finally:
+        catalog.close()
+    return 1 if result[MISMATCH] or result[MISSING] or result[UNREADABLE] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
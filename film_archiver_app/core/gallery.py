@@ -0,0 +1,460 @@
+"""
+Film Archiver - Static Gallery Export
+
+Exports catalogued rolls as a self-contained HTML gallery that clients can
+browse from a folder, a USB stick or any static web host:
+
+    index.html                      every roll, newest first
+    rolls/<roll>/index.html         the roll's frames
+    rolls/<roll>/frames/<frame>.html one frame with its catalog metadata
+    rolls/<roll>/<size>/<frame>.jpg one image per GALLERY_IMAGE_SIZES entry
+
+Images whose size matches the thumbnail cache or a current web proxy are
+linked or copied from there; the rest are rendered on a process pool, one
+decode per frame for all sizes. gallery.json records a fingerprint of each
+roll's catalog rows and of each image's source, so a re-export only touches
+rolls that changed and removes rolls and frames that are gone.
+"""
+import os
+import sys
+import json
+import html
+import shutil
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config.settings import (
+    GALLERY_IMAGE_SIZES, GALLERY_WORKERS, DERIVATIVE_PRESETS,
+    MAX_THUMBNAIL_SIZE, THUMBNAIL_QUALITY, APP_NAME
+)
+
+logger = logging.getLogger(__name__)
+
+# Part of every fingerprint: bump when the pages or image naming change
+GALLERY_VERSION = 1
+MANIFEST_NAME = "gallery.json"
+
+# Catalog columns the pages and images depend on; other columns (inode,
+# perceptual hashes) can change without making a roll's pages stale
+ROLL_FIELDS = ('roll_number', 'camera', 'film', 'roll_date', 'folder')
+FRAME_FIELDS = ('path', 'frame_number', 'size', 'mtime_ns', 'sha256', 'width', 'height', 'capture_date')
+
+STYLE = """\
+body { font-family: -apple-system, Helvetica, Arial, sans-serif; margin: 24px; background: #111; color: #ddd; }
+a { color: #9cf; text-decoration: none; }
+h1 { font-weight: 500; margin: 0 0 4px; }
+.meta { color: #999; margin: 0 0 20px; }
+.grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(220px, 1fr)); gap: 16px; }
+.grid figure { margin: 0; }
+.grid img { width: 100%; height: 180px; object-fit: contain; background: #000; }
+.grid figcaption { font-size: 13px; margin-top: 4px; }
+.frame img { max-width: 100%; max-height: 80vh; display: block; margin: 0 auto 16px; }
+.frame nav { display: flex; justify-content: space-between; margin-bottom: 16px; }
+table { border-collapse: collapse; } td { padding: 2px 16px 2px 0; } td:first-child { color: #999; }
+"""
+
+PAGE = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link rel="stylesheet" href="{root}style.css">
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _page(title: str, root: str, body: str) -> str:
+    return PAGE.format(title=html.escape(title), root=root, body=body)
+
+
+def _write_if_changed(path: str, text: str) -> bool:
+    """Write text unless the file already holds it; True if written"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _link_or_copy(source: str, target: str):
+    """Hard-link a cached image into the gallery, copying across volumes"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _roll_title(roll: dict) -> str:
+    return os.path.basename(roll['folder'])
+
+
+def _roll_meta(roll: dict, frame_count: int) -> str:
+    parts = [f"Roll {roll['roll_number']}" if roll['roll_number'] is not None else None,
+             roll['camera'], roll['film'], roll['roll_date'], f"{frame_count} frames"]
+    return " · ".join(html.escape(str(part)) for part in parts if part)
+
+
+class GalleryExporter:
+    """Incrementally export catalogued rolls as a static HTML gallery"""
+
+    def __init__(self, catalog, output_dir: str, thumbnail_cache=None,
+                 workers: int = GALLERY_WORKERS, sizes: Dict[str, tuple] = None):
+        self.catalog = catalog
+        self.output_dir = os.path.abspath(output_dir)
+        self.thumbnail_cache = thumbnail_cache
+        self.workers = max(1, workers)
+        self.sizes = sizes if sizes is not None else GALLERY_IMAGE_SIZES
+        self.result = dict.fromkeys(('rolls', 'rolls_updated', 'rolls_removed',
+                                     'rendered', 'reused', 'errors'), 0)
+        self._executor = None
+        self._pending = []  # (future, roll slug, [(relative path, fingerprint)])
+
+    # Manifest
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_NAME)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path(), encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == GALLERY_VERSION:
+                return manifest
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable gallery manifest in {self.output_dir}: {e}")
+        return {'version': GALLERY_VERSION, 'rolls': {}, 'images': {}}
+
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp_path, self._manifest_path())
+
+    # Export
+
+    def export(self, roll_folders: Optional[Iterable[str]] = None,
+               progress: Optional[Callable[[int, int], None]] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> dict:
+        """Export the given roll folders (every catalogued roll if None).
+
+        Rolls exported earlier stay in the gallery, so exporting only a new
+        roll adds it; rolls no longer in the catalog are removed.
+        progress(done, total) is called as images finish rendering. Returns
+        counters in self.result.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        catalogued = self.catalog.find_rolls(limit=-1)
+        rolls = catalogued
+        if roll_folders is not None:
+            wanted = {os.path.abspath(folder) for folder in roll_folders}
+            rolls = [roll for roll in catalogued if roll['folder'] in wanted]
+
+        slugs = self._slugs(rolls, manifest)
+        stopped = False
+        try:
+            for roll in rolls:
+                if cancelled and cancelled():
+                    stopped = True
+                    break
+                slug = slugs[roll['id']]
+                self._export_roll(roll, slug, manifest)
+                self.result['rolls'] += 1
+        finally:
+            self._finish(manifest, cancel=stopped, progress=progress)
+
+        if not stopped:
+            folders = {roll['folder'] for roll in catalogued}
+            for slug in [slug for slug, entry in manifest['rolls'].items() if entry['folder'] not in folders]:
+                shutil.rmtree(os.path.join(self.output_dir, 'rolls', slug), ignore_errors=True)
+                manifest['rolls'].pop(slug)
+                prefix = f"rolls/{slug}/"
+                for rel in [rel for rel in manifest['images'] if rel.startswith(prefix)]:
+                    manifest['images'].pop(rel)
+                self.result['rolls_removed'] += 1
+            exported = {entry['folder'] for entry in manifest['rolls'].values()}
+            gallery = [roll for roll in catalogued if roll['folder'] in exported]
+            self._write_index(gallery, self._slugs(gallery, manifest), manifest)
+
+        _write_if_changed(os.path.join(self.output_dir, 'style.css'), STYLE)
+        self._save_manifest(manifest)
+        logger.info(f"Gallery export to {self.output_dir}: {self.result}")
+        return self.result
+
+    @staticmethod
+    def _slugs(rolls: List[dict], manifest: dict) -> Dict[int, str]:
+        """Output folder per roll id.
+
+        A roll keeps the folder it was first exported to, so links into the
+        gallery stay valid. A new roll gets its folder's name, with its id
+        appended if another roll in the gallery already uses that name.
+        """
+        known = {entry['folder']: slug for slug, entry in manifest['rolls'].items()}
+        taken = set(manifest['rolls'])
+        slugs = {}
+        for roll in rolls:
+            slug = known.get(roll['folder'])
+            if slug is None:
+                name = os.path.basename(roll['folder'])
+                slug = name if name not in taken else f"{name}-{roll['id']}"
+                taken.add(slug)
+            slugs[roll['id']] = slug
+        return slugs
+
+    def _export_roll(self, roll: dict, slug: str, manifest: dict):
+        """Bring one roll's pages and images up to date"""
+        frames = self.catalog.roll_frames(roll['id'])
+        stems = self._stems(frames)
+        roll_dir = os.path.join(self.output_dir, 'rolls', slug)
+
+        key = _fingerprint(GALLERY_VERSION, self.sizes, [roll[field] for field in ROLL_FIELDS],
+                           [[frame[field] for field in FRAME_FIELDS] for frame in frames])
+        previous = manifest['rolls'].get(slug)
+        if previous and previous['key'] == key and os.path.exists(os.path.join(roll_dir, 'index.html')):
+            return
+
+        self.result['rolls_updated'] += 1
+        proxies = self._proxy_sources(roll['folder'])
+        for frame, stem in zip(frames, stems):
+            self._frame_images(frame, stem, slug, manifest, proxies)
+
+        # Frames removed from the roll since the last export
+        for stem in set(previous['frames'] if previous else ()) - set(stems):
+            _remove(os.path.join(roll_dir, 'frames', f"{stem}.html"))
+            for size_name in self.sizes:
+                _remove(os.path.join(roll_dir, size_name, f"{stem}.jpg"))
+                manifest['images'].pop(f"rolls/{slug}/{size_name}/{stem}.jpg", None)
+
+        self._write_roll_pages(roll, frames, stems, roll_dir)
+        manifest['rolls'][slug] = {'key': key, 'folder': roll['folder'], 'frames': stems}
+
+    @staticmethod
+    def _stems(frames: List[dict]) -> List[str]:
+        stems = [os.path.splitext(os.path.basename(frame['path']))[0] for frame in frames]
+        return [stem if stems.count(stem) == 1 else os.path.basename(frame['path']).replace('.', '_')
+                for frame, stem in zip(frames, stems)]
+
+    def _proxy_sources(self, roll_folder: str) -> Dict[str, tuple]:
+        """{gallery size name: (proxy preset, manifest)} for sizes a web proxy can supply"""
+        from core.derivatives import load_manifest
+
+        matches = {}
+        for size_name, (size, quality) in self.sizes.items():
+            for preset, (preset_size, preset_quality) in DERIVATIVE_PRESETS.items():
+                if tuple(preset_size) == tuple(size) and preset_quality == quality:
+                    matches[size_name] = preset
+        if not matches:
+            return {}
+        manifest = load_manifest(roll_folder)
+        return {size_name: (preset, manifest) for size_name, preset in matches.items()}
+
+    def _cached_source(self, frame: dict, size_name: str, proxies: Dict[str, tuple]) -> Optional[str]:
+        """An existing image of the frame at this size, from the thumbnail cache or a proxy"""
+        from core.derivatives import proxy_path
+
+        size, quality = self.sizes[size_name]
+        if self.thumbnail_cache is not None and tuple(size) == tuple(MAX_THUMBNAIL_SIZE) \
+                and quality == THUMBNAIL_QUALITY:
+            cached = self.thumbnail_cache.disk_file(frame['path'], size)
+            if cached is not None:
+                return str(cached)
+        if size_name in proxies:
+            preset, manifest = proxies[size_name]
+            roll_folder, name = os.path.split(frame['path'])
+            entry = manifest.get(name)
+            if entry and (entry['size'], entry['mtime_ns']) == (frame['size'], frame['mtime_ns']) \
+                    and entry['presets'].get(preset) == [size[0], size[1], quality]:
+                path = proxy_path(roll_folder, preset, name)
+                if os.path.exists(path):
+                    return path
+        return None
+
+    def _frame_images(self, frame: dict, stem: str, slug: str, manifest: dict, proxies: Dict[str, tuple]):
+        """Reuse or queue every out-of-date image of one frame"""
+        source = frame['sha256'] or [frame['size'], frame['mtime_ns']]
+        outputs, rendered = [], []
+        for size_name, (size, quality) in self.sizes.items():
+            rel = f"rolls/{slug}/{size_name}/{stem}.jpg"
+            target = os.path.join(self.output_dir, rel)
+            fingerprint = _fingerprint(source, size, quality)
+            if manifest['images'].get(rel) == fingerprint and os.path.exists(target):
+                continue
+            manifest['images'].pop(rel, None)
+            cached = self._cached_source(frame, size_name, proxies)
+            if cached:
+                try:
+                    _link_or_copy(cached, target)
+                    manifest['images'][rel] = fingerprint
+                    self.result['reused'] += 1
+                    continue
+                except OSError as e:
+                    logger.debug(f"Could not reuse {cached}: {e}")
+            outputs.append((target, tuple(size), quality))
+            rendered.append((rel, fingerprint))
+        if outputs:
+            from core.derivatives import render_derivatives
+            future = self._pool().submit(render_derivatives, frame['path'], outputs)
+            self._pending.append((future, slug, rendered))
+
+    @staticmethod
+    def _stale(manifest: dict, slug: str):
+        """Revisit a roll on the next export (its pages and other images stay)"""
+        if slug in manifest['rolls']:
+            manifest['rolls'][slug]['key'] = None
+
+    def _pool(self):
+        from core.derivatives import render_pool
+
+        # Started on the first render so an unchanged gallery spawns nothing
+        if self._executor is None:
+            self._executor = render_pool(self.workers)
+        return self._executor
+
+    def _finish(self, manifest: dict, cancel: bool = False,
+                progress: Optional[Callable[[int, int], None]] = None):
+        """Wait for rendering and record the images that were written"""
+        total = len(self._pending)
+        for done, (future, slug, rendered) in enumerate(self._pending, start=1):
+            if cancel:
+                future.cancel()
+            if future.cancelled():
+                self._stale(manifest, slug)
+                continue
+            try:
+                future.result()
+                for rel, fingerprint in rendered:
+                    manifest['images'][rel] = fingerprint
+                self.result['rendered'] += len(rendered)
+            except Exception as e:
+                logger.error(f"Could not render gallery images for {rendered[0][0]}: {e}")
+                self.result['errors'] += 1
+                self._stale(manifest, slug)
+            if progress:
+                progress(done, total)
+        self._pending = []
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=cancel)
+            self._executor = None
+
+    # Pages
+
+    def _write_roll_pages(self, roll: dict, frames: List[dict], stems: List[str], roll_dir: str):
+        title = _roll_title(roll)
+        figures = []
+        for frame, stem in zip(frames, stems):
+            label = html.escape(os.path.basename(frame['path']))
+            figures.append(
+                f'<figure><a href="frames/{stem}.html"><img src="thumb/{stem}.jpg" loading="lazy" alt="{label}"></a>'
+                f'<figcaption>{label}</figcaption></figure>'
+            )
+        body = (f'<p><a href="../../index.html">All rolls</a></p>\n<h1>{html.escape(title)}</h1>\n'
+                f'<p class="meta">{_roll_meta(roll, len(frames))}</p>\n'
+                f'<div class="grid">\n' + "\n".join(figures) + '\n</div>')
+        _write_if_changed(os.path.join(roll_dir, 'index.html'), _page(title, '../../', body))
+
+        for position, (frame, stem) in enumerate(zip(frames, stems)):
+            previous = f'<a href="{stems[position - 1]}.html">&larr; Previous</a>' if position else '<span></span>'
+            following = (f'<a href="{stems[position + 1]}.html">Next &rarr;</a>'
+                         if position + 1 < len(stems) else '<span></span>')
+            name = os.path.basename(frame['path'])
+            rows = [
+                ("Frame", frame['frame_number']),
+                ("File", name),
+                ("Captured", frame['capture_date']),
+                ("Dimensions", f"{frame['width']} × {frame['height']}" if frame['width'] else None),
+                ("Size", f"{frame['size'] / (1024 * 1024):.1f} MB" if frame['size'] else None),
+                ("SHA-256", frame['sha256']),
+            ]
+            table = "\n".join(f"<tr><td>{label}</td><td>{html.escape(str(value))}</td></tr>"
+                              for label, value in rows if value is not None)
+            view = 'view' if 'view' in self.sizes else next(iter(self.sizes))
+            large = (f' · <a href="../large/{stem}.jpg">Full size</a>' if 'large' in self.sizes else '')
+            body = (f'<div class="frame">\n<nav>{previous}<a href="../index.html">{html.escape(_roll_title(roll))}</a>'
+                    f'{following}</nav>\n<img src="../{view}/{stem}.jpg" alt="{html.escape(name)}">\n'
+                    f'<p class="meta">{_roll_meta(roll, len(frames))}{large}</p>\n<table>\n{table}\n</table>\n</div>')
+            _write_if_changed(os.path.join(roll_dir, 'frames', f"{stem}.html"),
+                              _page(f"{name} - {_roll_title(roll)}", '../../../', body))
+
+    def _write_index(self, rolls: List[dict], slugs: Dict[int, str], manifest: dict):
+        figures = []
+        for roll in rolls:
+            slug = slugs[roll['id']]
+            entry = manifest['rolls'].get(slug) or {'frames': []}
+            cover = (f'<img src="rolls/{slug}/thumb/{entry["frames"][0]}.jpg" loading="lazy" alt="">'
+                     if entry['frames'] and 'thumb' in self.sizes else '')
+            figures.append(
+                f'<figure><a href="rolls/{slug}/index.html">{cover}</a>'
+                f'<figcaption><a href="rolls/{slug}/index.html">{html.escape(_roll_title(roll))}</a><br>'
+                f'{_roll_meta(roll, roll["frame_count"])}</figcaption></figure>'
+            )
+        body = (f'<h1>{html.escape(APP_NAME)}</h1>\n<p class="meta">{len(rolls)} rolls</p>\n'
+                f'<div class="grid">\n' + "\n".join(figures) + '\n</div>')
+        _write_if_changed(os.path.join(self.output_dir, 'index.html'), _page(APP_NAME, '', body))
+
+
+def export_gallery(catalog, output_dir: str, roll_folders: Optional[Iterable[str]] = None,
+                   thumbnail_cache=None, workers: int = GALLERY_WORKERS,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> dict:
+    """Export or update a static gallery of catalogued rolls in output_dir"""
+    return GalleryExporter(catalog, output_dir, thumbnail_cache, workers).export(
+        roll_folders, progress, cancelled
+    )
+
+
+def main(argv=None):
+    import argparse
+    from core.catalog import Catalog
+    from core.thumbnail_cache import ThumbnailCache
+
+    parser = argparse.ArgumentParser(description="Export catalogued rolls as a static HTML gallery")
+    parser.add_argument("output", help="gallery folder (updated in place on later runs)")
+    parser.add_argument("--roll", action="append", dest="rolls", help="roll folder to export (repeatable)")
+    parser.add_argument("--catalog", help="catalog database (default: the app's catalog)")
+    parser.add_argument("--workers", type=int, default=GALLERY_WORKERS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('PIL').setLevel(logging.WARNING)
+
+    catalog = Catalog(args.catalog) if args.catalog else Catalog()
+    try:
+        print(export_gallery(catalog, args.output, args.rolls, ThumbnailCache(None), args.workers))
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
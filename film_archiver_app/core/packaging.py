@@ -0,0 +1,313 @@
+"""
+Film Archiver - Roll Packages
+
+A roll can be written as one tar or zip container instead of a folder.
+Members are stored uncompressed (scans are already compressed or barely
+compress), so each frame occupies one contiguous byte range. A sidecar
+index next to the container records every member's data offset, size and
+SHA-256:
+
+    001-M6-HP5-JAN24.tar
+    001-M6-HP5-JAN24.tar.index.json
+
+With the index a single frame is extracted or previewed by seeking straight
+to it, without reading the rest of the container.
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tarfile
+import zipfile
+import hashlib
+import logging
+from typing import List, Optional
+
+from PIL import Image
+
+from config.settings import MAX_THUMBNAIL_SIZE
+
+logger = logging.getLogger(__name__)
+
+TAR = 'tar'
+ZIP = 'zip'
+PACKAGE_EXTENSIONS = {TAR: '.tar', ZIP: '.zip'}
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+COPY_CHUNK = 1024 * 1024
+TAR_BLOCK = tarfile.BLOCKSIZE
+
+
+def index_path(package_path: str) -> str:
+    return package_path + INDEX_SUFFIX
+
+
+class _HashingReader:
+    """File wrapper that hashes everything read through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+
+class RollPackage:
+    """Write a roll into a tar or zip container one member at a time.
+
+    Use as a context manager: leaving normally finishes the container and
+    writes its index; leaving with an exception deletes the partial files.
+    """
+
+    def __init__(self, path: str, package_format: str = TAR):
+        if package_format not in PACKAGE_EXTENSIONS:
+            raise ValueError(f"Unknown package format: {package_format}")
+        self.path = path
+        self.format = package_format
+        self.members: List[dict] = []
+        self._file = open(path, 'wb')
+        if package_format == TAR:
+            self._container = tarfile.open(fileobj=self._file, mode='w', format=tarfile.PAX_FORMAT)
+        else:
+            self._container = zipfile.ZipFile(self._file, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def add_file(self, name: str, source_path: str, mtime: Optional[float] = None) -> dict:
+        """Stream a file into the container under name"""
+        st = os.stat(source_path)
+        with open(source_path, 'rb') as f:
+            return self._add(name, f, st.st_size, st.st_mtime if mtime is None else mtime)
+
+    def add_bytes(self, name: str, data: bytes, mtime: Optional[float] = None) -> dict:
+        return self._add(name, io.BytesIO(data), len(data), time.time() if mtime is None else mtime)
+
+    def _add(self, name: str, f, size: int, mtime: float) -> dict:
+        reader = _HashingReader(f)
+        if self.format == TAR:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = mtime
+            info.mode = 0o644
+            self._container.addfile(info, reader)
+            # The data is padded to a whole block and ends where the file now ends
+            offset = self._file.tell() - (size + TAR_BLOCK - 1) // TAR_BLOCK * TAR_BLOCK
+        else:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(max(mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            with self._container.open(info, 'w') as dest:
+                offset = self._file.tell()  # the local header has just been written
+                shutil.copyfileobj(reader, dest, COPY_CHUNK)
+
+        member = {'name': name, 'offset': offset, 'size': size, 'mtime': mtime,
+                  'sha256': reader.digest.hexdigest()}
+        self.members.append(member)
+        return member
+
+    def close(self):
+        """Finish the container, then write its index"""
+        self._container.close()
+        self._file.close()
+        index = {
+            'version': INDEX_VERSION,
+            'format': self.format,
+            'package': os.path.basename(self.path),
+            'package_size': os.path.getsize(self.path),
+            'members': self.members,
+        }
+        tmp_path = index_path(self.path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, index_path(self.path))
+
+    def abort(self):
+        """Discard a partly written package"""
+        try:
+            self._container.close()
+        except Exception:
+            pass
+        self._file.close()
+        for path in (self.path, index_path(self.path)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def package_folder(folder: str, output_dir: str, package_format: str = TAR) -> str:
+    """Bundle the files directly inside a roll folder; returns the package path"""
+    output_path = os.path.join(output_dir, os.path.basename(os.path.normpath(folder))
+                               + PACKAGE_EXTENSIONS[package_format])
+    with RollPackage(output_path, package_format) as package:
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if entry.is_file() and not entry.name.startswith('.'):
+                package.add_file(entry.name, entry.path)
+    logger.info(f"Packaged {folder} as {output_path}")
+    return output_path
+
+
+# Reading
+
+def load_index(package_path: str) -> dict:
+    """The sidecar index of a package; ValueError if it is missing or out of date"""
+    try:
+        with open(index_path(package_path), encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"{os.path.basename(package_path)} has no index")
+    if index.get('version') != INDEX_VERSION:
+        raise ValueError(f"Unsupported package index version: {index.get('version')}")
+    if index['package_size'] != os.path.getsize(package_path):
+        raise ValueError(f"The index of {os.path.basename(package_path)} does not match the package")
+    return index
+
+
+def find_member(index: dict, name: str) -> dict:
+    for member in index['members']:
+        if member['name'] == name:
+            return member
+    raise KeyError(name)
+
+
+class MemberFile(io.RawIOBase):
+    """Read-only, seekable view of one member's bytes inside a package"""
+
+    def __init__(self, package_path: str, member: dict):
+        super().__init__()
+        self.name = member['name']
+        self._f = open(package_path, 'rb')
+        self._start = member['offset']
+        self._size = member['size']
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), self._size - self._pos))
+        if not n:
+            return 0
+        self._f.seek(self._start + self._pos)
+        n = self._f.readinto(memoryview(buffer)[:n])
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def open_member(package_path: str, name: str, index: Optional[dict] = None) -> io.BufferedReader:
+    """Open one member for reading without touching the rest of the package"""
+    index = index or load_index(package_path)
+    return io.BufferedReader(MemberFile(package_path, find_member(index, name)))
+
+
+def extract_member(package_path: str, name: str, output_dir: str, index: Optional[dict] = None) -> str:
+    """Copy one member out of a package, checking its SHA-256; returns the new path"""
+    index = index or load_index(package_path)
+    member = find_member(index, name)
+    output_path = os.path.join(output_dir, os.path.basename(name))
+    digest = hashlib.sha256()
+    tmp_path = output_path + '.tmp'
+    try:
+        with open_member(package_path, name, index) as src, open(tmp_path, 'wb') as dest:
+            while True:
+                chunk = src.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dest.write(chunk)
+        if digest.hexdigest() != member['sha256']:
+            raise ValueError(f"{name} does not match the checksum in the package index")
+        os.utime(tmp_path, (member['mtime'], member['mtime']))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+def preview_member(package_path: str, name: str, size=MAX_THUMBNAIL_SIZE,
+                   index: Optional[dict] = None) -> Optional[Image.Image]:
+    """Thumbnail of one packaged frame, decoded straight from the package"""
+    from core.decoding import load_for_preview
+
+    try:
+        with open_member(package_path, name, index) as f:
+            with Image.open(f) as img:
+                img = load_for_preview(img, size)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                img.thumbnail(size, Image.Resampling.LANCZOS)
+                return img.copy()
+    except Exception as e:
+        logger.error(f"Error previewing {name} in {package_path}: {e}")
+        return None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create, list or extract Film Archiver roll packages")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="package roll folders")
+    create.add_argument("folders", nargs="+")
+    create.add_argument("--format", choices=sorted(PACKAGE_EXTENSIONS), default=TAR)
+    create.add_argument("--output", default=".", help="where packages are written")
+    listing = commands.add_parser("list", help="list the members of a package")
+    listing.add_argument("package")
+    extract = commands.add_parser("extract", help="extract members of a package")
+    extract.add_argument("package")
+    extract.add_argument("names", nargs="+")
+    extract.add_argument("--output", default=".")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "create":
+        for folder in args.folders:
+            print(package_folder(folder, args.output, args.format))
+    elif args.command == "list":
+        for member in load_index(args.package)['members']:
+            print(f"{member['size']:>12}  {member['sha256'][:16]}  {member['name']}")
+    else:
+        index = load_index(args.package)
+        for name in args.names:
+            print(extract_member(args.package, name, args.output, index))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Film Archiver - Perceptual Hashing and Near-Duplicate Search
+
+dHash and pHash are 64-bit fingerprints that survive re-exposure, small
+crops and a different scanner, so rescans of the same negative land within
+a few bits of each other. Hashes are computed from the cached thumbnails,
+batched through NumPy, and searched with a BK-tree, which prunes most of
+the archive on every Hamming-distance query.
+"""
+import math
+import logging
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from config.settings import NEAR_DUPLICATE_MAX_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+PHASH_SIZE = 32
+PHASH_LOW = 8
+
+# DCT-II basis rows for the low frequencies pHash keeps
+_DCT_ROWS = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+    for u in range(PHASH_LOW)
+]
+
+
+def _prepare(img: Image.Image):
+    """Greyscale samples at the dHash (9x8) and pHash (32x32) sizes"""
+    grey = img.convert('L')
+    return (grey.resize((9, 8), Image.Resampling.BOX),
+            grey.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX))
+
+
+def image_hashes(img: Image.Image) -> Tuple[int, int]:
+    """(dhash, phash) of one image"""
+    return batch_hashes([img])[0]
+
+
+def batch_hashes(images: List[Image.Image]) -> List[Tuple[int, int]]:
+    """(dhash, phash) for each image, computed as one array operation"""
+    import numpy as np  # slow to import, so only loaded when hashing
+
+    prepared = [_prepare(img) for img in images]
+    if not prepared:
+        return []
+    small = np.stack([np.asarray(s, dtype=np.int16) for s, _ in prepared])        # (N, 8, 9)
+    large = np.stack([np.asarray(l, dtype=np.float32) for _, l in prepared])      # (N, 32, 32)
+
+    dbits = (small[:, :, 1:] > small[:, :, :-1]).reshape(len(prepared), -1)
+
+    basis = np.asarray(_DCT_ROWS, dtype=np.float32)                               # (8, 32)
+    dct = basis @ large @ basis.T                                                  # (N, 8, 8)
+    coefficients = dct.reshape(len(prepared), -1)
+    # The DC term only measures brightness, so it is left out of the median
+    medians = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    pbits = coefficients > medians
+
+    weights = (1 << np.arange(HASH_BITS - 1, -1, -1, dtype=np.uint64)).astype(np.uint64)
+    dhashes = (dbits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    phashes = (pbits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    return [(int(d), int(p)) for d, p in zip(dhashes, phashes)]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance.
+
+    A query with radius r only descends into children whose edge distance is
+    within r of the query's distance to the node (triangle inequality).
+    """
+
+    __slots__ = ('root', 'size')
+
+    def __init__(self, items: Iterable[Tuple[int, Hashable]] = ()):
+        self.root = None  # [hash, [items], {distance: child}]
+        self.size = 0
+        for value, item in items:
+            self.add(value, item)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value: int, item: Hashable):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Hashable]]:
+        """(distance, item) for every item within radius of value"""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                results.extend((distance, item) for item in items)
+            low, high = distance - radius, distance + radius
+            stack.extend(child for edge, child in children.items() if low <= edge <= high)
+        return results
+
+
+def find_clusters(entries: Iterable[Tuple[Hashable, int]],
+                  max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE) -> List[List[Hashable]]:
+    """Group items whose hashes are within max_distance, transitively.
+
+    Returns clusters of two or more items, largest first.
+    """
+    entries = [(item, value) for item, value in entries if value is not None]
+    tree = BKTree((value, item) for item, value in entries)
+
+    parent: Dict[Hashable, Hashable] = {item: item for item, _ in entries}
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for item, value in entries:
+        for _, other in tree.search(value, max_distance):
+            root_a, root_b = find(item), find(other)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    clusters: Dict[Hashable, List[Hashable]] = {}
+    for item, _ in entries:
+        clusters.setdefault(find(item), []).append(item)
+    return sorted((cluster for cluster in clusters.values() if len(cluster) > 1), key=len, reverse=True)
+
+
+def to_signed(value: Optional[int]) -> Optional[int]:
+    """Store a 64-bit hash in an SQLite INTEGER (signed)"""
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def from_signed(value: Optional[int]) -> Optional[int]:
+    if value is None:
+        return None
+    return value + (1 << 64) if value < 0 else value
+
+
+def update_catalog_hashes(catalog, thumbnail_cache, roll_id: Optional[int] = None,
+                          batch_size: int = 64, cancelled=None) -> int:
+    """Hash catalogued frames that have no perceptual hash yet; returns how many were hashed"""
+    pending = catalog.frames_missing_hashes(roll_id)
+    hashed = 0
+    for start in range(0, len(pending), batch_size):
+        if cancelled and cancelled():
+            break
+        batch = pending[start:start + batch_size]
+        images, ids = [], []
+        for row in batch:
+            thumbnail = thumbnail_cache.get(row['path'])
+            if thumbnail is not None:
+                images.append(thumbnail)
+                ids.append(row['id'])
+        rows = [(frame_id, to_signed(dhash), to_signed(phash))
+                for frame_id, (dhash, phash) in zip(ids, batch_hashes(images))]
+        catalog.set_perceptual_hashes(rows)
+        hashed += len(rows)
+    return hashed
+
+
+def catalog_clusters(catalog, roll_id: Optional[int] = None,
+                     max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE) -> List[List[dict]]:
+    """Near-duplicate clusters of catalogued frames (by pHash) in one roll or the whole archive"""
+    rows = {row['id']: row for row in catalog.perceptual_hashes(roll_id)}
+    clusters = find_clusters(((frame_id, from_signed(row['phash'])) for frame_id, row in rows.items()),
+                             max_distance)
+    return [[rows[frame_id] for frame_id in cluster] for cluster in clusters]
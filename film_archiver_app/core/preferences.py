@@ -3,73 +3,221 @@ Film Archiver - Preferences Manager
 """
 import os
 import json
+import time
 import logging
-from config.settings import APP_DIR
+import tempfile
+import threading
+from contextlib import contextmanager
+from config.settings import APP_DIR, PREFERENCES_SAVE_DELAY, USAGE_HALF_LIFE_DAYS
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+CAMERAS = 'cameras'
+FILMS = 'films'
+
+
 class PreferenceManager:
-    def __init__(self):
-        self.cameras = []
-        self.films = []
-        self.preferences_file = APP_DIR / "preferences.json"
+    """Saved cameras and films with usage counts.
+
+    Names live in dicts (name -> [use count, last used timestamp]) so
+    membership checks are O(1). Ranked views are cached until the next
+    change. Changes are coalesced into one write PREFERENCES_SAVE_DELAY
+    seconds later on a timer thread, replacing the file atomically. Writes
+    are serialised, so an older snapshot never replaces a newer one.
+    """
+
+    def __init__(self, preferences_file=None, save_delay=PREFERENCES_SAVE_DELAY):
+        self.preferences_file = preferences_file or APP_DIR / "preferences.json"
+        self.save_delay = save_delay
+        self._items = {CAMERAS: {}, FILMS: {}}
+        self._views = {}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # held from snapshot to replace
+        self._dirty = False
+        self._timer = None
+        self._batch_depth = 0
         self.load_preferences()
-    
+
+    @property
+    def cameras(self):
+        return self.get_cameras()
+
+    @property
+    def films(self):
+        return self.get_films()
+
+    @traced("preferences.load")
     def load_preferences(self):
         """Load saved preferences from file"""
         try:
             if self.preferences_file.exists():
                 with open(self.preferences_file, 'r') as f:
                     prefs = json.load(f)
-                    self.cameras = prefs.get('cameras', [])
-                    self.films = prefs.get('films', [])
+                usage = prefs.get('usage', {})
+                with self._lock:
+                    for kind in (CAMERAS, FILMS):
+                        kind_usage = usage.get(kind, {})
+                        self._items[kind] = {
+                            name: list(kind_usage.get(name, [0, 0]))
+                            for name in prefs.get(kind, [])
+                        }
+                    self._views.clear()
         except Exception as e:
             logger.error(f"Error loading preferences: {e}")
-    
+
     def save_preferences(self):
-        """Save current preferences to file"""
+        """Save current preferences to file now (atomic replace)"""
+        with self._write_lock:
+            self._write()
+
+    def flush(self):
+        """Write pending changes immediately (call before exit).
+
+        Waits for a save already in progress, so the process does not exit
+        part way through a write.
+        """
+        with self._write_lock:
+            with self._lock:
+                dirty = self._dirty
+            if dirty:
+                self._write()
+
+    @traced("preferences.save")
+    def _write(self):
+        """Snapshot and write the preferences; the caller holds _write_lock"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            data = {
+                CAMERAS: sorted(self._items[CAMERAS]),
+                FILMS: sorted(self._items[FILMS]),
+                'usage': {kind: dict(self._items[kind]) for kind in (CAMERAS, FILMS)},
+            }
+            self._dirty = False
+
+        tmp_path = None
         try:
-            os.makedirs(os.path.dirname(self.preferences_file), exist_ok=True)
-            with open(self.preferences_file, 'w') as f:
-                json.dump({
-                    'cameras': self.cameras,
-                    'films': self.films
-                }, f, indent=2)
+            directory = os.path.dirname(self.preferences_file)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.preferences-', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.preferences_file)
         except Exception as e:
             logger.error(f"Error saving preferences: {e}")
-    
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self._dirty = True
+
+    @contextmanager
+    def transaction(self):
+        """Group several changes into a single write"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._schedule_save()
+
     def get_cameras(self):
-        """Get list of saved cameras"""
-        return sorted(self.cameras)
-    
+        """Get saved cameras, most used and most recent first"""
+        return self._ranked(CAMERAS)
+
     def get_films(self):
-        """Get list of saved films"""
-        return sorted(self.films)
-    
+        """Get saved films, most used and most recent first"""
+        return self._ranked(FILMS)
+
+    def has_camera(self, camera):
+        return camera.strip().upper() in self._items[CAMERAS]
+
+    def has_film(self, film):
+        return film.strip().upper() in self._items[FILMS]
+
     def add_camera(self, camera):
         """Add a camera to saved list"""
-        camera = camera.strip().upper()
-        if camera and camera not in self.cameras:
-            self.cameras.append(camera)
-            self.save_preferences()
-    
+        self._add(CAMERAS, camera)
+
     def add_film(self, film):
         """Add a film to saved list"""
-        film = film.strip().upper()
-        if film and film not in self.films:
-            self.films.append(film)
-            self.save_preferences()
-    
+        self._add(FILMS, film)
+
     def remove_camera(self, camera):
         """Remove a camera from saved list"""
-        camera = camera.strip().upper()
-        if camera in self.cameras:
-            self.cameras.remove(camera)
-            self.save_preferences()
-    
+        self._remove(CAMERAS, camera)
+
     def remove_film(self, film):
         """Remove a film from saved list"""
-        film = film.strip().upper()
-        if film in self.films:
-            self.films.remove(film)
-            self.save_preferences()
\ No newline at end of file
+        self._remove(FILMS, film)
+
+    def record_use(self, camera=None, film=None):
+        """Count a processed roll, saving its camera and film if new"""
+        with self.transaction():
+            if camera:
+                self._add(CAMERAS, camera, used=True)
+            if film:
+                self._add(FILMS, film, used=True)
+
+    def usage(self, kind, name):
+        """Return (use count, last used timestamp) for a saved name"""
+        count, last_used = self._items[kind].get(name.strip().upper(), (0, 0))
+        return count, last_used
+
+    def _add(self, kind, name, used=False):
+        name = name.strip().upper()
+        if not name:
+            return
+        with self._lock:
+            items = self._items[kind]
+            if name in items and not used:
+                return
+            entry = items.setdefault(name, [0, 0])
+            if used:
+                entry[0] += 1
+                entry[1] = time.time()
+            self._changed(kind)
+
+    def _remove(self, kind, name):
+        name = name.strip().upper()
+        with self._lock:
+            if self._items[kind].pop(name, None) is not None:
+                self._changed(kind)
+
+    def _ranked(self, kind):
+        with self._lock:
+            view = self._views.get(kind)
+            if view is None:
+                now = time.time()
+                items = self._items[kind]
+                view = sorted(items, key=lambda name: (-self._score(items[name], now), name))
+                self._views[kind] = view
+            return list(view)
+
+    @staticmethod
+    def _score(entry, now):
+        """Use count decayed by how long ago the name was last used"""
+        count, last_used = entry
+        if not count:
+            return 0.0
+        age_days = max(0.0, now - last_used) / 86400
+        return count * 0.5 ** (age_days / USAGE_HALF_LIFE_DAYS)
+
+    def _changed(self, kind):
+        self._views.pop(kind, None)
+        self._dirty = True
+        if self._batch_depth == 0:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        if self._timer is None:
+            # flush() skips the write if a save in the meantime already covered it
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
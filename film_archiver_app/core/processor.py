@@ -0,0 +1,264 @@
+"""
+Film Archiver - Roll Processing
+"""
+import io
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from config.settings import DERIVATIVES_ON_PROCESS, TIFF_RECOMPRESS_ON_PROCESS, PACKAGE_FORMAT
+from core.duplicates import partial_hash
+from core.progress import ProgressModel
+from utils.hashing import copy_with_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessingError(Exception):
+    """A file could not be copied into the roll folder"""
+
+    def __init__(self, file_path: str, error: Exception):
+        super().__init__(str(error))
+        self.file_path = file_path
+        self.error = error
+
+
+def build_folder_name(roll_num: int, camera: str, film: str, selected_date: datetime) -> str:
+    """Folder name for a roll, e.g. 001-M6-HP5-JAN24"""
+    return f"{roll_num:03d}-{camera}-{film}-{selected_date.strftime('%b%y').upper()}"
+
+
+def build_filename(roll_num: int, idx: int, camera: str, film: str, ext: str) -> str:
+    """Frame file name, e.g. 001-01-M6-HP5.jpg"""
+    return f"{roll_num:03d}-{idx:02d}-{camera}-{film}{ext}"
+
+
+class RollProcessor:
+    """Copy a roll into its archive folder with new names and dates"""
+
+    def __init__(self, roll_num: int, camera: str, film: str, selected_date: datetime,
+                 progress_model: Optional[ProgressModel] = None, catalog=None,
+                 make_proxies: bool = DERIVATIVES_ON_PROCESS,
+                 compress_tiffs: bool = TIFF_RECOMPRESS_ON_PROCESS,
+                 package_format: Optional[str] = PACKAGE_FORMAT):
+        self.roll_num = roll_num
+        self.camera = camera
+        self.film = film
+        self.selected_date = selected_date
+        self.progress = progress_model or ProgressModel()
+        self.catalog = catalog
+        self.make_proxies = make_proxies
+        self.compress_tiffs = compress_tiffs
+        self.compression = None  # core.recompress.summarize() totals for the roll
+        self.package_format = package_format  # 'tar' or 'zip' writes one container, None a folder
+        self.sources = {}  # new path -> (size, sha256, partial hash) of the file it was copied from
+
+    @property
+    def folder_name(self) -> str:
+        return build_folder_name(self.roll_num, self.camera, self.film, self.selected_date)
+
+    def process(self, files: List[str], output_dir: str,
+                progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Process files in frame order; returns the roll folder path.
+
+        progress(done, total) is called after each file; self.progress holds
+        byte-weighted progress, throughput and phase timings.
+        Raises ProcessingError on the first file that cannot be copied.
+        """
+        if self.package_format:
+            return self.package(files, output_dir, progress)
+
+        output_path = os.path.join(output_dir, self.folder_name)
+        os.makedirs(output_path, exist_ok=True)
+
+        sizes = [self._file_size(file) for file in files]
+        job_id = self.folder_name
+        self.progress.add_job(job_id, sizes)
+
+        # Proxies render on worker processes while the remaining files copy
+        proxies = None
+        if self.make_proxies:
+            from core.derivatives import DerivativeGenerator
+            proxies = DerivativeGenerator()
+
+        total_files = len(files)
+        frames = []
+        compress = []  # (new path, frame number, source) held back until compressed
+        try:
+            for idx, (file, size) in enumerate(zip(files, sizes), start=1):
+                start = time.perf_counter()
+                try:
+                    new_path = self.process_file(file, idx, output_path)
+                except Exception as e:
+                    raise ProcessingError(file, e) from e
+                if self.compress_tiffs:
+                    compress.append((new_path, idx, file))
+                else:
+                    self.finish_file(new_path, idx, file, frames, proxies)
+                self.progress.file_done(job_id, size, time.perf_counter() - start)
+                if progress:
+                    progress(idx, total_files)
+
+            if compress:
+                from core.recompress import recompress_files, summarize
+
+                # Catalog hashes and proxy fingerprints must describe the compressed files
+                with self.progress.phase("compress"):
+                    results = recompress_files([path for path, _, _ in compress])
+                self.compression = summarize(results).get(output_path)
+                for new_path, idx, file in compress:
+                    self.finish_file(new_path, idx, file, frames, proxies)
+        except Exception:
+            if proxies is not None:
+                proxies.finish(cancel=True)
+            raise
+
+        if proxies is not None:
+            with self.progress.phase("proxies"):
+                result = proxies.finish()
+            if result['errors']:
+                logger.warning(f"{result['errors']} proxies of {self.folder_name} could not be created")
+
+        if self.catalog is not None:
+            try:
+                self.catalog.add_roll(output_path, self.roll_num, self.camera, self.film,
+                                      self.selected_date, [frame for frame in frames if frame])
+            except Exception as e:
+                logger.error(f"Could not add {self.folder_name} to the catalog: {e}")
+        return output_path
+
+    def package(self, files: List[str], output_dir: str,
+                progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Stream the renamed, re-dated roll into one tar or zip; returns its path.
+
+        Nothing is written to disk besides the container and its index, so
+        packaged rolls are not catalogued and get no proxies. A failure
+        removes the partial container.
+        """
+        from core.packaging import RollPackage, PACKAGE_EXTENSIONS
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, self.folder_name + PACKAGE_EXTENSIONS[self.package_format])
+
+        sizes = [self._file_size(file) for file in files]
+        job_id = self.folder_name
+        self.progress.add_job(job_id, sizes)
+        timestamp = self.selected_date.timestamp()
+
+        with RollPackage(output_path, self.package_format) as roll_package:
+            for idx, (file, size) in enumerate(zip(files, sizes), start=1):
+                start = time.perf_counter()
+                name = build_filename(self.roll_num, idx, self.camera, self.film, os.path.splitext(file)[1])
+                try:
+                    with self.progress.phase("exif"):
+                        data = self.exif_dated_copy(file)
+                    with self.progress.phase("package", file=os.path.basename(file)):
+                        if data is not None:
+                            roll_package.add_bytes(name, data, timestamp)
+                        else:
+                            roll_package.add_file(name, file, timestamp)
+                except Exception as e:
+                    raise ProcessingError(file, e) from e
+                self.progress.file_done(job_id, size, time.perf_counter() - start)
+                if progress:
+                    progress(idx, len(files))
+        return output_path
+
+    def finish_file(self, new_path: str, idx: int, source_path: str, frames: list, proxies):
+        """Catalog a processed frame and queue its proxies"""
+        if self.catalog is not None:
+            frames.append(self.catalog_frame(new_path, idx, source_path))
+        if proxies is not None:
+            proxies.add(new_path)
+
+    def catalog_frame(self, new_path: str, idx: int, source_path: str):
+        """Hash and measure a processed frame for the catalog (None on failure)"""
+        from core.archive_scanner import read_frame
+
+        try:
+            with self.progress.phase("catalog"):
+                frame = read_frame(new_path, idx, source_path=os.path.abspath(source_path),
+                                   capture_date=self.selected_date)
+            # Re-dating changes the archived bytes; the source hashes let a re-added original be found
+            frame.source_size, frame.source_sha256, frame.source_partial_sha256 = \
+                self.sources.get(new_path, (None, None, None))
+            return frame
+        except Exception as e:
+            logger.error(f"Could not catalog {new_path}: {e}")
+            return None
+
+    def process_file(self, file: str, idx: int, output_path: str) -> str:
+        """Copy one frame and stamp the roll date on it; returns the new path"""
+        ext = os.path.splitext(file)[1]
+        new_path = os.path.join(output_path, build_filename(self.roll_num, idx, self.camera, self.film, ext))
+
+        # Copy file and update date
+        with self.progress.phase("copy", file=os.path.basename(file)):
+            source_sha256 = copy_with_hash(file, new_path)
+
+        with self.progress.phase("verify"):
+            copied_size = os.path.getsize(new_path)
+            source_size = os.path.getsize(file)
+            if copied_size != source_size:
+                raise OSError(f"copy is {copied_size} bytes, source is {source_size}")
+        if self.catalog is not None:
+            self.sources[new_path] = (source_size, source_sha256, partial_hash(file, source_size))
+
+        # Update file dates if possible
+        try:
+            with self.progress.phase("exif"):
+                self.write_exif_date(new_path)
+
+            # Update file modification time
+            with self.progress.phase("utime"):
+                timestamp = self.selected_date.timestamp()
+                os.utime(new_path, (timestamp, timestamp))
+        except Exception as e:
+            logger.debug(f"Could not update dates for {new_path}: {e}")
+
+        return new_path
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def dated_exif(self, image) -> bytes:
+        """EXIF block of a file path or JPEG bytes with the roll date as capture date"""
+        import piexif
+
+        date_str = self.selected_date.strftime("%Y:%m:%d %H:%M:%S").encode()
+        exif_dict = piexif.load(image)
+        exif_dict['0th'][piexif.ImageIFD.DateTime] = date_str
+        exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = date_str
+        exif_dict['Exif'][piexif.ExifIFD.DateTimeDigitized] = date_str
+        return piexif.dump(exif_dict)
+
+    def write_exif_date(self, path: str):
+        """Set the EXIF capture dates (formats piexif cannot write are skipped)"""
+        import piexif
+
+        try:
+            piexif.insert(self.dated_exif(path), path)
+        except Exception as e:
+            logger.debug(f"Could not write EXIF date to {path}: {e}")
+
+    def exif_dated_copy(self, path: str) -> Optional[bytes]:
+        """A JPEG's bytes with the roll date written in memory; None for other formats"""
+        import piexif
+
+        if os.path.splitext(path)[1].lower() not in ('.jpg', '.jpeg'):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            output = io.BytesIO()
+            piexif.insert(self.dated_exif(data), data, output)
+            return output.getvalue()
+        except Exception as e:
+            logger.debug(f"Could not write EXIF date to {path}: {e}")
+            return data
@@ -0,0 +1,133 @@
+"""
+Film Archiver - Progress Model
+
+Progress is weighted by bytes rather than file count, so a roll mixing
+5 MB JPEGs and 300 MB TIFFs advances evenly. Throughput is a moving
+average over the most recent files and the ETA is remaining bytes over
+that rate, for the current job and for everything queued.
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from config.settings import PROGRESS_RATE_WINDOW
+from utils.tracing import span
+
+
+class JobProgress:
+    """Byte and file counters for one job (one roll)"""
+
+    def __init__(self, job_id: str, sizes: List[int]):
+        self.job_id = job_id
+        self.total_files = len(sizes)
+        self.total_bytes = sum(sizes)
+        self.done_files = 0
+        self.done_bytes = 0
+
+    @property
+    def remaining_bytes(self) -> int:
+        return self.total_bytes - self.done_bytes
+
+    @property
+    def fraction(self) -> float:
+        if self.total_bytes:
+            return self.done_bytes / self.total_bytes
+        return self.done_files / self.total_files if self.total_files else 1.0
+
+
+class ProgressModel:
+    """Thread-safe progress, throughput, ETA and per-phase timings"""
+
+    def __init__(self, window: int = PROGRESS_RATE_WINDOW):
+        self.jobs: Dict[str, JobProgress] = {}
+        self.phases: Dict[str, List[float]] = {}  # name -> [count, seconds]
+        self._recent = deque(maxlen=window)        # (bytes, seconds) per finished file
+        self._started = None
+        self._lock = threading.Lock()
+
+    def add_job(self, job_id: str, sizes: List[int]) -> JobProgress:
+        job = JobProgress(job_id, sizes)
+        with self._lock:
+            self.jobs[job_id] = job
+            if self._started is None:
+                self._started = time.perf_counter()
+        return job
+
+    def file_done(self, job_id: str, nbytes: int, seconds: float):
+        with self._lock:
+            job = self.jobs[job_id]
+            job.done_files += 1
+            job.done_bytes += nbytes
+            self._recent.append((nbytes, seconds))
+
+    @contextmanager
+    def phase(self, name: str, **span_args):
+        """Time one phase of a file (also recorded as a trace span)"""
+        start = time.perf_counter()
+        with span(f"process.{name}", **span_args):
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    totals = self.phases.setdefault(name, [0, 0.0])
+                    totals[0] += 1
+                    totals[1] += elapsed
+
+    def rates(self):
+        """(bytes per second, files per second) over the recent window"""
+        with self._lock:
+            recent = list(self._recent)
+        seconds = sum(elapsed for _, elapsed in recent)
+        if not recent or seconds <= 0:
+            return 0.0, 0.0
+        return sum(nbytes for nbytes, _ in recent) / seconds, len(recent) / seconds
+
+    def eta(self, job_id: Optional[str] = None) -> Optional[float]:
+        """Seconds left for one job, or for every queued job when job_id is None"""
+        bytes_rate, files_rate = self.rates()
+        with self._lock:
+            jobs = [self.jobs[job_id]] if job_id else list(self.jobs.values())
+            remaining_bytes = sum(job.remaining_bytes for job in jobs)
+            remaining_files = sum(job.total_files - job.done_files for job in jobs)
+        if not remaining_files:
+            return 0.0
+        if bytes_rate > 0 and remaining_bytes > 0:
+            return remaining_bytes / bytes_rate
+        if files_rate > 0:
+            return remaining_files / files_rate
+        return None
+
+    def snapshot(self, job_id: Optional[str] = None) -> dict:
+        """Everything the progress bar and diagnostics need, in one dict"""
+        bytes_rate, files_rate = self.rates()
+        with self._lock:
+            jobs = [self.jobs[job_id]] if job_id else list(self.jobs.values())
+            total_bytes = sum(job.total_bytes for job in jobs)
+            done_bytes = sum(job.done_bytes for job in jobs)
+            phases = {name: {'count': count, 'seconds': seconds}
+                      for name, (count, seconds) in self.phases.items()}
+            elapsed = time.perf_counter() - self._started if self._started else 0.0
+        fraction = done_bytes / total_bytes if total_bytes else (jobs[0].fraction if len(jobs) == 1 else 0.0)
+        return {
+            'fraction': fraction,
+            'done_files': sum(job.done_files for job in jobs),
+            'total_files': sum(job.total_files for job in jobs),
+            'mb_per_s': bytes_rate / (1024 * 1024),
+            'files_per_s': files_rate,
+            'eta': self.eta(job_id),
+            'queue_eta': self.eta(),
+            'elapsed': elapsed,
+            'phases': phases,
+        }
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
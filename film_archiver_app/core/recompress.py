@@ -0,0 +1,351 @@
+"""
+Film Archiver - Lossless TIFF Recompression
+
+Rewrites uncompressed TIFF masters with Deflate compression and the
+horizontal differencing predictor, which typically saves 30-60% on film
+scans without changing a single sample.
+
+Pillow reduces 48-bit RGB to 8 bits when it decodes, so it cannot be used to
+re-save masters. Instead the file is rewritten directly: sample rows are
+streamed out of the original strips, re-cut into strips of about
+TIFF_RECOMPRESS_STRIP_BYTES, predicted and compressed, and every tag is
+copied across (EXIF and GPS directories included). Memory stays at a few
+strips per worker whatever the scan size.
+
+Before the original is replaced, the new file is read back, decompressed and
+the SHA-256 of its samples compared with that of the original's. Files that
+are already compressed, tiled, planar or multi-page are left alone.
+"""
+import os
+import sys
+import zlib
+import struct
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config.settings import (
+    TIFF_RECOMPRESS_LEVEL, TIFF_RECOMPRESS_WORKERS, TIFF_RECOMPRESS_STRIP_BYTES,
+    TIFF_RECOMPRESS_MIN_SAVING
+)
+from core.tiff import (
+    UnsupportedTiff, SHORT, LONG, IMAGE_WIDTH, IMAGE_LENGTH, BITS_PER_SAMPLE, COMPRESSION, STRIP_OFFSETS,
+    SAMPLES_PER_PIXEL, ROWS_PER_STRIP, STRIP_BYTE_COUNTS, PLANAR_CONFIGURATION, TILE_WIDTH, PREDICTOR,
+    SUB_IFDS, SAMPLE_FORMAT, read_header, read_ifd, tag_values, ifd_bytes
+)
+from utils.memory import format_bytes
+
+logger = logging.getLogger(__name__)
+
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+
+COMPRESSION_NONE = 1
+COMPRESSION_DEFLATE = 8
+PREDICTOR_NONE = 1
+PREDICTOR_HORIZONTAL = 2
+
+# Status values in recompression results
+RECOMPRESSED = 'recompressed'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class _Layout:
+    """Sample layout of a chunky, striped single-image TIFF"""
+
+    def __init__(self, entries, order: str, next_offset: int):
+        if next_offset:
+            raise UnsupportedTiff("multi-page")
+        if TILE_WIDTH in entries:
+            raise UnsupportedTiff("tiled")
+        if SUB_IFDS in entries:
+            raise UnsupportedTiff("has sub-images")
+        if tag_values(entries, PLANAR_CONFIGURATION, order, (1,))[0] != 1:
+            raise UnsupportedTiff("planar")
+        if STRIP_OFFSETS not in entries or STRIP_BYTE_COUNTS not in entries:
+            raise UnsupportedTiff("no strips")
+
+        self.order = order
+        self.width = tag_values(entries, IMAGE_WIDTH, order)[0]
+        self.height = tag_values(entries, IMAGE_LENGTH, order)[0]
+        self.samples = tag_values(entries, SAMPLES_PER_PIXEL, order, (1,))[0]
+        bits = tag_values(entries, BITS_PER_SAMPLE, order, (1,))
+        bits_per_pixel = sum(bits) if len(bits) == self.samples else bits[0] * self.samples
+        self.row_bytes = (self.width * bits_per_pixel + 7) // 8
+        self.bits = bits[0] if len(set(bits)) == 1 else None
+        formats = set(tag_values(entries, SAMPLE_FORMAT, order, (1,)))
+        self.rows_per_strip = min(tag_values(entries, ROWS_PER_STRIP, order, (self.height,))[0], self.height)
+        self.strips = list(zip(tag_values(entries, STRIP_OFFSETS, order),
+                               tag_values(entries, STRIP_BYTE_COUNTS, order)))
+        # Integer samples of 8 or 16 bits can be differenced
+        self.predictable = self.bits in (8, 16) and formats == {1}
+
+    def strip_rows(self, index: int) -> int:
+        return min(self.rows_per_strip, self.height - index * self.rows_per_strip)
+
+    def dtype(self):
+        import numpy as np
+
+        return np.uint8 if self.bits == 8 else np.dtype(self.order + 'u2')
+
+
+def _read_rows(f, layout: _Layout, block_rows: int):
+    """Yield (rows, bytes) blocks of block_rows sample rows from the original strips"""
+    block_bytes = block_rows * layout.row_bytes
+    buffer = bytearray()
+    for index, (offset, count) in enumerate(layout.strips):
+        left = layout.strip_rows(index) * layout.row_bytes
+        if count < left:
+            raise ValueError(f"strip {index} is {count} bytes, expected {left}")
+        f.seek(offset)
+        while left:
+            chunk = f.read(min(left, block_bytes - len(buffer)))
+            if not chunk:
+                raise ValueError(f"strip {index} is truncated")
+            buffer += chunk
+            left -= len(chunk)
+            if len(buffer) == block_bytes:
+                yield block_rows, bytes(buffer)
+                buffer.clear()
+    if buffer:
+        yield len(buffer) // layout.row_bytes, bytes(buffer)
+
+
+def _predict(data: bytes, rows: int, layout: _Layout) -> bytes:
+    """Horizontal differencing (TIFF predictor 2), modulo the sample size"""
+    import numpy as np  # slow to import, so only loaded in the workers that need it
+
+    samples = np.frombuffer(data, dtype=layout.dtype()).reshape(rows, -1)
+    diff = samples.copy()
+    diff[:, layout.samples:] -= samples[:, :-layout.samples]
+    return diff.tobytes()
+
+
+def _unpredict(data: bytes, rows: int, layout: _Layout) -> bytes:
+    import numpy as np
+
+    dtype = layout.dtype()
+    native = np.uint8 if layout.bits == 8 else np.uint16
+    diff = np.frombuffer(data, dtype=dtype).astype(native).reshape(rows, layout.width, layout.samples)
+    return np.cumsum(diff, axis=1, dtype=native).astype(dtype).tobytes()
+
+
+# Recompression
+
+def recompress_tiff(path: str, level: int = TIFF_RECOMPRESS_LEVEL,
+                    strip_bytes: int = TIFF_RECOMPRESS_STRIP_BYTES,
+                    min_saving: float = TIFF_RECOMPRESS_MIN_SAVING) -> dict:
+    """Losslessly recompress one TIFF in place; runs in a worker process.
+
+    Returns {'path', 'status', 'reason', 'before', 'after'}. The original is
+    only replaced when the rewrite verifies and saves at least min_saving.
+    """
+    result = {'path': path, 'status': SKIPPED, 'reason': '', 'before': 0, 'after': 0}
+    tmp_path = f"{path}.recompress.tmp"
+    try:
+        st = os.stat(path)
+        result['before'] = result['after'] = st.st_size
+
+        with open(path, 'rb') as f:
+            order, offset = read_header(f)
+            entries, next_offset = read_ifd(f, order, offset)
+            if tag_values(entries, COMPRESSION, order, (COMPRESSION_NONE,))[0] != COMPRESSION_NONE:
+                raise UnsupportedTiff("already compressed")
+            layout = _Layout(entries, order, next_offset)
+            predictor = PREDICTOR_HORIZONTAL if layout.predictable else PREDICTOR_NONE
+            block_rows = max(1, min(layout.height, strip_bytes // max(1, layout.row_bytes)))
+
+            source_digest = hashlib.sha256()
+            offsets, counts = [], []
+            with open(tmp_path, 'wb') as out:
+                out.write(b'II' if order == '<' else b'MM')
+                out.write(struct.pack(order + 'HL', 42, 0))
+                for rows, data in _read_rows(f, layout, block_rows):
+                    source_digest.update(data)
+                    if predictor == PREDICTOR_HORIZONTAL:
+                        data = _predict(data, rows, layout)
+                    compressed = zlib.compress(data, level)
+                    offsets.append(out.tell())
+                    counts.append(len(compressed))
+                    out.write(compressed)
+
+                if out.tell() % 2:
+                    out.write(b'\0')
+                ifd_offset = out.tell()
+                if ifd_offset >= 1 << 32:
+                    raise UnsupportedTiff("compressed file would exceed 4 GB")
+                entries[COMPRESSION] = [SHORT, 1, struct.pack(order + 'H', COMPRESSION_DEFLATE), None]
+                entries[ROWS_PER_STRIP] = [LONG, 1, struct.pack(order + 'L', block_rows), None]
+                entries[STRIP_OFFSETS] = [LONG, len(offsets), struct.pack(f"{order}{len(offsets)}L", *offsets), None]
+                entries[STRIP_BYTE_COUNTS] = [LONG, len(counts), struct.pack(f"{order}{len(counts)}L", *counts), None]
+                if predictor == PREDICTOR_HORIZONTAL:
+                    entries[PREDICTOR] = [SHORT, 1, struct.pack(order + 'H', predictor), None]
+                else:
+                    entries.pop(PREDICTOR, None)
+                out.write(ifd_bytes(order, entries, ifd_offset))
+                out.seek(4)
+                out.write(struct.pack(order + 'L', ifd_offset))
+                out.flush()
+                os.fsync(out.fileno())
+
+        after = os.path.getsize(tmp_path)
+        if after > st.st_size * (1 - min_saving):
+            result['reason'] = f"saves less than {min_saving:.0%}"
+            os.remove(tmp_path)
+            return result
+
+        if _pixel_digest(tmp_path) != source_digest.hexdigest():
+            raise ValueError("decoded pixels of the compressed file do not match the original")
+        current = os.stat(path)
+        if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            raise ValueError("the original changed while it was being compressed")
+
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.chmod(tmp_path, st.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+        result.update(status=RECOMPRESSED, after=after)
+    except UnsupportedTiff as e:
+        result['reason'] = str(e)
+    except Exception as e:
+        result.update(status=FAILED, reason=str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+
+def _pixel_digest(path: str) -> str:
+    """SHA-256 of the decompressed samples of a file written by recompress_tiff"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        order, offset = read_header(f)
+        entries, _ = read_ifd(f, order, offset)
+        predictor = tag_values(entries, PREDICTOR, order, (PREDICTOR_NONE,))[0]
+        layout = _Layout(entries, order, 0)
+        for index, (strip_offset, count) in enumerate(layout.strips):
+            rows = layout.strip_rows(index)
+            f.seek(strip_offset)
+            data = zlib.decompress(f.read(count))
+            if len(data) != rows * layout.row_bytes:
+                raise ValueError(f"strip {index} decompresses to {len(data)} bytes")
+            if predictor == PREDICTOR_HORIZONTAL:
+                data = _unpredict(data, rows, layout)
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def recompress_files(paths: List[str], workers: int = TIFF_RECOMPRESS_WORKERS,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     cancelled: Optional[Callable[[], bool]] = None) -> List[dict]:
+    """Recompress TIFFs on a process pool; returns one result per TIFF.
+
+    Files with other extensions are ignored. progress(done, total) is
+    called as files finish.
+    """
+    paths = [path for path in paths if os.path.splitext(path)[1].lower() in TIFF_EXTENSIONS]
+    if not paths:
+        return []
+    results = []
+    # Spawned rather than forked: the parent may be running Tk and threads
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(paths))),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(recompress_tiff, path) for path in paths]
+        for done, future in enumerate(futures, start=1):
+            if cancelled and cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+            result = future.result()
+            if result['status'] == FAILED:
+                logger.error(f"Could not recompress {result['path']}: {result['reason']}",
+                             extra={'file': result['path']})
+            results.append(result)
+            if progress:
+                progress(done, len(paths))
+    return results
+
+
+def summarize(results: List[dict]) -> Dict[str, dict]:
+    """{roll folder: {'files', 'recompressed', 'skipped', 'failed', 'before', 'after'}}"""
+    rolls: Dict[str, dict] = {}
+    for result in results:
+        roll = rolls.setdefault(os.path.dirname(result['path']), {
+            'files': 0, RECOMPRESSED: 0, SKIPPED: 0, FAILED: 0, 'before': 0, 'after': 0
+        })
+        roll['files'] += 1
+        roll[result['status']] += 1
+        roll['before'] += result['before']
+        roll['after'] += result['after']
+    return rolls
+
+
+def format_report(rolls: Dict[str, dict]) -> str:
+    """Space saved per roll, largest saving first"""
+    lines = [f"{'Roll':<40} {'Files':>6} {'Compressed':>10} {'Before':>10} {'After':>10} {'Saved':>7}"]
+    before = after = 0
+    for folder, roll in sorted(rolls.items(), key=lambda item: item[1]['after'] - item[1]['before']):
+        saved = 1 - roll['after'] / roll['before'] if roll['before'] else 0
+        lines.append(f"{os.path.basename(folder)[:40]:<40} {roll['files']:>6} {roll[RECOMPRESSED]:>10} "
+                     f"{format_bytes(roll['before']):>10} {format_bytes(roll['after']):>10} {saved:>7.1%}")
+        before += roll['before']
+        after += roll['after']
+    lines.append("")
+    lines.append(f"Total: {format_bytes(before)} -> {format_bytes(after)}, "
+                 f"{format_bytes(before - after)} saved")
+    return "\n".join(lines)
+
+
+def recompress_archive(root_dir: str, workers: int = TIFF_RECOMPRESS_WORKERS,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       cancelled: Optional[Callable[[], bool]] = None, catalog=None) -> Dict[str, dict]:
+    """Recompress the TIFF masters of every roll under root_dir; returns summarize()
+
+    Catalogued frames that were rewritten get their size, timestamps and
+    hashes updated in catalog, so fixity checks and duplicate detection
+    compare against the compressed files.
+    """
+    from core.archive_scanner import find_roll_folders, list_frames, refresh_frames
+
+    paths = []
+    for folder, _ in find_roll_folders(root_dir):
+        try:
+            paths.extend(entry.path for entry in list_frames(folder))
+        except OSError as e:
+            logger.error(f"Error reading roll folder {folder}: {e}")
+    results = recompress_files(paths, workers, progress, cancelled)
+    if catalog is not None:
+        rewritten = [result['path'] for result in results if result['status'] == RECOMPRESSED]
+        try:
+            refresh_frames(catalog, rewritten)
+        except Exception as e:
+            logger.error(f"Could not update the catalog for recompressed TIFFs: {e}")
+    rolls = summarize(results)
+    saved = sum(roll['before'] - roll['after'] for roll in rolls.values())
+    logger.info(f"Recompressed TIFFs under {root_dir}: {format_bytes(saved)} saved")
+    return rolls
+
+
+def main(argv=None):
+    import argparse
+    from core.catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Losslessly compress uncompressed TIFF masters")
+    parser.add_argument("roots", nargs="+", help="archive folders to compress")
+    parser.add_argument("--workers", type=int, default=TIFF_RECOMPRESS_WORKERS)
+    parser.add_argument("--catalog", help="catalog database to update (default: the app's catalog)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    catalog = Catalog(args.catalog) if args.catalog else Catalog()
+    try:
+        for root_dir in args.roots:
+            print(format_report(recompress_archive(root_dir, workers=args.workers, catalog=catalog)))
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
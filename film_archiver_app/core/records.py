@@ -0,0 +1,139 @@
+"""
+Film Archiver - File Records
+"""
+import os
+import sys
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+from config.settings import MAX_THUMBNAIL_SIZE
+from core.thumbnail_cache import ThumbnailCache
+from utils.memory import object_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class FileRecord:
+    """Metadata computed once per loaded file"""
+
+    __slots__ = ('path', 'size', 'mtime_ns', 'inode', 'original_date', 'thumbnail_key', 'problem')
+
+    FIELDS = __slots__
+
+    def __init__(self, path, size=None, mtime_ns=None, inode=None,
+                 original_date=None, thumbnail_key=None, problem=None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.original_date = original_date
+        self.thumbnail_key = thumbnail_key
+        self.problem = problem  # Structural damage found by core.validation, if any
+
+    @property
+    def fingerprint(self):
+        return (self.size, self.mtime_ns, self.inode)
+
+    def update_stat(self, st: os.stat_result):
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.inode = st.st_ino
+
+    def matches(self, st: os.stat_result) -> bool:
+        """True if the file on disk still has the recorded fingerprint"""
+        return self.fingerprint == (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def to_row(self) -> list:
+        return [getattr(self, field) for field in self.FIELDS]
+
+    @classmethod
+    def from_row(cls, fields, row) -> 'FileRecord':
+        return cls(**dict(zip(fields, row)))
+
+
+class RecordStore:
+    """Records for the files in the current roll, keyed by path.
+
+    Dates are read from EXIF once and reused on every list refresh instead of
+    re-opening each image per keystroke.
+    """
+
+    def __init__(self, file_manager):
+        self.file_manager = file_manager
+        self._records: Dict[str, FileRecord] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, path):
+        return path in self._records
+
+    def get(self, path: str) -> FileRecord:
+        """Return the record for path, reading its metadata on first use"""
+        with self._lock:
+            record = self._records.get(path)
+        if record is None:
+            record = self.scan(path)
+            with self._lock:
+                self._records[path] = record
+        return record
+
+    def scan(self, path: str) -> FileRecord:
+        """Build a fresh record from the file on disk"""
+        record = FileRecord(path)
+        try:
+            record.update_stat(os.stat(path))
+        except OSError as e:
+            logger.error(f"Error reading file information for {path}: {e}")
+        record.original_date = self.file_manager.get_image_date(path)
+        return record
+
+    def original_date(self, path: str) -> str:
+        return self.get(path).original_date
+
+    def problem(self, path: str) -> Optional[str]:
+        return self.get(path).problem
+
+    def set_problems(self, paths: Iterable[str], problems: Dict[str, str]):
+        """Record validation results for paths (files missing from problems are intact)"""
+        for path in paths:
+            self.get(path).problem = problems.get(path)
+
+    def thumbnail_key(self, path: str, size=MAX_THUMBNAIL_SIZE) -> Optional[str]:
+        """Return the thumbnail cache key, remembering it for the session"""
+        record = self.get(path)
+        if size != MAX_THUMBNAIL_SIZE:
+            return ThumbnailCache.cache_key(path, size)
+        if record.thumbnail_key is None:
+            record.thumbnail_key = ThumbnailCache.cache_key(path, size)
+        return record.thumbnail_key
+
+    def memory_usage(self):
+        """(entries, approximate bytes) for the records and their index"""
+        with self._lock:
+            records = list(self._records.values())
+            total = sys.getsizeof(self._records)
+        total += sum(object_bytes(record) for record in records)
+        return len(records), total
+
+    def put(self, record: FileRecord):
+        with self._lock:
+            self._records[record.path] = record
+
+    def load(self, records: Iterable[FileRecord]):
+        """Replace the store with records restored from a session"""
+        with self._lock:
+            self._records = {record.path: record for record in records}
+
+    def records(self, paths: Iterable[str]):
+        return [self.get(path) for path in paths]
+
+    def remove(self, path: str):
+        with self._lock:
+            self._records.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
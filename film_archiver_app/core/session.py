@@ -0,0 +1,84 @@
+"""
+Film Archiver - Session Save/Restore
+"""
+import os
+import gzip
+import json
+import time
+import logging
+from typing import List, Optional, Tuple
+
+from config.settings import SESSION_FILE
+from core.records import FileRecord
+from core.validation import check_file
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes; older sessions are ignored, not migrated
+SESSION_VERSION = 1
+
+
+def save_session(settings: dict, records: List[FileRecord], session_file=SESSION_FILE) -> bool:
+    """Write the roll settings and file records to the session file.
+
+    Records are stored column-wise (one field list, then a row per file) as
+    gzipped compact JSON and written through a temp file + os.replace so a
+    crash never leaves a truncated session.
+    """
+    session = {
+        'version': SESSION_VERSION,
+        'saved_at': time.time(),
+        'settings': settings,
+        'fields': list(FileRecord.FIELDS),
+        'files': [record.to_row() for record in records],
+    }
+    tmp_file = session_file.with_suffix('.tmp')
+    try:
+        session_file.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+            json.dump(session, f, separators=(',', ':'))
+        os.replace(tmp_file, session_file)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving session: {e}")
+        return False
+
+
+def load_session(session_file=SESSION_FILE) -> Optional[Tuple[dict, List[FileRecord]]]:
+    """Read a saved session, or None if there is none or it is unusable"""
+    try:
+        if not session_file.exists():
+            return None
+        with gzip.open(session_file, 'rt', encoding='utf-8') as f:
+            session = json.load(f)
+        if session.get('version') != SESSION_VERSION:
+            logger.info(f"Ignoring session with version {session.get('version')}")
+            return None
+        fields = session['fields']
+        records = [FileRecord.from_row(fields, row) for row in session['files']]
+        return session.get('settings', {}), records
+    except Exception as e:
+        logger.error(f"Error loading session: {e}")
+        return None
+
+
+def revalidate(records: List[FileRecord], record_store, on_changed, on_missing, cancelled=None):
+    """Check restored records against the disk (run on a worker thread).
+
+    Unchanged files cost one stat. Changed files are re-read through the
+    record store and reported via on_changed(record); vanished files are
+    reported via on_missing(path).
+    """
+    for record in records:
+        if cancelled is not None and cancelled.is_set():
+            return
+        try:
+            st = os.stat(record.path)
+        except OSError:
+            on_missing(record.path)
+            continue
+        if not record.matches(st):
+            logger.info(f"{record.path} changed since the session was saved")
+            changed = record_store.scan(record.path)
+            changed.problem = check_file(record.path)
+            on_changed(changed)
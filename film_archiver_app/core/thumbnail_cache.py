@@ -0,0 +1,167 @@
+"""
+Film Archiver - Shared Thumbnail Cache
+"""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+
+from PIL import Image
+
+from config.settings import (
+    MAX_THUMBNAIL_SIZE, MAX_CACHE_ENTRIES, THUMBNAIL_QUALITY,
+    THUMBNAIL_CACHE_DIR, THUMBNAIL_WORKERS
+)
+from utils.memory import image_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """Thread-safe thumbnail cache shared by the preview and the lightbox.
+
+    Thumbnails are kept as PIL images in a memory LRU and persisted as JPEGs
+    in THUMBNAIL_CACHE_DIR, keyed by path, size, mtime and requested size,
+    so a changed file never serves a stale thumbnail.
+    """
+
+    def __init__(self, file_manager, max_entries=MAX_CACHE_ENTRIES,
+                 cache_dir=THUMBNAIL_CACHE_DIR, workers=THUMBNAIL_WORKERS):
+        self.file_manager = file_manager
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @staticmethod
+    def cache_key(image_path: str, size=MAX_THUMBNAIL_SIZE) -> Optional[str]:
+        """Build the cache key for a file, or None if it cannot be stat'ed"""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        raw = f"{os.path.abspath(image_path)}|{st.st_size}|{st.st_mtime_ns}|{size[0]}x{size[1]}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, image_path: str, size=MAX_THUMBNAIL_SIZE,
+            key: Optional[str] = None) -> Optional[Image.Image]:
+        """Return a thumbnail, generating it on a miss.
+
+        Concurrent requests for the same key wait for a single decode instead
+        of decoding the file once per caller.
+        """
+        key = key or self.cache_key(image_path, size)
+        if key is None:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            pending.wait()
+            with self._lock:
+                return self._entries.get(key)
+
+        thumbnail = None
+        try:
+            thumbnail = self._load_from_disk(key)
+            if thumbnail is None:
+                thumbnail = self.file_manager.create_thumbnail(image_path, size)
+                if thumbnail is not None:
+                    self._save_to_disk(key, thumbnail)
+            if thumbnail is not None:
+                self._store(key, thumbnail)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set()
+        return thumbnail
+
+    def peek(self, image_path: str, size=MAX_THUMBNAIL_SIZE,
+             key: Optional[str] = None) -> Optional[Image.Image]:
+        """Return a thumbnail only if it is already in memory"""
+        key = key or self.cache_key(image_path, size)
+        with self._lock:
+            thumbnail = self._entries.get(key)
+            if thumbnail is not None:
+                self._entries.move_to_end(key)
+            return thumbnail
+
+    def disk_file(self, image_path: str, size=MAX_THUMBNAIL_SIZE):
+        """Path of the persisted JPEG thumbnail if one exists for the file as it is now"""
+        key = self.cache_key(image_path, size)
+        if key is None:
+            return None
+        path = self._disk_path(key)
+        return path if path.exists() else None
+
+    def submit(self, image_path: str, size=MAX_THUMBNAIL_SIZE) -> Future:
+        """Generate a thumbnail on the shared worker pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="thumbnail")
+        return self._executor.submit(self.get, image_path, size)
+
+    def memory_usage(self):
+        """(entries, bytes) held by the in-memory tier"""
+        with self._lock:
+            images = list(self._entries.values())
+        return len(images), sum(image_bytes(img) for img in images)
+
+    def clear(self):
+        """Drop all in-memory thumbnails (disk entries are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        """Stop the worker pool, abandoning queued jobs"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _store(self, key: str, thumbnail: Image.Image):
+        with self._lock:
+            self._entries[key] = thumbnail
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str):
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def _load_from_disk(self, key: str) -> Optional[Image.Image]:
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img.copy()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug(f"Discarding unreadable cached thumbnail {path}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, thumbnail: Image.Image):
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            img = thumbnail if thumbnail.mode in ('RGB', 'L') else thumbnail.convert('RGB')
+            img.save(tmp_path, 'JPEG', quality=THUMBNAIL_QUALITY)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.debug(f"Could not persist thumbnail {key}: {e}")
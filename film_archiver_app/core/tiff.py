@@ -0,0 +1,112 @@
+"""
+Film Archiver - TIFF Directories
+
+Reads and writes classic (32-bit offset) TIFF directories without decoding
+any samples. Shared by recompression, which rewrites them, and structural
+validation, which checks that they fit in the file.
+"""
+import struct
+
+# Bytes per value of each TIFF field type
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+INT_FORMATS = {1: 'B', 3: 'H', 4: 'L', 13: 'L'}
+SHORT, LONG, IFD = 3, 4, 13
+
+# Tags pointing at another directory: EXIF, GPS, Interoperability
+IFD_POINTER_TAGS = (34665, 34853, 40965)
+
+IMAGE_WIDTH, IMAGE_LENGTH, BITS_PER_SAMPLE, COMPRESSION = 256, 257, 258, 259
+STRIP_OFFSETS, SAMPLES_PER_PIXEL, ROWS_PER_STRIP, STRIP_BYTE_COUNTS = 273, 277, 278, 279
+PLANAR_CONFIGURATION, TILE_WIDTH, PREDICTOR, SUB_IFDS, SAMPLE_FORMAT = 284, 322, 317, 330, 339
+TILE_OFFSETS, TILE_BYTE_COUNTS = 324, 325
+
+
+class UnsupportedTiff(Exception):
+    """The file is valid but uses something the caller does not handle"""
+
+
+def read_header(f):
+    """(byte order, first directory offset) from the start of a TIFF"""
+    header = f.read(8)
+    if header[:2] == b'II':
+        order = '<'
+    elif header[:2] == b'MM':
+        order = '>'
+    else:
+        raise UnsupportedTiff("not a TIFF file")
+    magic, offset = struct.unpack(order + 'HL', header[2:8])
+    if magic != 42:
+        raise UnsupportedTiff("BigTIFF is not supported" if magic == 43 else "not a TIFF file")
+    return order, offset
+
+
+def read_ifd(f, order: str, offset: int, skip_unknown: bool = False, depth: int = 0):
+    """({tag: [type, count, raw data, sub-directory]}, next IFD offset)
+
+    Raises ValueError if the directory or a tag value runs past the end of
+    the file. Tags of a type not in TYPE_SIZES raise UnsupportedTiff, or are
+    left out when skip_unknown is set, as the TIFF spec asks of readers.
+    """
+    f.seek(offset)
+    (count,) = struct.unpack(order + 'H', f.read(2))
+    table = f.read(count * 12 + 4)
+    if len(table) != count * 12 + 4:
+        raise ValueError("truncated directory")
+    entries = {}
+    for start in range(0, count * 12, 12):
+        tag, typ, n = struct.unpack(order + 'HHL', table[start:start + 8])
+        if typ not in TYPE_SIZES:
+            if skip_unknown:
+                continue
+            raise UnsupportedTiff(f"unknown type {typ} for tag {tag}")
+        length = TYPE_SIZES[typ] * n
+        field = table[start + 8:start + 12]
+        if length <= 4:
+            data = field[:length]
+        else:
+            f.seek(struct.unpack(order + 'L', field)[0])
+            data = f.read(length)
+            if len(data) != length:
+                raise ValueError(f"truncated data for tag {tag}")
+        entry = [typ, n, data, None]
+        if tag in IFD_POINTER_TAGS and typ in (LONG, IFD) and n == 1 and depth < 2:
+            sub_offset = struct.unpack(order + 'L', data)[0]
+            entry[3] = read_ifd(f, order, sub_offset, skip_unknown, depth + 1)[0]
+        entries[tag] = entry
+    (next_offset,) = struct.unpack(order + 'L', table[-4:])
+    return entries, next_offset
+
+
+def tag_values(entries, tag: int, order: str, default=None):
+    """Integer values of a tag, or default if it is absent"""
+    entry = entries.get(tag)
+    if entry is None:
+        return default
+    typ, n, data, _ = entry
+    if typ not in INT_FORMATS:
+        raise UnsupportedTiff(f"unexpected type {typ} for tag {tag}")
+    return struct.unpack(f"{order}{n}{INT_FORMATS[typ]}", data)
+
+
+def ifd_bytes(order: str, entries, offset: int) -> bytes:
+    """Serialise a directory placed at offset, followed by its data and sub-directories"""
+    tags = sorted(entries)
+    data_offset = offset + 2 + 12 * len(tags) + 4
+    table = [struct.pack(order + 'H', len(tags))]
+    extra = bytearray()
+    for tag in tags:
+        typ, n, data, sub = entries[tag]
+        if sub is not None or len(data) > 4:
+            if (data_offset + len(extra)) % 2:
+                extra += b'\0'  # values start on a word boundary
+            position = data_offset + len(extra)
+            if sub is not None:
+                extra += ifd_bytes(order, sub, position)
+            else:
+                extra += data
+            field = struct.pack(order + 'L', position)
+        else:
+            field = data.ljust(4, b'\0')
+        table.append(struct.pack(order + 'HHL', tag, typ, n) + field)
+    table.append(struct.pack(order + 'L', 0))
+    return b''.join(table) + bytes(extra)
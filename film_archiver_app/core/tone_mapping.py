@@ -0,0 +1,154 @@
+"""
+Film Archiver - High Bit Depth Preview Tone Mapping
+"""
+import mmap
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from config.settings import (
+    PREVIEW_BLACK_PERCENTILE, PREVIEW_WHITE_PERCENTILE,
+    PREVIEW_GAMMA, PREVIEW_FLOAT_GAMMA
+)
+from core.decoding import get_decode_budget
+
+logger = logging.getLogger(__name__)
+
+# NumPy is optional and slow to import, so it is loaded on first use
+np = None
+_numpy_checked = False
+
+HIGH_BIT_DEPTH_MODES = {'I', 'F', 'I;16', 'I;16B', 'I;16L', 'I;16N'}
+
+# Rows averaged per chunk when reading samples straight from a TIFF
+_CHUNK_ROWS = 256
+
+
+def _load_numpy() -> bool:
+    """Import NumPy on first use; False if it is not installed"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            logger.info("NumPy is not installed; high bit depth previews use Image.convert")
+    return np is not None
+
+
+def needs_tone_mapping(img: Image.Image) -> bool:
+    """True for decoded images whose samples do not fit in 8 bits"""
+    return img.mode in HIGH_BIT_DEPTH_MODES and _load_numpy()
+
+
+def read_high_bit_depth(img: Image.Image, size: Tuple[int, int]):
+    """Read an uncompressed 16-bit TIFF's samples straight from the file.
+
+    Pillow truncates 48-bit RGB to 8 bits when decoding, so the strips are
+    memory-mapped and block-averaged with NumPy into a float32 array about
+    twice `size`. Returns None when the file is not a chunky, uncompressed,
+    unsigned 16-bit striped TIFF (or NumPy is missing).
+    """
+    if img.format != 'TIFF' or not getattr(img, 'filename', None):
+        return None
+    tags = img.tag_v2
+    bits = tags.get(258)
+    bits = bits if isinstance(bits, tuple) else (bits,)
+    samples = tags.get(277, 1)
+    if (tags.get(259, 1) != 1 or tags.get(284, 1) != 1 or tags.get(339, 1) not in (1, (1,) * samples)
+            or tags.get(262) not in (1, 2) or 273 not in tags or samples not in (1, 3, 4)
+            or any(b != 16 for b in bits) or not _load_numpy()):
+        return None
+
+    width, height = img.size
+    rows_per_strip = min(tags.get(278, height), height)
+    offsets = tags[273]
+    dtype = np.dtype(np.uint16).newbyteorder(tags._endian)
+    factor = max(1, min(width // (size[0] * 2), height // (size[1] * 2)))
+    chunk_rows = max(factor, (_CHUNK_ROWS // factor) * factor)
+    row_values = width * samples
+
+    out_rows = []
+    carry = None
+    with open(img.filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for strip, offset in enumerate(offsets):
+            rows = min(rows_per_strip, height - strip * rows_per_strip)
+            if rows <= 0:
+                break
+            data = np.frombuffer(mm, dtype=dtype, count=rows * row_values, offset=offset)
+            data = data.reshape(rows, width, samples)
+            for start in range(0, rows, chunk_rows):
+                chunk = data[start:start + chunk_rows]
+                if carry is not None:
+                    chunk = np.concatenate([carry, chunk])
+                    carry = None
+                usable = (chunk.shape[0] // factor) * factor
+                if usable:
+                    with get_decode_budget().reserve(chunk[:usable].size * 4):
+                        out_rows.append(_block_mean(chunk[:usable], factor))
+                if usable < chunk.shape[0]:
+                    carry = np.array(chunk[usable:])
+            # Views into the map must be released before it is closed
+            chunk = data = None
+
+    if not out_rows:
+        return None
+    array = np.concatenate(out_rows)
+    if samples == 4:
+        array = array[:, :, :3]
+    return array[:, :, 0] if samples == 1 else array
+
+
+def tone_map(source) -> Optional[Image.Image]:
+    """Convert high bit depth samples to an 8-bit preview image.
+
+    Accepts a decoded 'I'/'F' image or an array from read_high_bit_depth.
+    Levels are stretched between low and high percentiles of the (already
+    downsampled) data, then gamma is applied; 16-bit integer data goes
+    through a 64K-entry lookup table.
+    """
+    if not _load_numpy():
+        return None
+
+    if isinstance(source, Image.Image):
+        is_float = source.mode == 'F'
+        array = np.asarray(source)
+    else:
+        is_float = False
+        array = source
+
+    gamma = PREVIEW_FLOAT_GAMMA if is_float else PREVIEW_GAMMA
+    finite = array[np.isfinite(array)] if is_float else array
+    if finite.size == 0:
+        return None
+    lo, hi = np.percentile(finite, (PREVIEW_BLACK_PERCENTILE, PREVIEW_WHITE_PERCENTILE))
+    if hi <= lo:
+        hi = lo + 1
+
+    if not is_float and array.dtype.kind in 'iu' and array.min() >= 0 and array.max() < 65536:
+        levels = np.arange(65536, dtype=np.float32)
+        lut = _stretch(levels, lo, hi, gamma)
+        mapped = lut[array.astype(np.uint16)]
+    else:
+        mapped = _stretch(np.nan_to_num(array.astype(np.float32)), lo, hi, gamma)
+
+    return Image.fromarray(mapped, 'RGB' if mapped.ndim == 3 else 'L')
+
+
+def _stretch(values, lo: float, hi: float, gamma: float):
+    scaled = np.clip((values - lo) / (hi - lo), 0.0, 1.0)
+    if gamma != 1.0:
+        scaled = scaled ** (1.0 / gamma)
+    return (scaled * 255.0 + 0.5).astype(np.uint8)
+
+
+def _block_mean(chunk, factor: int):
+    """Average factor x factor blocks of a (rows, width, samples) array"""
+    if factor == 1:
+        return chunk.astype(np.float32)
+    rows, width, samples = chunk.shape
+    width -= width % factor
+    blocks = chunk[:, :width].reshape(rows // factor, factor, width // factor, factor, samples)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
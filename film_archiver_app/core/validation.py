@@ -0,0 +1,199 @@
+"""
+Film Archiver - Structural Validation
+
+Catches truncated or corrupt scans when they are added, without decoding
+them:
+
+- JPEG: the start and end-of-image markers are present and every segment
+  length stays inside the file. Entropy-coded data is skipped with one
+  regex search per scan.
+- TIFF: every directory, tag value, strip and tile lies within the file.
+- PNG: each chunk fits in the file, its CRC matches, and the file runs
+  from IHDR to IEND.
+
+Other formats are not checked. A file is read at most once, and JPEG and
+TIFF checks usually touch only a few kilobytes.
+"""
+import os
+import re
+import mmap
+import zlib
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from config.settings import VALIDATION_WORKERS
+from core.tiff import (
+    UnsupportedTiff, STRIP_OFFSETS, STRIP_BYTE_COUNTS, TILE_OFFSETS, TILE_BYTE_COUNTS,
+    read_header, read_ifd, tag_values
+)
+
+logger = logging.getLogger(__name__)
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+PNG_EXTENSIONS = ('.png',)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# JPEG markers
+SOI, EOI, SOS, TEM = 0xD8, 0xD9, 0xDA, 0x01
+RST_MARKERS = range(0xD0, 0xD8)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# The first marker after entropy-coded data: 0xFF not followed by a stuffed
+# zero, a restart marker or another fill byte
+SCAN_END = re.compile(rb'\xff[^\x00\xd0-\xd7\xff]')
+
+MAX_TIFF_DIRECTORIES = 1024
+# (offsets, byte counts) tag pairs for strips and tiles
+TIFF_DATA_TAGS = ((STRIP_OFFSETS, STRIP_BYTE_COUNTS), (TILE_OFFSETS, TILE_BYTE_COUNTS))
+
+
+def check_jpeg(data) -> Optional[str]:
+    """Problem with a JPEG's marker structure, or None if it is intact"""
+    size = len(data)
+    if data[:2] != b'\xff\xd8':
+        return "missing JPEG start-of-image marker"
+    pos = 2
+    seen_frame = seen_scan = False
+    while True:
+        if pos + 2 > size:
+            return "truncated: no end-of-image marker"
+        if data[pos] != 0xFF:
+            return f"expected a marker at byte {pos}"
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        pos += 2
+        if marker == EOI:
+            break
+        if marker in RST_MARKERS or marker == TEM:
+            continue
+        if pos + 2 > size:
+            return f"truncated in marker 0xFF{marker:02X}"
+        length = (data[pos] << 8) | data[pos + 1]
+        if length < 2:
+            return f"invalid length {length} for marker 0xFF{marker:02X} at byte {pos - 2}"
+        if pos + length > size:
+            return f"truncated in marker 0xFF{marker:02X} at byte {pos - 2}"
+        pos += length
+        if marker in SOF_MARKERS:
+            seen_frame = True
+        elif marker == SOS:
+            if not seen_frame:
+                return "scan data before the frame header"
+            seen_scan = True
+            match = SCAN_END.search(data, pos)
+            if match is None:
+                return "truncated: image data ends without an end-of-image marker"
+            pos = match.start()
+    if not seen_scan:
+        return "no image data"
+    return None
+
+
+def check_tiff(f, size: int) -> Optional[str]:
+    """Problem with a TIFF's directories and strip or tile ranges, or None"""
+    try:
+        order, offset = read_header(f)
+    except UnsupportedTiff as e:
+        # BigTIFF is left unchecked rather than reported
+        return None if "BigTIFF" in str(e) else str(e)
+    except struct.error:
+        return "truncated TIFF header"
+
+    seen = set()
+    while offset:
+        if offset in seen or len(seen) >= MAX_TIFF_DIRECTORIES:
+            return "directory chain loops"
+        if offset < 8 or offset + 2 > size:
+            return f"directory offset {offset} is outside the file"
+        seen.add(offset)
+        try:
+            # Tags of unknown types are skipped; the strips and tiles are still checked
+            entries, offset = read_ifd(f, order, offset, skip_unknown=True)
+        except (ValueError, struct.error) as e:
+            return f"damaged directory {len(seen)}: {e}"
+
+        for offsets_tag, counts_tag in TIFF_DATA_TAGS:
+            try:
+                offsets = tag_values(entries, offsets_tag, order)
+                counts = tag_values(entries, counts_tag, order)
+            except (UnsupportedTiff, struct.error):
+                return f"unreadable image data table in directory {len(seen)}"
+            if offsets is None:
+                continue
+            if counts is None or len(counts) != len(offsets):
+                return f"image data byte counts missing in directory {len(seen)}"
+            for start, count in zip(offsets, counts):
+                if start + count > size:
+                    return (f"image data at byte {start} runs {start + count - size} bytes "
+                            f"past the end of the file (truncated)")
+    if not seen:
+        return "no image directory"
+    return None
+
+
+def check_png(f, size: int) -> Optional[str]:
+    """Problem with a PNG's chunk layout or CRCs, or None"""
+    if f.read(8) != PNG_SIGNATURE:
+        return "missing PNG signature"
+    pos = 8
+    first = True
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return "truncated: no IEND chunk"
+        length, chunk_type = struct.unpack('>L4s', header)
+        if pos + 12 + length > size:
+            return f"truncated in {chunk_type.decode('latin-1')} chunk at byte {pos}"
+        if first and chunk_type != b'IHDR':
+            return "first chunk is not IHDR"
+        first = False
+        crc = zlib.crc32(chunk_type)
+        remaining = length
+        while remaining:
+            block = f.read(min(remaining, 1024 * 1024))
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+        (expected,) = struct.unpack('>L', f.read(4))
+        if crc != expected:
+            return f"CRC mismatch in {chunk_type.decode('latin-1')} chunk at byte {pos}"
+        pos += 12 + length
+        if chunk_type == b'IEND':
+            return None
+
+
+def check_file(path: str) -> Optional[str]:
+    """Describe why a JPEG, TIFF or PNG looks damaged; None if it is intact or not checked"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in JPEG_EXTENSIONS + TIFF_EXTENSIONS + PNG_EXTENSIONS:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return "empty file"
+            if ext in JPEG_EXTENSIONS:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return check_jpeg(data)
+            if ext in TIFF_EXTENSIONS:
+                return check_tiff(f, size)
+            return check_png(f, size)
+    except OSError as e:
+        return f"unreadable: {e}"
+    except Exception as e:
+        logger.error(f"Error validating {path}: {e}")
+        return None
+
+
+def validate_files(paths: Iterable[str], workers: int = VALIDATION_WORKERS) -> Dict[str, str]:
+    """{path: problem} for every damaged file in paths, checked in parallel"""
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="validate") as executor:
+        problems = {path: problem for path, problem in zip(paths, executor.map(check_file, paths)) if problem}
+    for path, problem in problems.items():
+        logger.warning(f"{path} failed validation: {problem}", extra={'file': path})
+    return problems
@@ -4,6 +4,12 @@ Film Archiver - Main Entry Point
 """
 import sys
 import logging
+import multiprocessing
+
+from utils.startup import StartupTimer
+
+startup_timer = StartupTimer()
+
 import tkinter as tk
 from tkinter import messagebox
 
@@ -13,20 +19,34 @@ from ui.main_window import FilmArchiverWindow
 def main():
     """Main application entry point with improved error handling"""
     try:
+        startup_timer.mark("imports")
+        
         # Configure logging
         configure_logging()
         logger = logging.getLogger(__name__)
+        startup_timer.mark("logging")
         
         # Create main window
         root = tk.Tk()
         app = FilmArchiverWindow(root)
+        startup_timer.mark("window")
+        app.restore_session()
+        startup_timer.mark("session")
+        
+        def on_ready():
+            startup_timer.mark("first idle")
+            logger.info(startup_timer.report())
+            
+        root.after_idle(on_ready)
         
         # Set up window close handling
         def on_closing():
             try:
-                root.destroy()
+                app.shutdown()
             except Exception as e:
                 logger.error(f"Error during cleanup: {e}")
+            finally:
+                root.destroy()
                 
         root.protocol("WM_DELETE_WINDOW", on_closing)
         
@@ -42,4 +62,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Proxy rendering workers are spawned; needed when running as a frozen app
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
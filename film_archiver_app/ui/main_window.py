@@ -4,20 +4,32 @@ Film Archiver - Main Window
 import os
 import logging
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime
-from PIL import Image, ImageTk
-from tkcalendar import Calendar
-import shutil
-import piexif
+import threading
 
 from core.file_manager import FileManager
+from core.duplicates import DuplicateFinder, CATALOG
+from core.autocomplete import PrefixIndex
 from core.preferences import PreferenceManager
+from core.processor import RollProcessor, ProcessingError, build_filename
+from core.progress import format_duration
+from core.records import RecordStore
+from core.session import save_session, load_session, revalidate
+from core.thumbnail_cache import ThumbnailCache
+from core.validation import validate_files
+from ui.widgets.autocomplete import AutocompleteCombobox
+from utils.dispatch import UIDispatcher
+from utils import tracing, profiler
+from utils.stall_monitor import StallMonitor
+from utils.memory import photo_bytes, tk_image_usage, format_bytes
 from config.settings import (
     APP_NAME, IS_MACOS, LIGHT_THEME, DARK_THEME,
-    MAX_THUMBNAIL_SIZE, MAX_CACHE_ENTRIES
+    MAX_THUMBNAIL_SIZE, MAX_CACHE_ENTRIES, PACKAGE_FORMAT
 )
 
+logger = logging.getLogger(__name__)
+
 class FilmArchiverWindow:
     def validate_combobox_input(self, event):
         """Validate and auto-capitalize combobox input"""
@@ -52,14 +64,71 @@ class FilmArchiverWindow:
         # Initialize managers
         self.file_manager = FileManager()
         self.pref_manager = PreferenceManager()
+        self.camera_index = PrefixIndex(self.pref_manager.get_cameras())
+        self.film_index = PrefixIndex(self.pref_manager.get_films())
+        self.thumbnails = ThumbnailCache(self.file_manager)
+        self.records = RecordStore(self.file_manager)
+        self.dispatcher = UIDispatcher(self.root)
+        self.stall_monitor = StallMonitor(self.root)
         
         # Initialize variables
         self.files = []
         self.thumbnail_cache = {}
+        self.lightbox = None
+        self.calendar_window = None
+        self.catalog = None
+        self.catalog_window = None
+        self.proxies_running = False
+        self.fixity_running = False
+        self.fixity_cancel = threading.Event()
+        self.refresh_pending = False
+        self.revalidation_cancel = threading.Event()
         self.colors = LIGHT_THEME if not IS_MACOS else DARK_THEME
         
         # Create UI
+        self.create_menu()
         self.create_main_layout()
+        self.stall_monitor.start()
+        
+    def create_menu(self):
+        """Create the menu bar"""
+        menubar = tk.Menu(self.root)
+        self.root.config(menu=menubar)
+        
+        # Archive menu
+        archive_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Archive", menu=archive_menu)
+        archive_menu.add_command(label="Search Catalog...", command=self.show_catalog)
+        archive_menu.add_command(label="Update Web Proxies...", command=self.update_proxies)
+        archive_menu.add_command(label="Compress TIFF Masters...", command=self.compress_tiffs)
+        archive_menu.add_command(label="Verify Fixity", command=self.verify_fixity)
+        archive_menu.add_separator()
+        
+        # Processed rolls go to a folder, or stream into one tar/zip package
+        self.package_var = tk.StringVar(value=PACKAGE_FORMAT or "")
+        output_menu = tk.Menu(archive_menu, tearoff=0)
+        archive_menu.add_cascade(label="Save Rolls As", menu=output_menu)
+        for label, value in (("Folder", ""), ("Tar Package", "tar"), ("Zip Package", "zip")):
+            output_menu.add_radiobutton(label=label, variable=self.package_var, value=value)
+        archive_menu.add_command(label="Browse Roll Package...", command=self.browse_package)
+        
+        # Diagnostics menu
+        self.diagnostics_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+        
+        self.tracing_var = tk.BooleanVar(value=tracing.is_enabled())
+        self.diagnostics_menu.add_checkbutton(label="Record Trace", variable=self.tracing_var,
+                                              command=lambda: tracing.set_enabled(self.tracing_var.get()))
+        self.diagnostics_menu.add_command(label="Trace Summary", command=self.show_trace_summary)
+        self.diagnostics_menu.add_command(label="Export Trace...", command=self.export_trace)
+        self.diagnostics_menu.add_separator()
+        self.diagnostics_menu.add_command(label="Profile Next Actions...", command=self.arm_profiler)
+        self.diagnostics_menu.add_command(label="Profile Reports...", command=self.show_profile_reports)
+        self.diagnostics_menu.add_separator()
+        self.diagnostics_menu.add_command(label="Memory...", command=self.show_memory_panel)
+        self.diagnostics_menu.add_command(label="UI Responsiveness",
+                                          command=lambda: self.show_text_window("UI Responsiveness",
+                                                                                self.stall_monitor.format_report()))
         
     def create_main_layout(self):
         """Create the main application layout"""
@@ -105,11 +174,10 @@ class FilmArchiverWindow:
         camera_frame = ttk.Frame(input_frame)
         camera_frame.pack(fill='x', pady=5)
         ttk.Label(camera_frame, text="Camera Model:", width=12).pack(side='left')
-        self.camera_model = ttk.Combobox(camera_frame, width=30)
+        self.camera_model = AutocompleteCombobox(camera_frame, self.camera_index,
+                                                 on_commit=self.update_file_list, width=30)
         self.camera_model.pack(side='left', padx=5)
-        self.camera_model['values'] = self.pref_manager.get_cameras()
-        self.camera_model.bind('<<ComboboxSelected>>', lambda e: (self.validate_combobox_input(e), self.update_file_list()))
-        self.camera_model.bind('<KeyRelease>', lambda e: (self.validate_combobox_input(e), self.update_file_list()))
+        self.camera_model.bind('<KeyRelease>', self.validate_combobox_input, add='+')
         
         camera_buttons = ttk.Frame(camera_frame)
         camera_buttons.pack(side='left')
@@ -129,11 +197,10 @@ class FilmArchiverWindow:
         film_frame = ttk.Frame(input_frame)
         film_frame.pack(fill='x', pady=5)
         ttk.Label(film_frame, text="Film Type:", width=12).pack(side='left')
-        self.film_type = ttk.Combobox(film_frame, width=30)
+        self.film_type = AutocompleteCombobox(film_frame, self.film_index,
+                                              on_commit=self.update_file_list, width=30)
         self.film_type.pack(side='left', padx=5)
-        self.film_type['values'] = self.pref_manager.get_films()
-        self.film_type.bind('<<ComboboxSelected>>', lambda e: (self.validate_combobox_input(e), self.update_file_list()))
-        self.film_type.bind('<KeyRelease>', lambda e: (self.validate_combobox_input(e), self.update_file_list()))
+        self.film_type.bind('<KeyRelease>', self.validate_combobox_input, add='+')
         
         film_buttons = ttk.Frame(film_frame)
         film_buttons.pack(side='left')
@@ -182,7 +249,6 @@ class FilmArchiverWindow:
         preview_frame.grid(row=0, column=0, padx=(0, 5), sticky="nsew")
         
         # Set minimum width for preview
-        preview_frame.update()
         preview_frame.grid_propagate(False)
         preview_frame.configure(width=350)
         
@@ -225,6 +291,9 @@ class FilmArchiverWindow:
         x_scroll.pack(side="bottom", fill="x")
         self.file_list.pack(side="left", fill="both", expand=True)
         
+        # Files that failed structural validation
+        self.file_list.tag_configure('damaged', foreground=self.colors['error'])
+        
         # Bind selection event
         self.file_list.bind('<<TreeviewSelect>>', self.on_file_select)
         
@@ -239,6 +308,7 @@ class FilmArchiverWindow:
         self.progress_bar = ttk.Progressbar(progress_frame, 
                                           mode='determinate',
                                           variable=self.progress_var)
+        self.progress_label = ttk.Label(progress_frame, text="")
     
         # Button container
         control_frame = ttk.Frame(self.main_container)
@@ -262,6 +332,11 @@ class FilmArchiverWindow:
                                      command=self.clear_files)
         self.clear_button.pack(side="left", padx=5)
     
+        # Lightbox button
+        self.lightbox_button = ttk.Button(left_buttons, text="Lightbox",
+                                        command=self.show_lightbox)
+        self.lightbox_button.pack(side="left", padx=5)
+    
         # Process button
         self.process_button = ttk.Button(right_buttons, text="Process Files",
                                        command=self.process_files)
@@ -295,33 +370,242 @@ class FilmArchiverWindow:
         widget.bind('<Enter>', enter)
         widget.bind('<Leave>', leave)
 
+    def show_text_window(self, title, text):
+        """Show a read-only report in a monospaced window"""
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        
+        text_widget = tk.Text(window, wrap='none', font=('Courier', 11), width=100, height=30)
+        scrollbar = ttk.Scrollbar(window, orient='vertical', command=text_widget.yview)
+        text_widget.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        text_widget.pack(fill='both', expand=True)
+        
+        text_widget.insert('1.0', text)
+        text_widget.configure(state='disabled')
+        return window
+        
+    def show_trace_summary(self):
+        """Show span timings recorded so far"""
+        icc_stats = self.file_manager.color_manager.stats()
+        text = tracing.format_summary()
+        text += (f"\n\nICC transform cache: {icc_stats['hits']} hits, {icc_stats['misses']} misses, "
+                 f"{icc_stats['entries']} cached ({icc_stats['hit_rate']:.0%} hit rate)")
+        self.show_text_window("Trace Summary", text)
+        
+    def export_trace(self):
+        """Save recorded spans as Chrome trace JSON"""
+        path = filedialog.asksaveasfilename(
+            title="Export Trace",
+            defaultextension=".json",
+            initialfile=f"film-archiver-trace-{datetime.now():%Y%m%d-%H%M%S}.json",
+            filetypes=[("Chrome Trace", "*.json")]
+        )
+        if not path:
+            return
+        try:
+            count = tracing.export_chrome_trace(path)
+            messagebox.showinfo("Trace Exported", f"Saved {count} spans. Open the file in chrome://tracing or Perfetto.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not export trace: {str(e)}")
+
+    def arm_profiler(self):
+        """Profile the next few user actions with cProfile and tracemalloc"""
+        count = simpledialog.askinteger(
+            "Profile Next Actions",
+            "Profile how many of the next actions?\n(add files, refresh, select, process)",
+            parent=self.root, initialvalue=1, minvalue=1, maxvalue=20
+        )
+        if count:
+            profiler.arm(count)
+            
+    def show_profile_reports(self):
+        """Open the profile report viewer"""
+        from ui.widgets.profile_viewer import ProfileViewer
+        ProfileViewer(self.root)
+
+    def get_catalog(self):
+        """Open the archive catalog on first use (None if it cannot be opened)"""
+        if self.catalog is None:
+            try:
+                from core.catalog import Catalog
+                self.catalog = Catalog()
+            except Exception as e:
+                logger.error(f"Could not open the archive catalog: {e}")
+        return self.catalog
+        
+    def show_catalog(self):
+        """Open (or raise) the catalog search window"""
+        if self.catalog_window and not self.catalog_window.closed:
+            self.catalog_window.top.lift()
+            return
+        catalog = self.get_catalog()
+        if catalog is None:
+            messagebox.showerror("Error", "The archive catalog could not be opened. See the log for details.")
+            return
+        from ui.widgets.catalog_search import CatalogSearchWindow
+        self.catalog_window = CatalogSearchWindow(self.root, catalog, self.dispatcher, self.thumbnails)
+        
+    def update_proxies(self):
+        """Render missing or outdated JPEG proxies for every roll under a folder"""
+        if self.proxies_running:
+            messagebox.showinfo("Web Proxies", "Proxies are already being updated.")
+            return
+        root_dir = filedialog.askdirectory(title="Select Archive Folder")
+        if not root_dir:
+            return
+        self.proxies_running = True
+
+        def worker():
+            from core.derivatives import update_archive
+            try:
+                result = update_archive(root_dir)
+                self.dispatcher.post(self.on_proxies_done, result, None)
+            except Exception as e:
+                logger.error(f"Proxy update failed: {e}")
+                self.dispatcher.post(self.on_proxies_done, None, e)
+
+        threading.Thread(target=worker, name="proxies", daemon=True).start()
+
+    def on_proxies_done(self, result, error):
+        self.proxies_running = False
+        if error:
+            messagebox.showerror("Error", f"Proxy update failed: {str(error)}")
+            return
+        messagebox.showinfo("Web Proxies",
+                            f"{result['rendered']} rendered, {result['skipped']} already current, "
+                            f"{result['removed']} removed, {result['errors']} errors")
+
+    def verify_fixity(self):
+        """Re-hash catalogued frames in the background, rate limited during working hours"""
+        if self.fixity_running:
+            messagebox.showinfo("Verify Fixity", "A fixity check is already running.")
+            return
+        catalog = self.get_catalog()
+        if catalog is None:
+            messagebox.showerror("Error", "The archive catalog could not be opened. See the log for details.")
+            return
+        self.fixity_running = True
+
+        def worker():
+            from core.fixity import check_fixity, format_report
+            try:
+                result = check_fixity(catalog, cancelled=self.fixity_cancel.is_set)
+                if self.fixity_cancel.is_set():
+                    return
+                report = format_report(result, catalog.fixity_problems(), catalog.fixity_stats())
+                self.dispatcher.post(self.on_fixity_done, report, None)
+            except Exception as e:
+                logger.error(f"Fixity check failed: {e}")
+                self.dispatcher.post(self.on_fixity_done, None, e)
+
+        threading.Thread(target=worker, name="fixity", daemon=True).start()
+
+    def on_fixity_done(self, report, error):
+        self.fixity_running = False
+        if error:
+            messagebox.showerror("Error", f"Fixity check failed: {str(error)}")
+            return
+        self.show_text_window("Fixity Check", report)
+
+    def browse_package(self):
+        """Preview and extract frames of a packaged roll"""
+        package_path = filedialog.askopenfilename(
+            title="Select Roll Package",
+            filetypes=[("Roll packages", "*.tar *.zip"), ("All files", "*.*")]
+        )
+        if not package_path:
+            return
+        from ui.widgets.package_browser import PackageBrowser
+        try:
+            PackageBrowser(self.root, package_path, self.dispatcher)
+        except Exception as e:
+            logger.error(f"Could not open roll package {package_path}: {e}")
+            messagebox.showerror("Error", f"Could not open package: {str(e)}")
+
+    def compress_tiffs(self):
+        """Losslessly compress the uncompressed TIFF masters under a folder"""
+        root_dir = filedialog.askdirectory(title="Select Archive Folder")
+        if not root_dir:
+            return
+        if not messagebox.askyesno(
+            "Compress TIFF Masters",
+            "Uncompressed TIFFs will be replaced by losslessly compressed copies once each copy "
+            "has been verified. Continue?"
+        ):
+            return
+
+        catalog = self.get_catalog()
+
+        def worker():
+            from core.recompress import recompress_archive, format_report
+            try:
+                report = format_report(recompress_archive(root_dir, catalog=catalog))
+                self.dispatcher.post(self.show_text_window, "TIFF Compression", report)
+            except Exception as e:
+                logger.error(f"TIFF compression failed: {e}")
+                self.dispatcher.post(messagebox.showerror, "Error", f"TIFF compression failed: {str(e)}")
+
+        threading.Thread(target=worker, name="compress-tiffs", daemon=True).start()
+
+    def memory_usage(self):
+        """Rows of (subsystem, entries, bytes) for the memory panel"""
+        from core.decoding import get_decode_budget
+        
+        windows = [w for w in self.root.winfo_children() if isinstance(w, tk.Toplevel)]
+        return [
+            ("Preview cache (PhotoImage)", len(self.thumbnail_cache),
+             sum(photo_bytes(photo) for photo in self.thumbnail_cache.values())),
+            ("Decoded thumbnail cache (PIL)", *self.thumbnails.memory_usage()),
+            ("File records", *self.records.memory_usage()),
+            ("Tk images (preview and lightbox)", *tk_image_usage(self.root)),
+            ("Image decodes in progress", None, get_decode_budget().in_use),
+            ("Open windows", len(windows), None),
+        ]
+        
+    def show_memory_panel(self):
+        """Open the memory accounting panel"""
+        from ui.widgets.memory_panel import MemoryPanel
+        MemoryPanel(self.root, self.memory_usage)
+
     def add_camera_to_list(self):
         """Add current camera to saved list"""
         camera = self.camera_model.get().strip().upper()
         if camera:
             self.pref_manager.add_camera(camera)
-            self.camera_model['values'] = self.pref_manager.get_cameras()
+            self.camera_index.add(camera)
+            self.refresh_suggestions()
 
     def remove_camera_from_list(self):
         """Remove current camera from saved list"""
         camera = self.camera_model.get().strip().upper()
         if camera:
             self.pref_manager.remove_camera(camera)
-            self.camera_model['values'] = self.pref_manager.get_cameras()
+            self.camera_index.remove(camera)
+            self.refresh_suggestions()
 
     def add_film_to_list(self):
         """Add current film to saved list"""
         film = self.film_type.get().strip().upper()
         if film:
             self.pref_manager.add_film(film)
-            self.film_type['values'] = self.pref_manager.get_films()
+            self.film_index.add(film)
+            self.refresh_suggestions()
 
     def remove_film_from_list(self):
         """Remove current film from saved list"""
         film = self.film_type.get().strip().upper()
         if film:
             self.pref_manager.remove_film(film)
-            self.film_type['values'] = self.pref_manager.get_films()
+            self.film_index.remove(film)
+            self.refresh_suggestions()
+
+    def refresh_suggestions(self):
+        """Re-rank the autocomplete indexes after favourites or usage change"""
+        self.camera_index.set_ranking(self.pref_manager.get_cameras())
+        self.film_index.set_ranking(self.pref_manager.get_films())
+        self.camera_model.refresh_values()
+        self.film_type.refresh_values()
 
     def add_files(self):
         """Handle adding new files"""
@@ -329,16 +613,88 @@ class FilmArchiverWindow:
         if not new_files:
             return
             
+        # Check for duplicates (usually just a stat per file) and damaged files off the UI thread
+        self.add_button.configure(state='disabled')
+        session_files = list(self.files)
+        catalog = self.get_catalog()
+        
+        def worker():
+            duplicates, problems = self.check_added_files(new_files, session_files, catalog)
+            self.dispatcher.post(self.finish_add_files, new_files, duplicates, problems)
+            
+        threading.Thread(target=worker, name="duplicate-check", daemon=True).start()
+        
+    @profiler.profiled("add_files")
+    def check_added_files(self, new_files, session_files, catalog):
+        """Worker thread: (duplicates, {path: problem}) for the files being added"""
+        try:
+            duplicates = DuplicateFinder(catalog).find(new_files, session_files)
+        except Exception as e:
+            logger.error(f"Duplicate check failed: {e}")
+            duplicates = []
+        try:
+            problems = validate_files(new_files)
+        except Exception as e:
+            logger.error(f"File validation failed: {e}")
+            problems = {}
+        return duplicates, problems
+        
+    def finish_add_files(self, new_files, duplicates, problems=None):
+        """Add checked files, asking what to do with duplicates and flagging damaged ones"""
+        self.add_button.configure(state='normal')
+        
+        if duplicates:
+            shown = "\n".join(
+                f"{os.path.basename(dup.path)}  =  {dup.original}"
+                + ("  (archive)" if dup.where == CATALOG else "")
+                for dup in duplicates[:10]
+            )
+            if len(duplicates) > 10:
+                shown += f"\n... and {len(duplicates) - 10} more"
+            answer = messagebox.askyesnocancel(
+                "Duplicates Found",
+                f"{len(duplicates)} of the selected files are already in this roll or the archive:\n\n"
+                f"{shown}\n\nSkip the duplicates? (No adds them anyway)"
+            )
+            if answer is None:
+                return
+            if answer:
+                # Repeated paths are dropped by the seen check, so only the first copy is kept
+                skipped = {dup.path for dup in duplicates if dup.path != dup.original}
+                seen = set(self.files)
+                kept = []
+                for path in new_files:
+                    if path in seen or os.path.abspath(path) in skipped:
+                        continue
+                    seen.add(path)
+                    kept.append(path)
+                logger.info(f"Skipped {len(new_files) - len(kept)} duplicate files")
+                new_files = kept
+                
         # Add new files and update display
+        self.records.set_problems(new_files, problems or {})
         self.files.extend(new_files)
         self.update_file_list()
         
+        damaged = [path for path in new_files if path in (problems or {})]
+        if damaged:
+            shown = "\n".join(f"{os.path.basename(path)}: {problems[path]}" for path in damaged[:10])
+            if len(damaged) > 10:
+                shown += f"\n... and {len(damaged) - 10} more"
+            messagebox.showwarning(
+                "Damaged Files",
+                f"{len(damaged)} of the added files look truncated or corrupt and are marked in the list:\n\n"
+                f"{shown}\n\nRe-export or re-download them before processing."
+            )
+        
         # Select first file
         if self.file_list.get_children():
             first_item = self.file_list.get_children()[0]
             self.file_list.selection_set(first_item)
             self.on_file_select()
             
+    @profiler.profiled("refresh")
+    @tracing.traced("file_list.update")
     def update_file_list(self):
         """Update the file list display"""
         # Clear current list
@@ -346,19 +702,56 @@ class FilmArchiverWindow:
             self.file_list.delete(item)
             
         # Add files to list
-        files_to_show = self.files.copy()
-        if self.reverse_var.get():
-            files_to_show.reverse()
+        files_to_show = self.get_display_files()
             
         for file in files_to_show:
             filename = os.path.basename(file)
-            original_date = self.file_manager.get_image_date(file)
+            original_date = self.records.original_date(file)
             new_name = self.generate_new_filename(file)
             new_date = self.date_entry.get()
             
             self.file_list.insert("", "end", values=(
                 filename, original_date, new_name, new_date
-            ))
+            ), tags=('damaged',) if self.records.problem(file) else ())
+            
+        self.refresh_lightbox(files_to_show)
+            
+    def get_display_files(self):
+        """Return files in the order they will be numbered"""
+        files_to_show = self.files.copy()
+        if self.reverse_var.get():
+            files_to_show.reverse()
+        return files_to_show
+        
+    def show_lightbox(self):
+        """Open (or raise) the lightbox grid view of the roll"""
+        if self.lightbox and not self.lightbox.closed:
+            self.lightbox.top.lift()
+            return
+        from ui.widgets.lightbox import LightboxWindow
+        self.lightbox = LightboxWindow(self.root, self.thumbnails, self.dispatcher,
+                                       on_select=self.select_file)
+        self.refresh_lightbox()
+        
+    def refresh_lightbox(self, files_to_show=None):
+        """Push the current roll order into the lightbox if it is open"""
+        if not self.lightbox or self.lightbox.closed:
+            return
+        if files_to_show is None:
+            files_to_show = self.get_display_files()
+        self.lightbox.set_entries(
+            [(file, self.generate_new_filename(file)) for file in files_to_show]
+        )
+        
+    def select_file(self, filepath):
+        """Select a file in the list and show its preview"""
+        filename = os.path.basename(filepath)
+        for item in self.file_list.get_children():
+            if self.file_list.item(item)['values'][0] == filename:
+                self.file_list.selection_set(item)
+                self.file_list.see(item)
+                break
+        self.update_preview(filepath)
             
     def generate_new_filename(self, filepath):
         """Generate new filename based on current settings"""
@@ -373,13 +766,14 @@ class FilmArchiverWindow:
                     idx = len(self.files) - idx + 1
                     
                 ext = os.path.splitext(filepath)[1]
-                return f"{roll_num:03d}-{idx:02d}-{camera}-{film}{ext}"
+                return build_filename(roll_num, idx, camera, film, ext)
                 
         except (ValueError, IndexError):
             pass
             
         return os.path.basename(filepath)
         
+    @profiler.profiled("select")
     def on_file_select(self, event=None):
         """Handle file selection"""
         selection = self.file_list.selection()
@@ -412,8 +806,10 @@ class FilmArchiverWindow:
             return
             
         # Create new thumbnail
-        thumbnail = self.file_manager.create_thumbnail(filepath, MAX_THUMBNAIL_SIZE)
+        thumbnail = self.thumbnails.get(filepath, MAX_THUMBNAIL_SIZE,
+                                        key=self.records.thumbnail_key(filepath))
         if thumbnail:
+            from PIL import ImageTk
             photo = ImageTk.PhotoImage(thumbnail)
             self.thumbnail_cache[filepath] = photo
             self.preview_label.configure(image=photo)
@@ -427,7 +823,14 @@ class FilmArchiverWindow:
                     
     def show_calendar(self):
         """Show date picker calendar"""
-        top = tk.Toplevel(self.root)
+        # tkcalendar pulls in babel, so it is imported on first use
+        from tkcalendar import Calendar
+        
+        # Only one picker at a time; repeated clicks used to stack windows
+        if self.calendar_window and self.calendar_window.winfo_exists():
+            self.calendar_window.destroy()
+        
+        top = self.calendar_window = tk.Toplevel(self.root)
         top.title("Select Date")
         top.transient(self.root)
         
@@ -463,10 +866,111 @@ class FilmArchiverWindow:
         top.lift()
         top.focus_force()
         
+    def get_session_settings(self):
+        """Return the roll settings to persist with the session"""
+        return {
+            'roll_number': self.roll_number.get(),
+            'camera': self.camera_model.get(),
+            'film': self.film_type.get(),
+            'date': self.date_entry.get(),
+            'reverse': self.reverse_var.get(),
+            'package': self.package_var.get(),
+        }
+        
+    def save_session(self):
+        """Persist the loaded files, their metadata and the roll settings"""
+        save_session(self.get_session_settings(), self.records.records(self.files))
+        
+    def restore_session(self):
+        """Reload the last session from cached metadata without opening any image"""
+        session = load_session()
+        if not session:
+            return
+        settings, records = session
+        
+        self.roll_number.delete(0, tk.END)
+        self.roll_number.insert(0, settings.get('roll_number', '1'))
+        self.camera_model.set(settings.get('camera', ''))
+        self.camera_model.mark_committed()
+        self.film_type.set(settings.get('film', ''))
+        self.film_type.mark_committed()
+        if settings.get('date'):
+            self.date_entry.delete(0, tk.END)
+            self.date_entry.insert(0, settings['date'])
+        self.reverse_var.set(settings.get('reverse', False))
+        self.package_var.set(settings.get('package', self.package_var.get()))
+        
+        self.records.load(records)
+        self.files = [record.path for record in records]
+        self.update_file_list()
+        
+        if records:
+            logger.info(f"Restored session with {len(records)} files")
+            threading.Thread(
+                target=revalidate,
+                args=(records, self.records,
+                      lambda record: self.dispatcher.post(self.on_record_changed, record),
+                      lambda path: self.dispatcher.post(self.on_record_missing, path),
+                      self.revalidation_cancel),
+                name="session-revalidate", daemon=True
+            ).start()
+            
+    def on_record_changed(self, record):
+        """Replace a restored record whose file changed on disk"""
+        if record.path not in self.files:
+            return
+        self.records.put(record)
+        self.thumbnail_cache.pop(record.path, None)
+        self.schedule_refresh()
+        
+    def on_record_missing(self, path):
+        """Drop a restored file that no longer exists"""
+        if path not in self.files:
+            return
+        logger.warning(f"Removing missing file from session: {path}")
+        self.files.remove(path)
+        self.records.remove(path)
+        self.thumbnail_cache.pop(path, None)
+        self.schedule_refresh()
+        
+    def schedule_refresh(self):
+        """Coalesce several background updates into one list refresh"""
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            
+            def refresh():
+                self.refresh_pending = False
+                self.update_file_list()
+                
+            self.root.after_idle(refresh)
+        
+    def shutdown(self):
+        """Release background resources before the window is destroyed"""
+        self.revalidation_cancel.set()
+        self.fixity_cancel.set()
+        self.stall_monitor.stop()
+        self.save_session()
+        self.pref_manager.flush()
+        self.dispatcher.stop()
+        self.thumbnails.shutdown()
+        if self.catalog is not None:
+            self.catalog.close()
+        
+        icc_stats = self.file_manager.color_manager.stats()
+        logger.info(f"ICC transform cache: {icc_stats['hits']} hits, {icc_stats['misses']} misses "
+                    f"({icc_stats['hit_rate']:.0%} hit rate)")
+        
+        latency = self.stall_monitor.stats()
+        if latency['samples']:
+            logger.info(f"UI latency p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+                        f"p99 {latency['p99_ms']:.1f} ms, {latency['stalls']} stalls")
+        
     def clear_files(self):
         """Clear all files"""
         self.files = []
         self.thumbnail_cache.clear()
+        self.thumbnails.clear()
+        self.records.clear()
         self.update_file_list()
         self.update_preview(None)
 
@@ -494,6 +998,13 @@ class FilmArchiverWindow:
                 messagebox.showwarning("Warning", "Please fill in all fields")
                 return
                 
+            damaged = [file for file in self.files if self.records.problem(file)]
+            if damaged and not messagebox.askyesno(
+                "Damaged Files",
+                f"{len(damaged)} files look truncated or corrupt (marked in the list). Process them anyway?"
+            ):
+                return
+                
             # Ask user for output directory
             output_dir = filedialog.askdirectory(
                 title="Select Output Directory"
@@ -501,92 +1012,104 @@ class FilmArchiverWindow:
             if not output_dir:  # User cancelled
                 return
             
-            # Create new folder name
-            new_folder = f"{roll_num:03d}-{camera}-{film}-{selected_date.strftime('%b%y').upper()}"
-            output_path = os.path.join(output_dir, new_folder)
-            
-            # Create output directory
-            os.makedirs(output_path, exist_ok=True)
-            
             # Show progress bar
+            self.progress_var.set(0)
+            self.progress_label.configure(text="Starting...")
             self.progress_bar.pack(fill='x')
+            self.progress_label.pack(fill='x')
+            self.set_processing(True)
             
             # Process files
-            files_to_process = self.files.copy()
-            if self.reverse_var.get():
-                files_to_process.reverse()
-            
-            # Save preferences
-            if camera:
-                self.pref_manager.add_camera(camera)
-            if film:
-                self.pref_manager.add_film(film)
-            
-            total_files = len(files_to_process)
-            processed_files = 0
-            
-            # Process each file
-            for idx, file in enumerate(files_to_process, start=1):
-                try:
-                    # Update progress
-                    progress = (idx / total_files) * 100
-                    self.progress_var.set(progress)
-                    self.root.update_idletasks()
-                    
-                    # Generate new filename
-                    ext = os.path.splitext(file)[1]
-                    new_name = f"{roll_num:03d}-{idx:02d}-{camera}-{film}{ext}"
-                    new_path = os.path.join(output_path, new_name)
-                    
-                    # Copy file and update date
-                    shutil.copy2(file, new_path)
-                    
-                    # Update file dates if possible
-                    try:
-                        date_str = selected_date.strftime("%Y:%m:%d %H:%M:%S")
-                        
-                        # Update EXIF date
-                        try:
-                            exif_dict = piexif.load(new_path)
-                            exif_dict['0th'][piexif.ImageIFD.DateTime] = date_str.encode()
-                            exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = date_str.encode()
-                            exif_dict['Exif'][piexif.ExifIFD.DateTimeDigitized] = date_str.encode()
-                            exif_bytes = piexif.dump(exif_dict)
-                            piexif.insert(exif_bytes, new_path)
-                        except:
-                            pass
-                            
-                        # Update file modification time
-                        os.utime(new_path, (selected_date.timestamp(), selected_date.timestamp()))
-                    except:
-                        pass
-                        
-                    processed_files += 1
-                        
-                except Exception as e:
-                    messagebox.showerror("Error", f"Error processing {os.path.basename(file)}: {str(e)}")
-                    return
-            
-            # Hide progress bar
-            self.progress_bar.pack_forget()
-            
-            # Clear files after successful processing
-            self.clear_files()
-            
-            # Update combobox values
-            self.camera_model['values'] = self.pref_manager.get_cameras()
-            self.film_type['values'] = self.pref_manager.get_films()
+            files_to_process = self.get_display_files()
             
-            # Show success message and open folder
-            messagebox.showinfo("Success", f"Successfully processed {processed_files}/{total_files} files!")
+            # Save preferences and count the roll towards their ranking
+            self.pref_manager.record_use(camera=camera, film=film)
             
-            # Open output folder in Finder
-            if IS_MACOS:
-                os.system(f'open "{output_path}"')
-            else:
-                os.startfile(output_path)
+            # Copying runs on a worker so the window stays responsive
+            processor = RollProcessor(roll_num, camera, film, selected_date,
+                                      catalog=self.get_catalog(),
+                                      package_format=self.package_var.get() or None)
+            threading.Thread(
+                target=self.run_processing,
+                args=(processor, files_to_process, output_dir),
+                name="process-files", daemon=True
+            ).start()
                 
         except Exception as e:
             messagebox.showerror("Error", f"Processing error: {str(e)}")
             # Hide progress bar on error
-            self.progress_bar.pack_forget()
\ No newline at end of file
+            self.hide_progress()
+            self.set_processing(False)
+            
+    @profiler.profiled("process")
+    def run_processing(self, processor, files, output_dir):
+        """Worker thread: process the roll and report back on the UI thread"""
+        def report(done, total):
+            self.dispatcher.post(self.show_progress, processor.progress.snapshot())
+            
+        try:
+            output_path = processor.process(files, output_dir, report)
+        except Exception as e:
+            self.dispatcher.post(self.on_processing_failed, e)
+            return
+        self.dispatcher.post(self.on_processing_done, processor, output_path)
+        
+    def show_progress(self, progress):
+        """Update the progress bar from a ProgressModel snapshot"""
+        self.progress_var.set(progress['fraction'] * 100)
+        self.progress_label.configure(text=(
+            f"{progress['done_files']}/{progress['total_files']} files  ·  "
+            f"{progress['mb_per_s']:.1f} MB/s  ·  {progress['files_per_s']:.1f} files/s  ·  "
+            f"{format_duration(progress['eta'])} remaining"
+        ))
+        
+    def hide_progress(self):
+        self.progress_bar.pack_forget()
+        self.progress_label.pack_forget()
+        
+    def set_processing(self, busy):
+        """Lock the roll while it is being processed"""
+        state = 'disabled' if busy else 'normal'
+        for button in (self.process_button, self.add_button, self.clear_button):
+            button.configure(state=state)
+            
+    def on_processing_failed(self, error):
+        self.hide_progress()
+        self.set_processing(False)
+        if isinstance(error, ProcessingError):
+            messagebox.showerror("Error", f"Error processing {os.path.basename(error.file_path)}: {str(error)}")
+        else:
+            messagebox.showerror("Error", f"Processing error: {str(error)}")
+            
+    def on_processing_done(self, processor, output_path):
+        progress = processor.progress.snapshot()
+        phases = ", ".join(f"{name} {totals['seconds']:.2f}s" for name, totals in progress['phases'].items())
+        logger.info(f"Processed {progress['done_files']} files in {progress['elapsed']:.1f}s "
+                    f"({progress['mb_per_s']:.1f} MB/s); {phases}")
+        
+        # Hide progress bar
+        self.hide_progress()
+        self.set_processing(False)
+        
+        # Clear files after successful processing
+        self.clear_files()
+        
+        # Update combobox suggestions
+        self.camera_index.add(processor.camera)
+        self.film_index.add(processor.film)
+        self.refresh_suggestions()
+        
+        # Show success message and open folder
+        message = f"Successfully processed {progress['done_files']}/{progress['total_files']} files!"
+        if processor.compression and processor.compression['recompressed']:
+            saved = processor.compression['before'] - processor.compression['after']
+            message += f"\n\nTIFF compression saved {format_bytes(saved)}."
+        messagebox.showinfo("Success", message)
+        
+        # Open output folder in Finder (the folder holding it for a package)
+        if os.path.isfile(output_path):
+            output_path = os.path.dirname(output_path)
+        if IS_MACOS:
+            os.system(f'open "{output_path}"')
+        else:
+            os.startfile(output_path)
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+Film Archiver - Autocomplete Combobox
+"""
+from tkinter import ttk
+
+# Keys that move through the entry or dropdown without changing the text
+NAVIGATION_KEYS = {
+    'Up', 'Down', 'Left', 'Right', 'Home', 'End', 'Tab', 'Escape', 'Return',
+    'Shift_L', 'Shift_R', 'Control_L', 'Control_R', 'Alt_L', 'Alt_R',
+    'Meta_L', 'Meta_R', 'Super_L', 'Super_R', 'Caps_Lock'
+}
+
+
+class AutocompleteCombobox(ttk.Combobox):
+    """Combobox whose dropdown is filtered live from a PrefixIndex.
+
+    Typing only narrows the dropdown; on_commit runs when a value is
+    selected, Return is pressed or focus leaves, and only if the value
+    changed since the last commit.
+    """
+
+    def __init__(self, parent, index, on_commit=None, limit=50, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.index = index
+        self.on_commit = on_commit
+        self.limit = limit
+        self.committed_value = ''
+        self.refresh_values()
+
+        self.bind('<KeyRelease>', self.on_key_release, add='+')
+        self.bind('<<ComboboxSelected>>', lambda e: self.commit(), add='+')
+        self.bind('<Return>', lambda e: self.commit(), add='+')
+        self.bind('<FocusOut>', lambda e: self.commit(), add='+')
+
+    def refresh_values(self):
+        """Filter the dropdown for the current text"""
+        self['values'] = self.index.complete(self.get(), limit=self.limit)
+
+    def on_key_release(self, event):
+        if event.keysym not in NAVIGATION_KEYS:
+            self.refresh_values()
+
+    def mark_committed(self):
+        """Treat the current text as committed (after programmatic changes)"""
+        self.committed_value = self.get()
+
+    def commit(self):
+        """Notify on_commit if the text changed since the last commit"""
+        value = self.get()
+        if value != self.committed_value:
+            self.committed_value = value
+            if self.on_commit:
+                self.on_commit()
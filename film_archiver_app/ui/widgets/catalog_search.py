@@ -0,0 +1,286 @@
+"""
+Film Archiver - Catalog Search
+"""
+import os
+import time
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from config.settings import IS_MACOS
+from core.archive_scanner import rescan_archive
+from core.gallery import export_gallery
+from core.perceptual import update_catalog_hashes, catalog_clusters
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DELAY_MS = 150
+
+
+class CatalogSearchWindow:
+    """Search the archive catalog by camera, film, year, roll number or folder text"""
+
+    def __init__(self, parent, catalog, dispatcher, thumbnail_cache=None):
+        self.catalog = catalog
+        self.dispatcher = dispatcher
+        self.thumbnail_cache = thumbnail_cache
+        self.search_id = None
+        self.roll_ids = {}  # folder -> roll id for the rows shown
+        self.import_cancel = threading.Event()
+        self.closed = False
+
+        self.top = tk.Toplevel(parent)
+        self.top.title("Archive Catalog")
+        self.top.geometry("950x600")
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        filters = ttk.Frame(self.top, padding=(10, 5))
+        filters.pack(fill='x')
+
+        self.camera_var = tk.StringVar()
+        self.film_var = tk.StringVar()
+        self.year_var = tk.StringVar()
+        self.roll_var = tk.StringVar()
+        self.text_var = tk.StringVar()
+
+        ttk.Label(filters, text="Camera:").pack(side='left')
+        self.camera_box = ttk.Combobox(filters, textvariable=self.camera_var, width=14)
+        self.camera_box.pack(side='left', padx=(2, 8))
+        ttk.Label(filters, text="Film:").pack(side='left')
+        self.film_box = ttk.Combobox(filters, textvariable=self.film_var, width=14)
+        self.film_box.pack(side='left', padx=(2, 8))
+        ttk.Label(filters, text="Year:").pack(side='left')
+        ttk.Entry(filters, textvariable=self.year_var, width=6).pack(side='left', padx=(2, 8))
+        ttk.Label(filters, text="Roll #:").pack(side='left')
+        ttk.Entry(filters, textvariable=self.roll_var, width=6).pack(side='left', padx=(2, 8))
+        ttk.Label(filters, text="Folder contains:").pack(side='left')
+        ttk.Entry(filters, textvariable=self.text_var, width=18).pack(side='left', padx=2)
+
+        for var in (self.camera_var, self.film_var, self.year_var, self.roll_var, self.text_var):
+            var.trace_add('write', lambda *args: self.schedule_search())
+
+        columns = ("roll", "camera", "film", "date", "frames", "folder")
+        self.results = ttk.Treeview(self.top, columns=columns, show='headings')
+        for column, heading, width in (
+            ("roll", "Roll", 60), ("camera", "Camera", 110), ("film", "Film", 110),
+            ("date", "Date", 90), ("frames", "Frames", 60), ("folder", "Folder", 480),
+        ):
+            self.results.heading(column, text=heading)
+            self.results.column(column, width=width, anchor='w' if column == "folder" else 'center')
+        self.results.pack(fill='both', expand=True, padx=10)
+        self.results.bind('<Double-1>', self.open_selected)
+
+        status_bar = ttk.Frame(self.top, padding=(10, 5))
+        status_bar.pack(fill='x')
+        self.status_label = ttk.Label(status_bar, text="")
+        self.status_label.pack(side='left')
+        self.import_button = ttk.Button(status_bar, text="Scan Archive Folder...",
+                                        command=self.import_folder)
+        self.import_button.pack(side='right')
+        self.near_button = ttk.Button(status_bar, text="Find Near Duplicates",
+                                      command=self.find_near_duplicates,
+                                      state='normal' if thumbnail_cache else 'disabled')
+        self.near_button.pack(side='right', padx=5)
+        self.gallery_button = ttk.Button(status_bar, text="Export Gallery...", command=self.export_gallery)
+        self.gallery_button.pack(side='right')
+
+        self.refresh_suggestions()
+        self.search()
+
+    def refresh_suggestions(self):
+        self.camera_box.configure(values=self.catalog.distinct('camera'))
+        self.film_box.configure(values=self.catalog.distinct('film'))
+
+    def schedule_search(self):
+        """Search shortly after typing pauses"""
+        if self.search_id is not None:
+            self.top.after_cancel(self.search_id)
+        self.search_id = self.top.after(SEARCH_DELAY_MS, self.search)
+
+    def search(self):
+        self.search_id = None
+        try:
+            year = int(self.year_var.get()) if self.year_var.get().strip() else None
+            roll_number = int(self.roll_var.get()) if self.roll_var.get().strip() else None
+        except ValueError:
+            self.status_label.configure(text="Year and roll number must be numbers")
+            return
+
+        start = time.perf_counter()
+        try:
+            rolls = self.catalog.find_rolls(
+                camera=self.camera_var.get().strip(), film=self.film_var.get().strip(),
+                year=year, roll_number=roll_number, text=self.text_var.get().strip()
+            )
+        except Exception as e:
+            logger.error(f"Catalog search failed: {e}")
+            self.status_label.configure(text=f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.results.delete(*self.results.get_children())
+        self.roll_ids = {roll['folder']: roll['id'] for roll in rolls}
+        for roll in rolls:
+            self.results.insert("", "end", iid=roll['folder'], values=(
+                roll['roll_number'], roll['camera'], roll['film'], roll['roll_date'] or "",
+                roll['frame_count'], roll['folder']
+            ))
+        stats = self.catalog.stats()
+        self.status_label.configure(
+            text=f"{len(rolls)} rolls in {elapsed:.1f} ms  ·  catalog: {stats['rolls']} rolls, {stats['frames']} frames"
+        )
+
+    def open_selected(self, event=None):
+        selection = self.results.selection()
+        if not selection:
+            return
+        folder = selection[0]
+        if not os.path.isdir(folder):
+            messagebox.showwarning("Warning", f"Folder is not available:\n{folder}", parent=self.top)
+            return
+        if IS_MACOS:
+            os.system(f'open "{folder}"')
+        else:
+            os.startfile(folder)
+
+    def import_folder(self):
+        """Index or update an archive tree on a background thread"""
+        root_dir = filedialog.askdirectory(title="Select Archive Folder", parent=self.top)
+        if not root_dir:
+            return
+        self.import_button.configure(state='disabled')
+        self.status_label.configure(text=f"Scanning {root_dir}...")
+
+        def progress(rolls, frames, folder):
+            self.dispatcher.post(self.show_import_progress, rolls, frames)
+
+        def worker():
+            try:
+                result = rescan_archive(self.catalog, root_dir, progress=progress,
+                                        cancelled=self.import_cancel.is_set)
+                self.dispatcher.post(self.on_import_done, result, None)
+            except Exception as e:
+                logger.error(f"Archive scan failed: {e}")
+                self.dispatcher.post(self.on_import_done, None, e)
+
+        threading.Thread(target=worker, name="catalog-import", daemon=True).start()
+
+    def show_import_progress(self, rolls, files):
+        if not self.closed:
+            self.status_label.configure(text=f"Scanning... {rolls} rolls, {files} files")
+
+    def on_import_done(self, result, error):
+        if self.closed:
+            return
+        self.import_button.configure(state='normal')
+        if error:
+            messagebox.showerror("Error", f"Scan failed: {str(error)}", parent=self.top)
+        else:
+            messagebox.showinfo("Scan Complete",
+                                f"{result['added']} added, {result['changed']} changed, "
+                                f"{result['moved']} moved, {result['removed']} removed, "
+                                f"{result['unchanged']} unchanged",
+                                parent=self.top)
+        self.refresh_suggestions()
+        self.search()
+
+    def find_near_duplicates(self):
+        """Cluster similar frames in the selected roll, or the whole archive if none is selected"""
+        selection = self.results.selection()
+        roll_id = None
+        scope = "the archive"
+        if selection and selection[0] in self.roll_ids:
+            roll_id = self.roll_ids[selection[0]]
+            scope = os.path.basename(selection[0])
+        self.near_button.configure(state='disabled')
+        self.status_label.configure(text=f"Hashing frames in {scope}...")
+
+        def worker():
+            try:
+                update_catalog_hashes(self.catalog, self.thumbnail_cache, roll_id,
+                                      cancelled=self.import_cancel.is_set)
+                clusters = catalog_clusters(self.catalog, roll_id)
+                self.dispatcher.post(self.on_near_duplicates, scope, clusters, None)
+            except Exception as e:
+                logger.error(f"Near-duplicate search failed: {e}")
+                self.dispatcher.post(self.on_near_duplicates, scope, None, e)
+
+        threading.Thread(target=worker, name="near-duplicates", daemon=True).start()
+
+    def on_near_duplicates(self, scope, clusters, error):
+        if self.closed:
+            return
+        self.near_button.configure(state='normal')
+        self.status_label.configure(text="")
+        if error:
+            messagebox.showerror("Error", f"Near-duplicate search failed: {str(error)}", parent=self.top)
+            return
+        if not clusters:
+            messagebox.showinfo("Near Duplicates", f"No near duplicates found in {scope}", parent=self.top)
+            return
+
+        lines = [f"{len(clusters)} groups of similar frames in {scope}", ""]
+        for number, cluster in enumerate(clusters, 1):
+            lines.append(f"Group {number} ({len(cluster)} frames)")
+            lines.extend(f"    {row['path']}" for row in cluster)
+            lines.append("")
+
+        window = tk.Toplevel(self.top)
+        window.title("Near Duplicates")
+        window.geometry("800x500")
+        text = tk.Text(window, wrap='none')
+        scrollbar = ttk.Scrollbar(window, orient='vertical', command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        text.pack(fill='both', expand=True)
+        text.insert('1.0', "\n".join(lines))
+        text.configure(state='disabled')
+
+    def export_gallery(self):
+        """Add the selected rolls to a static HTML gallery, or export every catalogued roll"""
+        selection = [folder for folder in self.results.selection() if folder in self.roll_ids]
+        output_dir = filedialog.askdirectory(title="Export Gallery To", parent=self.top)
+        if not output_dir:
+            return
+        self.gallery_button.configure(state='disabled')
+        self.status_label.configure(text="Exporting gallery...")
+
+        def progress(done, total):
+            self.dispatcher.post(self.show_gallery_progress, done, total)
+
+        def worker():
+            try:
+                result = export_gallery(self.catalog, output_dir, selection or None, self.thumbnail_cache,
+                                        progress=progress, cancelled=self.import_cancel.is_set)
+                self.dispatcher.post(self.on_gallery_done, output_dir, result, None)
+            except Exception as e:
+                logger.error(f"Gallery export failed: {e}")
+                self.dispatcher.post(self.on_gallery_done, output_dir, None, e)
+
+        threading.Thread(target=worker, name="gallery-export", daemon=True).start()
+
+    def show_gallery_progress(self, done, total):
+        if not self.closed:
+            self.status_label.configure(text=f"Exporting gallery... {done}/{total} frames")
+
+    def on_gallery_done(self, output_dir, result, error):
+        if self.closed:
+            return
+        self.gallery_button.configure(state='normal')
+        self.status_label.configure(text="")
+        if error:
+            messagebox.showerror("Error", f"Gallery export failed: {str(error)}", parent=self.top)
+            return
+        message = (f"{result['rolls']} rolls, {result['rolls_updated']} updated, "
+                   f"{result['rendered'] + result['reused']} images written")
+        if result['errors']:
+            message += f", {result['errors']} frames failed (see log)"
+        messagebox.showinfo("Gallery Exported", f"{message}\n\n{output_dir}", parent=self.top)
+
+    def close(self):
+        self.closed = True
+        self.import_cancel.set()
+        if self.search_id is not None:
+            self.top.after_cancel(self.search_id)
+        self.top.destroy()
@@ -0,0 +1,241 @@
+"""
+Film Archiver - Lightbox Grid View
+"""
+import os
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from PIL import Image, ImageTk
+
+from config.settings import LIGHTBOX_CELL_SIZE, LIGHTBOX_PADDING
+from core.contact_sheet import export_contact_sheet
+
+logger = logging.getLogger(__name__)
+
+LABEL_HEIGHT = 18
+
+
+class LightboxWindow:
+    """Contact-sheet style grid of the whole roll drawn on a Tk canvas.
+
+    Only cells inside the viewport (plus one row of margin) get canvas items
+    and PhotoImages; thumbnails are requested from the shared cache on its
+    worker pool and dropped again when they scroll out of view.
+    """
+
+    def __init__(self, parent, thumbnail_cache, dispatcher, on_select=None):
+        self.thumbnail_cache = thumbnail_cache
+        self.dispatcher = dispatcher
+        self.on_select = on_select
+        self.entries = []
+        self.columns = 1
+        self.generation = 0
+        self.photos = {}
+        self.futures = {}
+        self.drawn = set()
+        self.render_pending = False
+        self.closed = False
+
+        self.cell_w = LIGHTBOX_CELL_SIZE + LIGHTBOX_PADDING
+        self.cell_h = LIGHTBOX_CELL_SIZE + LABEL_HEIGHT + LIGHTBOX_PADDING
+
+        self.top = tk.Toplevel(parent)
+        self.top.title("Lightbox")
+        self.top.geometry("900x650")
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = ttk.Frame(self.top, padding=(10, 5))
+        toolbar.pack(fill='x')
+        self.export_button = ttk.Button(toolbar, text="Export Contact Sheet...",
+                                        command=self.export)
+        self.export_button.pack(side='left')
+        self.status_label = ttk.Label(toolbar, text="")
+        self.status_label.pack(side='left', padx=10)
+
+        body = ttk.Frame(self.top)
+        body.pack(fill='both', expand=True)
+        self.canvas = tk.Canvas(body, highlightthickness=0, background='#1E1E1E')
+        y_scroll = ttk.Scrollbar(body, orient='vertical', command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=lambda *args: (y_scroll.set(*args),
+                                                            self.schedule_render()))
+        y_scroll.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.canvas.bind('<Configure>', lambda e: self.relayout())
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<MouseWheel>', self.on_mousewheel)
+        self.canvas.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.canvas.yview_scroll(1, 'units'))
+
+    def set_entries(self, entries):
+        """Show a new roll order; entries are (filepath, label) pairs"""
+        self.entries = list(entries)
+        self.status_label.configure(text=f"{len(self.entries)} frames")
+        self.relayout()
+
+    def relayout(self):
+        """Recompute the grid for the current size and redraw visible cells"""
+        self.generation += 1
+        self._clear_cells()
+        width = max(self.canvas.winfo_width(), self.cell_w)
+        self.columns = max(1, (width - LIGHTBOX_PADDING) // self.cell_w)
+        rows = (len(self.entries) + self.columns - 1) // self.columns
+        self.canvas.configure(scrollregion=(0, 0, width, rows * self.cell_h + LIGHTBOX_PADDING))
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Coalesce scroll and resize events into a single render"""
+        if not self.render_pending and not self.closed:
+            self.render_pending = True
+            self.top.after_idle(self.render_visible)
+
+    def visible_range(self):
+        """Indices of cells intersecting the viewport, with one row of margin"""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // self.cell_h) - 1)
+        last_row = int(bottom // self.cell_h) + 1
+        return range(first_row * self.columns,
+                     min(len(self.entries), (last_row + 1) * self.columns))
+
+    def render_visible(self):
+        """Draw on-screen cells and release everything that scrolled away"""
+        self.render_pending = False
+        if self.closed:
+            return
+        visible = self.visible_range()
+
+        for idx in [i for i in self.drawn if i not in visible]:
+            self.canvas.delete(f"cell{idx}")
+            self.drawn.discard(idx)
+            self.photos.pop(idx, None)
+            future = self.futures.pop(idx, None)
+            if future is not None:
+                future.cancel()
+
+        for idx in visible:
+            if idx in self.drawn:
+                continue
+            self.drawn.add(idx)
+            self._draw_frame(idx)
+
+            filepath = self.entries[idx][0]
+            thumbnail = self.thumbnail_cache.peek(filepath)
+            if thumbnail is not None:
+                self._show_thumbnail(idx, thumbnail)
+            elif idx not in self.futures:
+                future = self.thumbnail_cache.submit(filepath)
+                self.futures[idx] = future
+                generation = self.generation
+                future.add_done_callback(
+                    lambda f, idx=idx, generation=generation:
+                        self.dispatcher.post(self._on_thumbnail_ready, idx, generation, f))
+
+    def on_click(self, event):
+        """Select the clicked frame in the main window"""
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        col, row = int(x // self.cell_w), int(y // self.cell_h)
+        idx = row * self.columns + col
+        if col < self.columns and 0 <= idx < len(self.entries) and self.on_select:
+            self.on_select(self.entries[idx][0])
+
+    def on_mousewheel(self, event):
+        step = -1 if event.delta > 0 else 1
+        self.canvas.yview_scroll(step, 'units')
+
+    def export(self):
+        """Export the current roll order as a single contact-sheet image"""
+        if not self.entries:
+            return
+        output_path = filedialog.asksaveasfilename(
+            parent=self.top,
+            title="Export Contact Sheet",
+            defaultextension=".jpg",
+            filetypes=[("JPEG image", "*.jpg"), ("PNG image", "*.png"), ("TIFF image", "*.tif")]
+        )
+        if not output_path:
+            return
+
+        files = [filepath for filepath, _ in self.entries]
+        labels = [label for _, label in self.entries]
+        self.export_button.configure(state='disabled')
+
+        def progress(done, total):
+            self.dispatcher.post(self._set_status, f"Exporting {done}/{total}...")
+
+        def worker():
+            ok = export_contact_sheet(self.thumbnail_cache, files, labels, output_path,
+                                      progress=progress)
+            self.dispatcher.post(self._on_export_done, ok, output_path)
+
+        threading.Thread(target=worker, name="contact-sheet", daemon=True).start()
+
+    def close(self):
+        self.closed = True
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.photos.clear()
+        self.top.destroy()
+
+    def _draw_frame(self, idx):
+        col, row = idx % self.columns, idx // self.columns
+        x0 = LIGHTBOX_PADDING + col * self.cell_w
+        y0 = LIGHTBOX_PADDING + row * self.cell_h
+        tag = f"cell{idx}"
+        self.canvas.create_rectangle(x0, y0, x0 + LIGHTBOX_CELL_SIZE, y0 + LIGHTBOX_CELL_SIZE,
+                                     outline='#444444', tags=(tag,))
+        self.canvas.create_text(x0 + LIGHTBOX_CELL_SIZE // 2, y0 + LIGHTBOX_CELL_SIZE + 3,
+                                text=self.entries[idx][1], anchor='n', fill='#DDDDDD',
+                                width=LIGHTBOX_CELL_SIZE, tags=(tag,))
+
+    def _show_thumbnail(self, idx, thumbnail):
+        tile = thumbnail.copy()
+        tile.thumbnail((LIGHTBOX_CELL_SIZE, LIGHTBOX_CELL_SIZE), Image.Resampling.LANCZOS)
+        photo = ImageTk.PhotoImage(tile)
+        self.photos[idx] = photo
+
+        col, row = idx % self.columns, idx // self.columns
+        cx = LIGHTBOX_PADDING + col * self.cell_w + LIGHTBOX_CELL_SIZE // 2
+        cy = LIGHTBOX_PADDING + row * self.cell_h + LIGHTBOX_CELL_SIZE // 2
+        self.canvas.create_image(cx, cy, image=photo, tags=(f"cell{idx}",))
+
+    def _on_thumbnail_ready(self, idx, generation, future):
+        if self.closed or generation != self.generation or future.cancelled():
+            return
+        self.futures.pop(idx, None)
+        if idx not in self.drawn or idx in self.photos:
+            return
+        try:
+            thumbnail = future.result()
+        except Exception as e:
+            logger.error(f"Error loading lightbox thumbnail for {self.entries[idx][0]}: {e}")
+            return
+        if thumbnail is not None:
+            self._show_thumbnail(idx, thumbnail)
+
+    def _clear_cells(self):
+        self.canvas.delete('all')
+        self.drawn.clear()
+        self.photos.clear()
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def _set_status(self, text):
+        if not self.closed:
+            self.status_label.configure(text=text)
+
+    def _on_export_done(self, ok, output_path):
+        if self.closed:
+            return
+        self.export_button.configure(state='normal')
+        self._set_status(f"{len(self.entries)} frames")
+        if ok:
+            messagebox.showinfo("Success", f"Contact sheet saved to {os.path.basename(output_path)}",
+                                parent=self.top)
+        else:
+            messagebox.showerror("Error", "Could not export contact sheet. Please check the log file.",
+                                 parent=self.top)
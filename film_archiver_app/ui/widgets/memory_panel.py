@@ -0,0 +1,101 @@
+"""
+Film Archiver - Memory Panel
+"""
+import logging
+import tkinter as tk
+from tkinter import ttk
+
+from utils.memory import SnapshotTracker, process_memory, format_bytes
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MS = 2000
+
+
+class MemoryPanel:
+    """Live per-subsystem memory usage with tracemalloc snapshot diffing.
+
+    collect() returns rows of (subsystem, entries, bytes); either value may
+    be None when it is not known.
+    """
+
+    def __init__(self, parent, collect):
+        self.collect = collect
+        self.tracker = SnapshotTracker()
+        self.after_id = None
+
+        self.top = tk.Toplevel(parent)
+        self.top.title("Memory")
+        self.top.geometry("900x600")
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = ttk.Frame(self.top, padding=(10, 5))
+        toolbar.pack(fill='x')
+        ttk.Button(toolbar, text="Refresh", command=self.refresh).pack(side='left')
+        ttk.Button(toolbar, text="Take Snapshot", command=self.take_snapshot).pack(side='left', padx=5)
+        self.compare_button = ttk.Button(toolbar, text="Compare to Snapshot",
+                                         command=self.compare, state='disabled')
+        self.compare_button.pack(side='left')
+        self.process_label = ttk.Label(toolbar, text="")
+        self.process_label.pack(side='right')
+
+        self.table = ttk.Treeview(self.top, columns=("entries", "size"), height=8)
+        self.table.heading("#0", text="Subsystem")
+        self.table.heading("entries", text="Entries")
+        self.table.heading("size", text="Size")
+        self.table.column("#0", width=360)
+        self.table.column("entries", width=100, anchor='e')
+        self.table.column("size", width=120, anchor='e')
+        self.table.pack(fill='x', padx=10)
+
+        text_frame = ttk.Frame(self.top)
+        text_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        self.text = tk.Text(text_frame, wrap='none', font=('Courier', 11), height=15)
+        y_scroll = ttk.Scrollbar(text_frame, orient='vertical', command=self.text.yview)
+        self.text.configure(yscrollcommand=y_scroll.set)
+        y_scroll.pack(side='right', fill='y')
+        self.text.pack(fill='both', expand=True)
+        self.show("Take a snapshot, use the app for a while, then compare to see what grew.")
+
+        self.refresh()
+
+    def refresh(self):
+        if self.after_id is not None:
+            self.top.after_cancel(self.after_id)
+            self.after_id = None
+
+        self.table.delete(*self.table.get_children())
+        try:
+            for name, entries, nbytes in self.collect():
+                self.table.insert("", "end", text=name, values=(
+                    "-" if entries is None else entries, format_bytes(nbytes)
+                ))
+        except Exception as e:
+            logger.error(f"Error collecting memory usage: {e}")
+
+        usage = process_memory()
+        self.process_label.configure(
+            text=f"Process RSS {format_bytes(usage['rss'])} (peak {format_bytes(usage['peak_rss'])})"
+        )
+        self.after_id = self.top.after(REFRESH_MS, self.refresh)
+
+    def take_snapshot(self):
+        self.tracker.take()
+        self.compare_button.configure(state='normal')
+        self.show("Snapshot taken. Tracing allocations until this window is closed.")
+
+    def compare(self):
+        self.show(self.tracker.compare())
+
+    def show(self, text):
+        self.text.configure(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', text)
+        self.text.configure(state='disabled')
+
+    def close(self):
+        if self.after_id is not None:
+            self.top.after_cancel(self.after_id)
+            self.after_id = None
+        self.tracker.stop()
+        self.top.destroy()
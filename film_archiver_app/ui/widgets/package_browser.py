@@ -0,0 +1,100 @@
+"""
+Film Archiver - Package Browser
+"""
+import os
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from PIL import ImageTk
+
+from config.settings import MAX_THUMBNAIL_SIZE
+from core.packaging import load_index, preview_member, extract_member
+from utils.memory import format_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class PackageBrowser:
+    """List the frames of a roll package, preview one and extract a selection"""
+
+    def __init__(self, parent, package_path, dispatcher):
+        self.package_path = package_path
+        self.dispatcher = dispatcher
+        self.index = load_index(package_path)
+        self.photo = None
+        self.preview_name = None
+        self.closed = False
+
+        self.top = tk.Toplevel(parent)
+        self.top.title(os.path.basename(package_path))
+        self.top.geometry("760x420")
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        body = ttk.Frame(self.top, padding=10)
+        body.pack(fill='both', expand=True)
+
+        self.members = ttk.Treeview(body, columns=("size",), show='tree headings', selectmode='extended')
+        self.members.heading("#0", text="Frame")
+        self.members.heading("size", text="Size")
+        self.members.column("#0", width=260)
+        self.members.column("size", width=90, anchor='e')
+        self.members.pack(side='left', fill='both', expand=True)
+        self.members.bind('<<TreeviewSelect>>', self.on_select)
+        for member in self.index['members']:
+            self.members.insert("", "end", iid=member['name'], text=member['name'],
+                                values=(format_bytes(member['size']),))
+
+        self.preview = ttk.Label(body, anchor='center', width=40)
+        self.preview.pack(side='left', fill='both', padx=(10, 0))
+
+        buttons = ttk.Frame(self.top, padding=(10, 0, 10, 10))
+        buttons.pack(fill='x')
+        ttk.Label(buttons, text=f"{len(self.index['members'])} frames, {self.index['format']}").pack(side='left')
+        ttk.Button(buttons, text="Extract Selected...", command=self.extract_selected).pack(side='right')
+
+    def on_select(self, event=None):
+        selection = self.members.selection()
+        if not selection:
+            return
+        name = selection[0]
+        self.preview_name = name
+        self.preview.configure(image='', text="Loading...")
+
+        def worker():
+            thumbnail = preview_member(self.package_path, name, MAX_THUMBNAIL_SIZE, self.index)
+            self.dispatcher.post(self.show_preview, name, thumbnail)
+
+        threading.Thread(target=worker, name="package-preview", daemon=True).start()
+
+    def show_preview(self, name, thumbnail):
+        # Ignore previews that finish after the selection moved on
+        if self.closed or name != self.preview_name:
+            return
+        if thumbnail is None:
+            self.photo = None
+            self.preview.configure(image='', text="No preview available")
+            return
+        self.photo = ImageTk.PhotoImage(thumbnail)
+        self.preview.configure(image=self.photo, text="")
+
+    def extract_selected(self):
+        selection = self.members.selection()
+        if not selection:
+            return
+        output_dir = filedialog.askdirectory(title="Extract To", parent=self.top)
+        if not output_dir:
+            return
+        try:
+            for name in selection:
+                extract_member(self.package_path, name, output_dir, self.index)
+        except Exception as e:
+            logger.error(f"Error extracting from {self.package_path}: {e}")
+            messagebox.showerror("Error", f"Extraction failed: {str(e)}", parent=self.top)
+            return
+        messagebox.showinfo("Extracted", f"Extracted {len(selection)} frames to {output_dir}", parent=self.top)
+
+    def close(self):
+        self.closed = True
+        self.top.destroy()
@@ -0,0 +1,82 @@
+"""
+Film Archiver - Profile Viewer
+"""
+import os
+import logging
+import tkinter as tk
+from tkinter import ttk
+
+from config.settings import IS_MACOS, PROFILE_DIR
+from utils import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileViewer:
+    """List saved action profiles and show their top functions and allocations"""
+
+    def __init__(self, parent):
+        self.reports = []
+
+        self.top = tk.Toplevel(parent)
+        self.top.title("Profile Reports")
+        self.top.geometry("1100x650")
+
+        toolbar = ttk.Frame(self.top, padding=(10, 5))
+        toolbar.pack(fill='x')
+        ttk.Button(toolbar, text="Refresh", command=self.refresh).pack(side='left')
+        ttk.Button(toolbar, text="Open Folder", command=self.open_folder).pack(side='left', padx=5)
+
+        body = ttk.PanedWindow(self.top, orient='horizontal')
+        body.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+
+        self.report_list = tk.Listbox(body, width=36, exportselection=False)
+        self.report_list.bind('<<ListboxSelect>>', self.on_select)
+        body.add(self.report_list, weight=0)
+
+        text_frame = ttk.Frame(body)
+        self.text = tk.Text(text_frame, wrap='none', font=('Courier', 11))
+        y_scroll = ttk.Scrollbar(text_frame, orient='vertical', command=self.text.yview)
+        x_scroll = ttk.Scrollbar(text_frame, orient='horizontal', command=self.text.xview)
+        self.text.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        y_scroll.pack(side='right', fill='y')
+        x_scroll.pack(side='bottom', fill='x')
+        self.text.pack(fill='both', expand=True)
+        body.add(text_frame, weight=1)
+
+        self.refresh()
+
+    def refresh(self):
+        self.reports = profiler.list_reports()
+        self.report_list.delete(0, 'end')
+        for path in self.reports:
+            self.report_list.insert('end', path.stem)
+        if self.reports:
+            self.report_list.selection_set(0)
+            self.on_select()
+        else:
+            self.show("No profiles yet. Use Diagnostics > Profile Next Actions... first.")
+
+    def on_select(self, event=None):
+        selection = self.report_list.curselection()
+        if not selection:
+            return
+        path = self.reports[selection[0]]
+        try:
+            self.show(profiler.format_report(path))
+        except Exception as e:
+            logger.error(f"Could not read profile {path}: {e}")
+            self.show(f"Could not read {path.name}: {e}")
+
+    def show(self, text):
+        self.text.configure(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', text)
+        self.text.configure(state='disabled')
+
+    def open_folder(self):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        if IS_MACOS:
+            os.system(f'open "{PROFILE_DIR}"')
+        else:
+            os.startfile(PROFILE_DIR)
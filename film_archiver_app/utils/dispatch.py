@@ -0,0 +1,47 @@
+"""
+Film Archiver - UI Thread Dispatcher
+"""
+import queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UIDispatcher:
+    """Run callbacks posted from worker threads on the Tk main loop.
+
+    Tk is not thread-safe, so background jobs call `post` and the dispatcher
+    drains the queue from a `root.after` poll.
+    """
+
+    def __init__(self, root, interval_ms=30):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.Queue()
+        self._after_id = None
+        self._poll()
+
+    def post(self, func, *args):
+        """Schedule func(*args) on the UI thread (safe from any thread)"""
+        self._queue.put((func, args))
+
+    def stop(self):
+        """Stop polling; queued callbacks are dropped"""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _poll(self):
+        while True:
+            try:
+                func, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Error in UI callback {getattr(func, '__name__', func)}: {e}")
+        self._after_id = self.root.after(self.interval_ms, self._poll)
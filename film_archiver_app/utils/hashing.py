@@ -0,0 +1,28 @@
+"""
+Film Archiver - File Hashing
+"""
+import shutil
+import hashlib
+
+HASH_ALGORITHM = 'sha256'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path, algorithm=HASH_ALGORITHM, chunk_size=HASH_CHUNK_SIZE) -> str:
+    """Hex digest of a file's contents, read in chunks"""
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_with_hash(source, destination, algorithm=HASH_ALGORITHM, chunk_size=HASH_CHUNK_SIZE) -> str:
+    """Copy a file with its metadata, hashing the bytes as they are copied"""
+    digest = hashlib.new(algorithm)
+    with open(source, 'rb') as src, open(destination, 'wb') as dest:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            digest.update(chunk)
+            dest.write(chunk)
+    shutil.copystat(source, destination)
+    return digest.hexdigest()
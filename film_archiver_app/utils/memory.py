@@ -0,0 +1,133 @@
+"""
+Film Archiver - Memory Accounting
+
+Byte estimates for the app's caches and a tracemalloc snapshot tracker
+for finding what grew between two points in a session.
+"""
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes per pixel in Pillow's in-memory storage (RGB is padded to 4)
+_PIXEL_BYTES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16B': 2, 'I;16L': 2}
+
+SNAPSHOT_FRAMES = 5
+
+
+def image_bytes(img) -> int:
+    """Approximate memory held by a decoded PIL image"""
+    return img.width * img.height * _PIXEL_BYTES.get(img.mode, 4)
+
+
+def photo_bytes(photo) -> int:
+    """Approximate memory held by a Tk photo image (32-bit pixels)"""
+    return photo.width() * photo.height() * 4
+
+
+def object_bytes(obj) -> int:
+    """Shallow size of obj plus its attribute values (for small records)"""
+    size = sys.getsizeof(obj)
+    slots = getattr(type(obj), '__slots__', ())
+    for name in slots:
+        size += sys.getsizeof(getattr(obj, name, None))
+    if hasattr(obj, '__dict__'):
+        size += sum(sys.getsizeof(value) for value in vars(obj).values())
+    return size
+
+
+def tk_image_usage(root):
+    """(count, bytes) for every image Tk currently holds"""
+    count = 0
+    total = 0
+    for name in root.tk.splitlist(root.tk.call('image', 'names')):
+        try:
+            width = int(root.tk.call('image', 'width', name))
+            height = int(root.tk.call('image', 'height', name))
+        except Exception:
+            continue
+        count += 1
+        total += width * height * 4
+    return count, total
+
+
+def process_memory() -> dict:
+    """Current and peak resident set size in bytes, where the OS reports them"""
+    usage = {'rss': None, 'peak_rss': None}
+    try:
+        with open('/proc/self/statm') as f:
+            usage['rss'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        usage['peak_rss'] = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    return usage
+
+
+def format_bytes(nbytes) -> str:
+    if nbytes is None:
+        return "-"
+    for unit in ('B', 'KB', 'MB'):
+        if abs(nbytes) < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.2f} GB"
+
+
+class SnapshotTracker:
+    """Take a tracemalloc snapshot now and diff the heap against it later.
+
+    tracemalloc is started by the first snapshot, so allocations made
+    before that are not attributed.
+    """
+
+    def __init__(self):
+        self.baseline = None
+        self.started_tracing = False
+
+    @property
+    def active(self) -> bool:
+        return self.baseline is not None
+
+    def take(self):
+        import tracemalloc  # loaded only when snapshots are used, to keep it out of start-up
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(SNAPSHOT_FRAMES)
+            self.started_tracing = True
+            logger.info("Started tracemalloc for memory snapshots")
+        self.baseline = self._snapshot()
+
+    def compare(self, limit=25, group_by='lineno') -> str:
+        """Top allocation sites that grew since the baseline snapshot"""
+        if self.baseline is None:
+            return "No snapshot taken yet"
+        current = self._snapshot()
+        diff = current.compare_to(self.baseline, group_by)
+        growth = sum(stat.size_diff for stat in diff)
+        lines = [f"Traced heap change since snapshot: {format_bytes(growth)}", ""]
+        lines.extend(str(stat) for stat in diff[:limit])
+        return "\n".join(lines)
+
+    def stop(self):
+        if self.started_tracing:
+            import tracemalloc
+
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+        self.baseline = None
+        self.started_tracing = False
+
+    @staticmethod
+    def _snapshot():
+        import tracemalloc
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        return tracemalloc.take_snapshot().filter_traces(ignore)
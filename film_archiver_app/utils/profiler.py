@@ -0,0 +1,140 @@
+"""
+Film Archiver - Action Profiler
+
+Diagnostics > Profile Next Actions arms the profiler for N user actions.
+Each armed action decorated with @profiled runs under cProfile and
+tracemalloc and leaves two files in PROFILE_DIR:
+
+    20240208-101500-process.pstats      (python -m pstats, snakeviz, ...)
+    20240208-101500-process.alloc.txt   top allocation sites
+
+Only one action is profiled at a time; actions called from inside it are
+part of the same profile. Actions that run on a worker thread (checking
+added files, processing) are profiled on that thread.
+"""
+import io
+import time
+import logging
+import threading
+import functools
+from pathlib import Path
+
+from config.settings import PROFILE_DIR, PROFILE_TOP_N
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_remaining = 0
+_active = False
+
+
+def arm(count: int):
+    """Profile the next count actions"""
+    global _remaining
+    with _lock:
+        _remaining = max(0, count)
+    logger.info(f"Profiling the next {count} action(s) into {PROFILE_DIR}")
+
+
+def remaining() -> int:
+    return _remaining
+
+
+def profiled(action: str):
+    """Decorator marking a user action that can be profiled"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _remaining or not _claim():
+                return func(*args, **kwargs)
+            try:
+                return _run_profiled(action, func, args, kwargs)
+            finally:
+                _release()
+        return wrapper
+    return decorator
+
+
+def _claim() -> bool:
+    global _remaining, _active
+    with _lock:
+        if _active or not _remaining:
+            return False
+        _remaining -= 1
+        _active = True
+        return True
+
+
+def _release():
+    global _active
+    with _lock:
+        _active = False
+
+
+def _run_profiled(action, func, args, kwargs):
+    # Loaded only when an action is profiled, to keep them out of start-up
+    import cProfile
+    import tracemalloc
+
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            _write_reports(action, profile, before, after, elapsed, peak)
+        except Exception as e:
+            logger.error(f"Could not write profile for {action}: {e}")
+
+
+def _write_reports(action, profile, before, after, elapsed, peak):
+    import tracemalloc
+
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    base = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{action}"
+    profile.dump_stats(str(base) + ".pstats")
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    growth = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+    lines = [
+        f"Action: {action}",
+        f"Wall time: {elapsed * 1000:.1f} ms",
+        f"Peak traced memory: {peak / 1024 / 1024:.1f} MB",
+        "",
+        f"Top {PROFILE_TOP_N} allocation sites by memory still held after the action:",
+    ]
+    lines.extend(str(stat) for stat in growth[:PROFILE_TOP_N])
+    Path(str(base) + ".alloc.txt").write_text("\n".join(lines) + "\n")
+    logger.info(f"Profiled {action} in {elapsed * 1000:.0f} ms: {base}.pstats")
+
+
+def list_reports() -> list:
+    """Saved profiles, newest first"""
+    if not PROFILE_DIR.exists():
+        return []
+    return sorted(PROFILE_DIR.glob("*.pstats"), reverse=True)
+
+
+def format_report(pstats_path, limit=PROFILE_TOP_N) -> str:
+    """Top functions by cumulative time, followed by the allocation report"""
+    import pstats
+
+    pstats_path = Path(pstats_path)
+    stream = io.StringIO()
+    stats = pstats.Stats(str(pstats_path), stream=stream)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    report = stream.getvalue().strip()
+
+    alloc_path = pstats_path.with_suffix(".alloc.txt")
+    if alloc_path.exists():
+        report = alloc_path.read_text() + "\n" + report
+    return report
@@ -0,0 +1,132 @@
+"""
+Film Archiver - UI Stall Monitor
+
+A heartbeat is scheduled with root.after every few milliseconds; how late
+it fires is the time an input event would have waited. A watchdog thread
+notices when the heartbeat stops and captures the main thread's stack
+while it is still blocked, so the stall log shows the offending call.
+"""
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import deque
+
+from config.settings import STALL_HEARTBEAT_MS, STALL_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLES = 20_000
+MAX_STALLS = 50
+
+
+class StallMonitor:
+    """Measure Tk event loop latency and log stalls with the blocking stack"""
+
+    def __init__(self, root, interval_ms=STALL_HEARTBEAT_MS, threshold_ms=STALL_THRESHOLD_MS):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=MAX_SAMPLES)  # Heartbeat lateness in seconds
+        self.stalls = deque(maxlen=MAX_STALLS)    # {'started', 'duration_ms', 'stack'}
+        self._expected = None
+        self._last_beat = None
+        self._stack = None
+        self._main_ident = None
+        self._after_id = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        """Start the heartbeat and watchdog (call from the Tk thread)"""
+        if self._watchdog is not None:
+            return
+        self._main_ident = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._expected = self._last_beat + self.interval
+        self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+        self._watchdog = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        lateness = max(0.0, now - self._expected)
+        self.samples.append(lateness)
+
+        if lateness >= self.threshold:
+            stack, self._stack = self._stack, None
+            stall = {
+                'started': time.time() - lateness,
+                'duration_ms': lateness * 1000,
+                'stack': stack or "(stack not captured)",
+            }
+            self.stalls.append(stall)
+            logger.warning(f"UI stalled for {stall['duration_ms']:.0f} ms in:\n{stall['stack']}")
+
+        self._last_beat = now
+        self._expected = now + self.interval
+        if not self._stop.is_set():
+            self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+
+    def _watch(self):
+        captured_for = None
+        while not self._stop.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            if time.perf_counter() - last_beat < self.threshold + self.interval:
+                continue
+            # Capture once per stall, while the main thread is still inside it
+            if captured_for != last_beat:
+                captured_for = last_beat
+                self._stack = self._capture_main_stack()
+
+    def _capture_main_stack(self) -> str:
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return None
+        return "".join(traceback.format_stack(frame))
+
+    def stats(self) -> dict:
+        """Heartbeat latency percentiles in milliseconds"""
+        values = sorted(self.samples)
+        count = len(values)
+        if not count:
+            return {'samples': 0, 'stalls': len(self.stalls)}
+
+        def percentile(p):
+            return values[min(count - 1, int(count * p / 100))] * 1000
+
+        return {
+            'samples': count,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'max_ms': values[-1] * 1000,
+            'stalls': len(self.stalls),
+        }
+
+    def format_report(self) -> str:
+        stats = self.stats()
+        if not stats['samples']:
+            return "No heartbeat samples yet"
+        lines = [
+            f"Event loop latency over {stats['samples']} heartbeats: "
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+            f"p99 {stats['p99_ms']:.1f} ms, max {stats['max_ms']:.1f} ms",
+            f"Stalls over {self.threshold * 1000:.0f} ms: {stats['stalls']}",
+        ]
+        for stall in reversed(self.stalls):
+            started = time.strftime('%H:%M:%S', time.localtime(stall['started']))
+            lines.append("")
+            lines.append(f"{started}  {stall['duration_ms']:.0f} ms")
+            lines.append(stall['stack'].rstrip())
+        return "\n".join(lines)
@@ -0,0 +1,131 @@
+"""
+Film Archiver - Startup Timing
+
+Phase timings are logged on every launch. Run this module to get an
+import-time breakdown (from `python -X importtime`) that can be saved as
+JSON and compared between releases:
+
+    python -m utils.startup --top 25 --json startup.json --compare baseline.json
+"""
+import os
+import re
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class StartupTimer:
+    """Record named startup phases relative to when the timer was created"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase: str):
+        """Close the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    @property
+    def total(self) -> float:
+        return self.last - self.start
+
+    def report(self) -> str:
+        parts = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        return f"Startup {self.total * 1000:.0f} ms ({parts})"
+
+
+def import_times(module: str = "main") -> list:
+    """Import module in a fresh interpreter and return per-module timings.
+
+    Each entry is {'module', 'self_us', 'cumulative_us', 'depth'}, in the
+    order Python reported them.
+    """
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_ROOT, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                'module': name,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': len(indent) // 2,
+            })
+    if result.returncode != 0:
+        logger.error(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return entries
+
+
+def summarize(entries: list, top: int = 25) -> dict:
+    """Total import time plus the slowest top-level packages and modules"""
+    packages = {}
+    for entry in entries:
+        package = entry['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + entry['self_us']
+    return {
+        'python': sys.version.split()[0],
+        'total_us': sum(entry['self_us'] for entry in entries),
+        'packages': dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+        'modules': sorted(entries, key=lambda entry: -entry['self_us'])[:top],
+    }
+
+
+def format_report(summary: dict, baseline: dict = None) -> str:
+    lines = [f"Total import time: {summary['total_us'] / 1000:.1f} ms"]
+    if baseline:
+        delta = (summary['total_us'] - baseline['total_us']) / 1000
+        lines[0] += f" ({delta:+.1f} ms vs baseline)"
+    lines.append("")
+    lines.append(f"{'package':<30}{'self ms':>10}{'baseline':>10}")
+    for package, self_us in summary['packages'].items():
+        before = baseline['packages'].get(package) if baseline else None
+        before = f"{before / 1000:.1f}" if before is not None else "-"
+        lines.append(f"{package:<30}{self_us / 1000:>10.1f}{before:>10}")
+    lines.append("")
+    lines.append(f"{'module':<50}{'self ms':>10}{'cum ms':>10}")
+    for entry in summary['modules']:
+        lines.append(f"{entry['module']:<50}{entry['self_us'] / 1000:>10.1f}"
+                     f"{entry['cumulative_us'] / 1000:>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report Film Archiver import time")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="rows to show")
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--compare", help="baseline summary JSON to compare against")
+    args = parser.parse_args(argv)
+
+    summary = summarize(import_times(args.module), args.top)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(format_report(summary, baseline))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
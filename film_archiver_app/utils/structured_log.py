@@ -0,0 +1,62 @@
+"""
+Film Archiver - JSON Lines Log Format
+
+Each record becomes one JSON object. Fields passed through `extra` are
+kept as top-level keys, so per-file context can be filtered later:
+
+    logger.warning("Unreadable EXIF", extra={'file': path, 'elapsed_ms': 12.5})
+
+Tracebacks are written to an 'exception' key; TracebackQueueHandler keeps
+them separate from the message on their way through the log queue.
+"""
+import copy
+import json
+import logging
+from datetime import datetime
+from logging.handlers import QueueHandler
+
+# Attributes every LogRecord has; anything else came from `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_traceback_formatter = logging.Formatter()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class TracebackQueueHandler(QueueHandler):
+    """QueueHandler that keeps a record's traceback apart from its message.
+
+    QueueHandler.prepare() appends the traceback to msg and clears
+    exc_info, which leaves JsonLinesFormatter no 'exception' to write.
+    Here the message and traceback are rendered on the calling thread into
+    msg and exc_text; the listener's formatters add exc_text as usual.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or _traceback_formatter).formatException(record.exc_info)
+            record.exc_info = None
+        return record
@@ -0,0 +1,163 @@
+"""
+Film Archiver - Span Tracing
+
+Hot paths are wrapped in spans:
+
+    @traced("file_list.update")
+    def update_file_list(self): ...
+
+    with span("copy", file=name):
+        shutil.copy2(src, dst)
+
+While tracing is off a span costs one global lookup. While it is on,
+finished spans go into a fixed-size ring buffer that can be exported as
+Chrome trace JSON (chrome://tracing, Perfetto) or summarised per span name.
+Tracing is enabled with FILM_ARCHIVER_TRACE=1 or from the Diagnostics menu.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+
+from config.settings import TRACE_ENABLED, TRACE_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+_enabled = TRACE_ENABLED
+_events = deque(maxlen=TRACE_BUFFER_SIZE)  # (name, start_ns, duration_ns, thread id, args)
+_origin_ns = time.perf_counter_ns()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = bool(enabled)
+    logger.info(f"Tracing {'enabled' if _enabled else 'disabled'}")
+
+
+def clear():
+    _events.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        # deque.append is atomic, so worker threads need no lock
+        _events.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args):
+    """Context manager timing the enclosed block as one span"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+
+def traced(name: str = None):
+    """Decorator form of span(); defaults to the function's qualified name"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> list:
+    """Copy of the buffered spans, oldest first"""
+    while True:
+        try:
+            return list(_events)
+        except RuntimeError:
+            # Another thread appended mid-copy; try again
+            continue
+
+
+def export_chrome_trace(path: str) -> int:
+    """Write buffered spans as Chrome trace JSON; returns the span count"""
+    events = snapshot()
+    pid = os.getpid()
+    trace = []
+    for name, start, duration, tid, args in events:
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - _origin_ns) / 1000,
+            'dur': duration / 1000,
+            'pid': pid,
+            'tid': tid,
+        }
+        if args:
+            event['args'] = {key: str(value) for key, value in args.items()}
+        trace.append(event)
+
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+    logger.info(f"Exported {len(trace)} spans to {path}")
+    return len(trace)
+
+
+def summary() -> dict:
+    """Per span name: count, total and p50/p95/max durations in milliseconds"""
+    durations = {}
+    for name, _, duration, _, _ in snapshot():
+        durations.setdefault(name, []).append(duration)
+
+    result = {}
+    for name, values in durations.items():
+        values.sort()
+        count = len(values)
+        result[name] = {
+            'count': count,
+            'total_ms': sum(values) / 1e6,
+            'p50_ms': values[count // 2] / 1e6,
+            'p95_ms': values[min(count - 1, int(count * 0.95))] / 1e6,
+            'max_ms': values[-1] / 1e6,
+        }
+    return result
+
+
+def format_summary(stats: dict = None) -> str:
+    stats = summary() if stats is None else stats
+    if not stats:
+        return "No spans recorded" + ("" if _enabled else " (tracing is off)")
+    lines = [f"{'span':<32}{'count':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+    for name, row in sorted(stats.items(), key=lambda item: -item[1]['total_ms']):
+        lines.append(f"{name:<32}{row['count']:>8}{row['total_ms']:>12.1f}{row['p50_ms']:>10.2f}"
+                     f"{row['p95_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    return "\n".join(lines)